@@ -0,0 +1,130 @@
+import os
+import logging
+import base64
+import contextvars
+import eventlet
+import apie
+
+# Whether or not the current request was made by a batch.
+# Each entry is processed in its own copy of the context (see batch.Call), so this is only set for the entries themselves and anything they call.
+inBatch = contextvars.ContextVar('inBatch', default=False)
+
+# The batch Endpoint makes many unrelated requests at once, so clients which need many things can ask for them all with a single HTTP request.
+# POST a json list of requests (or {"entries": [...]}), each of which looks like:
+#   {"method": "GET", "path": "some/endpoint", "args": {"page": 2}, "body": {...}, "headers": {...}}
+# Only "path" is required. Each request is authenticated and processed as if it had been made on its own, with the headers of the batch request (e.g. Authorization) plus any "headers" given.
+# The response is a json list, in the same order, of {"status": ..., "headers": {...}, "body": ...} (see APIE.GetSubresponse).
+# Requests are made concurrently, up to the given concurrency.
+# Batches may not contain batches, however they are reached (see inBatch).
+class batch(apie.Endpoint):
+	def __init__(this, name="batch"):
+		super().__init__(name)
+
+		this.supportedMethods = ['POST']
+
+		# The requests to make; if not given, the request body must be a json list of them.
+		this.optionalKWArgs['entries'] = None
+
+		# How many requests to make at once.
+		# This is capped at this.maxConcurrency.
+		this.optionalKWArgs['concurrency'] = 8
+
+		# How many seconds each request may take before it is abandoned; None for no limit.
+		this.optionalKWArgs['timeout'] = None
+
+		# Since these may be given by the client, they must be bounded by the server.
+		this.maxConcurrency = 16
+		this.maxEntries = 100
+
+		this.allowedNext = ['help']
+
+		# We make a list, which can't go in this.response.content.data.
+		this.clobberContent = False
+
+	# Required Endpoint method. See that class for details.
+	def GetHelpText(this):
+		return f'''\
+Make many requests at once.
+POST a json list of {{"method": ..., "path": ..., "args": {{...}}, "body": ..., "headers": {{...}}}} (only "path" is required).
+Returns a json list of {{"status": ..., "headers": {{...}}, "body": ...}}, in the same order.
+At most {this.maxEntries} requests may be made per batch.
+'''
+
+	def Call(this):
+		# Batches of batches would multiply how many requests a client could make at once.
+		if (inBatch.get()):
+			raise apie.OtherAPIError("Batches cannot contain batches.")
+
+		entries = this.entries
+		if (entries is None):
+			entries = this.request.get_json(silent=True)
+		if (not isinstance(entries, list)):
+			raise apie.OtherAPIError("Batches must be a json list of requests.")
+		if (len(entries) > this.maxEntries):
+			raise apie.OtherAPIError(f"Batches may have at most {this.maxEntries} requests; got {len(entries)}.")
+
+		concurrency = max(1, min(int(this.concurrency), this.maxConcurrency))
+		timeout = None
+		if (this.timeout is not None):
+			timeout = float(this.timeout)
+
+		# No call may outlast the request.
+		remaining = this.GetRemainingTime()
+		if (remaining is not None and (timeout is None or remaining < timeout)):
+			timeout = remaining
+
+		# Each request runs in its own green thread, which needs its own copy of the request's context (e.g. flask.request).
+		pool = eventlet.GreenPool(concurrency)
+		threads = []
+		try:
+			for entry in entries:
+				threads.append(pool.spawn(contextvars.copy_context().run, this.CallEntry, entry, timeout))
+			responses = [thread.wait() for thread in threads]
+		except BaseException:
+			# We were interrupted (e.g. the request's deadline passed); don't leave requests running.
+			for thread in threads:
+				thread.kill()
+			raise
+
+		this.response.content.message = this.executor.Serialize(responses)
+
+
+	# Make the request described by the given entry.
+	# RETURN the response; errors are returned as responses, so that one failure doesn't stop the other requests.
+	def CallEntry(this, entry, timeout):
+		if (not isinstance(entry, dict) or not isinstance(entry.get('path'), str)):
+			return this.GetError(400, f"Each request must be an object with a 'path'; got: {entry}")
+
+		inBatch.set(True)
+		timer = eventlet.Timeout(timeout)
+		try:
+			response = this.executor.ProcessSubrequest(
+				entry['path'],
+				method = entry.get('method', 'GET'),
+				headers = entry.get('headers'),
+				query = entry.get('args'),
+				data = entry.get('body'),
+				inherit = this.request.headers,
+			)
+		except eventlet.Timeout as e:
+			if (e is not timer):
+				raise
+			logging.error(f"Batch request for {entry['path']} took longer than {timeout} seconds")
+			return this.GetError(504, f"{entry['path']} took longer than {timeout} seconds")
+		except Exception as e:
+			logging.error(f"Batch request for {entry['path']} failed: {e}")
+			return this.GetError(500, str(e))
+		finally:
+			timer.cancel()
+
+		# Bytes can't be sent as json.
+		if (isinstance(response['body'], (bytes, bytearray))):
+			response['body'] = base64.b64encode(response['body']).decode('ascii')
+			response['encoding'] = 'base64'
+
+		return response
+
+
+	# RETURN a response for an entry which could not be processed.
+	def GetError(this, status, message):
+		return {'status': status, 'headers': {}, 'body': message}
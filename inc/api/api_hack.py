@@ -18,40 +18,35 @@ The quieter you are, the more you are able to hear.
 
 	# Required Endpoint method. See that class for details.
 	def Call(this):
-		setFrom = ['args']
-		if (this.request.content_type == "application/json"):
-			setFrom.append('json')
-		elif (this.request.data):
-			setFrom.append('forms')
-
-		for set in setFrom:
-			for key, val in getattr(this.request, set).to_dict():
+		for field in ['args', 'form', 'json']:
+			for key, val in this.context.GetRequestData(field).items():
 				this.Set(key, val) # will log.
 
 	# Ensure the hacked Endpoint uses what we've set here.
+	# The next Endpoint is processed as any other (i.e. through ProcessEndpoint), so the deadline and admission limits still apply.
 	def CallNext(this):
 		next = this.next.pop(0)
-		endpoint = this.executor.GetRegistered(next, "api")
-		originalFetchFrom = endpoint.fetchFrom
 
-		# Move precursor to the top, so that we can make the next Endpoint Fetch our hacked values.
-		try:
-			endpoint.fetchFrom.remove('precursor')
-		except:
-			# Ignore key errors, etc.
-			pass
-		endpoint.fetchFrom = ['precursor'].extend(endpoint.fetchFrom)
+		# The next Endpoint is checked out for this request alone, so we can modify it freely; we just need to restore it before it is reused.
+		hacked = []
+		def Prepare(endpoint):
+			hacked.append((endpoint, endpoint.fetch.use))
 
-		this.executor.cachedFunctors.update({next: endpoint})
+			# Move precursor to the top, so that we can make the next Endpoint Fetch our hacked values.
+			endpoint.fetch.use = ['precursor'] + [loc for loc in endpoint.fetch.use if loc != 'precursor']
 
 		ret = None
 		try:
-			ret = this.executor.ProcessEndpoint(next, this.request, precursor=this, next=this.next)
+			ret = this.executor.ProcessEndpoint(next, this.request, prepare=Prepare, precursor=this, next=this.next)
+		except (apie.DeadlineExceeded, apie.Overloaded, apie.RateLimited):
+			raise
 		except Exception as e:
 			ret = None
 			this.response.content.message = f"Hack failed: {str(e)}"
 			this.response.code = 401
-		endpoint.fetchFrom = originalFetchFrom
+		finally:
+			for endpoint, originalFetchFrom in hacked:
+				endpoint.fetch.use = originalFetchFrom
 		if (ret is not None):
 			return ret
 		return this.ProcessResponse()
@@ -13,8 +13,8 @@ class help(apie.Endpoint):
 		this.cacheable = this.precursor.cacheable #cacheable is automatically added to the response
 		this.response.content.data.update({
 			"endpoint": this.precursor.name,
-			"supported_methods": this.precursor.supportedMethods,
-			"allowed_next": this.precursor.allowedNext,
+			"supported_methods": sorted(this.precursor.supportedMethods), # Sets can't be json serialized (see Endpoint.InternMetadata).
+			"allowed_next": sorted(this.precursor.allowedNext),
 			"required_args": this.precursor.requiredKWArgs,
 			"optional_args": this.precursor.optionalKWArgs,
 			"get_args_from": this.precursor.fetchFrom,
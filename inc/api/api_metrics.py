@@ -0,0 +1,30 @@
+import os
+import logging
+import apie
+
+# The metrics Endpoint reports how APIE is performing, in the Prometheus text format.
+# Point your Prometheus scrape config at .../metrics.
+# NOTE: each worker process keeps its own metrics, so with more than 1 worker each scrape only sees the worker that answered it.
+class metrics(apie.Endpoint):
+	def __init__(this, name="metrics"):
+		super().__init__(name)
+
+		this.supportedMethods = ['GET']
+		this.allowedNext = ['help']
+
+		this.mime = 'text/plain; version=0.0.4'
+		this.clobberContent = False
+
+	# Required Endpoint method. See that class for details.
+	def GetHelpText(this):
+		return '''\
+Report request timings, status codes, errors, and cache statistics in the Prometheus text format.
+'''
+
+	def Call(this):
+		if (this.executor.metrics is None):
+			this.response.code = 404
+			this.response.content.message = "Metrics are disabled; set collect_metrics to enable them.\n"
+			return
+
+		this.response.content.message = this.executor.metrics.Render()
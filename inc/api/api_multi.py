@@ -1,10 +1,13 @@
 import os
 import logging
 import json
+import contextvars
+import eventlet
 import apie
 
 # The multi Endpoint allows calling the same requested series several times, each with a different prefix appended to each Fetched variable.
 # Currently, multi only allows variables to be Fetched differently between each call. No methods or logic may be propagated between calls.
+# Each call is made concurrently, up to the given concurrency.
 class multi(apie.Endpoint):
 	def __init__(this, name="multi"):
 		super().__init__(name)
@@ -19,7 +22,7 @@ class multi(apie.Endpoint):
 		this.optionalKWArgs['forward_returns'] = True
 
 		# What should the return value be by default?
-		# Options are 'list' or 'dict' (or some subclass thereof)
+		# Options are 'list' or 'dict'.
 		this.optionalKWArgs['combine_as'] = 'list'
 
 		# True means a return of [a, b], [c, d] would become [a, b, c, d]
@@ -27,15 +30,41 @@ class multi(apie.Endpoint):
 		# Only applicable if the mimetype of any return is 'application/json'
 		# NOTE: only works if 'combine_as' is 'list'.
 		this.optionalKWArgs['join_lists'] = True
-		
+
 		# If the same value is returned for multiple calls, do we return just the first (True) or all (False)?
 		# NOTE: only works if 'combine_as' is 'list'.
 		this.optionalKWArgs['prevent_duplicates'] = True
 
+		# How many elements of the domain to call at once.
+		# This is capped at this.maxConcurrency.
+		this.optionalKWArgs['concurrency'] = 4
+
+		# How many seconds each call may take before it is abandoned; None for no limit.
+		this.optionalKWArgs['timeout'] = None
+
+		# Since concurrency may be given by the client, it must be bounded by the server.
+		this.maxConcurrency = 16
+
+		# Whatever follows *this is what we call for each element in the domain.
+		this.allowedNext = []
+
+		# The result may be a list, which can't be merged into this.response.content.data, so Call() serializes it.
+		this.clobberContent = False
+
+		# The types each 'combine_as' value produces.
+		this.combinations = {
+			'list': list,
+			'dict': dict,
+		}
+
 		# Internal vars
+		# Each call is given its own copy of *this to use as a precursor (see GetCursor); these are only set on those copies.
 		this.cursor = None
 		this.calling = False
 
+		# The result of the last Call, before serialization.
+		this.combined = None
+
 	# Required Endpoint method. See that class for details.
 	def GetHelpText(this):
 		return f'''\
@@ -50,73 +79,204 @@ Will call:
 		super().Initialize()
 		this.cursor = None
 		this.calling = False
+		this.combined = None
 
 
 	def Call(this):
-		this.calling = True
+		if (this.combine_as not in this.combinations):
+			raise apie.OtherAPIError(f"Unknown combine_as: {this.combine_as}; options are {list(this.combinations.keys())}")
+
+		concurrency = max(1, min(int(this.concurrency), this.maxConcurrency))
+		timeout = None
+		if (this.timeout is not None):
+			timeout = float(this.timeout)
+
+		# No call may outlast the request.
+		remaining = this.GetRemainingTime()
+		if (remaining is not None and (timeout is None or remaining < timeout)):
+			timeout = remaining
 
-		returns = {}
+		# Each call runs in its own green thread, which needs its own copy of the request's context (e.g. flask.request).
+		pool = eventlet.GreenPool(concurrency)
+		threads = []
+		try:
+			for element in this.domain:
+				threads.append(pool.spawn(contextvars.copy_context().run, this.CallElement, element, timeout))
+			returns = [thread.wait() for thread in threads]
+		except BaseException:
+			# We were interrupted (e.g. the request's deadline passed); don't leave calls running on Endpoints which are about to be released.
+			for thread in threads:
+				thread.kill()
+			raise
 
-		for element in this.domain:
+		failures = [ret for ret in returns if ret['error'] is not None]
+		if (failures and len(failures) == len(returns)):
+			raise failures[0]['error']
 
-			this.cursor = element
+		combined = this.combinations[this.combine_as]()
 
-			# ret is a Flask Response object
-			ret = this.executor.ProcessEndpoint(element, this.request, precursor=this)
-			
-			returns[element] = {
-				'path': f"{element}/{'/'.join(this.next)}",
-				'code': ret.status,
-				'mime': ret.headers["Content-Type"],
-				'raw': ret
-			}
+		for ret in returns:
+			if (ret['raw'] is None):
+				continue
 
-		combinedJson = eval(f"{this.combine_as}()")
+			content = getattr(ret['raw'], 'structured', None)
+			if (content is None and ret['mime'] == 'application/json'):
+				content = json.loads(this.GetBody(ret['raw']))
+			elif (content is None and ret['mime'] == 'application/x-ndjson'):
+				content = [json.loads(line) for line in this.GetBody(ret['raw']).splitlines() if line]
 
-		for element, ret in returns.items():
-			if (ret['mime'] == 'application/json'):
-				contentJson = json.loads(ret['raw'].data)
-				if (isinstance(combinedJson, list)):
-					if (this.join_lists):
-						combinedJson += list(contentJson)
+			if (content is not None):
+				if (isinstance(combined, list)):
+					if (this.join_lists and isinstance(content, list)):
+						combined.extend(content)
 					else:
-						combinedJson.append(list(contentJson))
-				elif (isinstance(combinedJson, dict)):
-					combinedJson.update(contentJson)
+						combined.append(content)
+				elif (isinstance(combined, dict)):
+					combined.update(content)
 			else:
 				# TODO: This handling can be improved. For instance, removing duplicate files is gonna be a lot of work.
-				if (isinstance(combinedJson, list)):
-					combinedJson.append(ret['raw'].data)
-				elif (isinstance(combinedJson, dict)):
-					combinedJson[element] = ret['raw'].data
+				if (isinstance(combined, list)):
+					combined.append(this.GetBody(ret['raw']).decode('utf-8', errors='replace'))
+				elif (isinstance(combined, dict)):
+					combined[ret['element']] = this.GetBody(ret['raw']).decode('utf-8', errors='replace')
 
-		if (this.prevent_duplicates):
-			combinedJson = list(set(combinedJson))
+		if (this.prevent_duplicates and isinstance(combined, list)):
+			combined = this.Deduplicate(combined)
 
 		if (this.forward_returns):
-			returnKeys = ['path', 'code']
-			rets = [{key: r[key] for key in returnKeys}.update({'headers': r['raw'].headers}) for r in returns.values()]
+			rets = []
+			for ret in returns:
+				forward = {
+					'path': ret['path'],
+					'code': ret['code'],
+				}
+				if (ret['raw'] is not None):
+					forward['headers'] = dict(ret['raw'].headers)
+				if (ret['error'] is not None):
+					forward['error'] = str(ret['error'])
+					forward['endpoint'] = ret['endpoint']
+				rets.append(forward)
 
-			if (isinstance(combinedJson, list)):
-				combinedJson.append(rets)
-			elif (isinstance(combinedJson, dict)):
-				combinedJson['returns'] = rets
+			if (isinstance(combined, list)):
+				combined.append(rets)
+			elif (isinstance(combined, dict)):
+				combined['returns'] = rets
 
-		this.response['content_data'] = combinedJson
+		this.combined = combined
 
-		this.calling = False
+		if (isinstance(combined, dict)):
+			this.response.content.data.update(combined)
+			this.response.content.data.update({'cacheable': this.cacheable})
+			combined = this.response.content.data
+		this.response.content.message = this.executor.Serialize(combined)
+
+
+	# Call the Endpoints following *this for a single element of the domain.
+	# Each element is given its own fork of the request's context, so the elements don't overwrite each other's (or our) RequestContext.endpoint.
+	# RETURN a dict describing the result; errors are caught and returned, so that one failure doesn't stop the other calls.
+	def CallElement(this, element, timeout):
+		ret = {
+			'element': element,
+			'path': f"{element}/{'/'.join(this.next)}",
+			'code': None,
+			'mime': None,
+			'raw': None,
+			'error': None,
+			'endpoint': None,
+		}
+
+		context = None
+		if (this.context):
+			context = this.context.Fork()
+
+		try:
+			with eventlet.Timeout(timeout, apie.OtherAPIError(f"{ret['path']} took longer than {timeout} seconds")):
+				response = this.executor.ProcessEndpoint(this.next[0], this.request, precursor=this.GetCursor(element, context), context=context, next=list(this.next[1:]))
+		except Exception as e:
+			if (context is not None and context.endpoint is not None):
+				ret['endpoint'] = context.endpoint.name
+			logging.error(f"Multicall {ret['path']} failed in {ret['endpoint']}: {e}")
+			ret['error'] = e
+			ret['code'] = 500
+			if (isinstance(e, apie.Overloaded)):
+				ret['code'] = 503
+			return ret
+
+		if (response is not None):
+			ret['code'] = response.status_code
+			ret['mime'] = response.headers.get("Content-Type")
+			ret['raw'] = response
+		return ret
+
+
+	# RETURN the full body of the given Flask Response as bytes.
+	# Endpoint responses are in direct passthrough mode, so we read them ourselves, which also collects any streamed responses.
+	# Streamed responses are closed once read, so that whatever they hold (e.g. admission gates) is let go.
+	def GetBody(this, response):
+		body = response.response
+		if (isinstance(body, (bytes, bytearray))):
+			return bytes(body)
+		if (isinstance(body, str)):
+			return body.encode('utf-8')
+		try:
+			return b''.join(chunk.encode('utf-8') if isinstance(chunk, str) else chunk for chunk in body)
+		finally:
+			response.close()
+
+
+	# RETURN a copy of *this which prefixes Fetched values with the given element and passes on the given RequestContext.
+	# The copy is shallow: only cursor, calling, and context differ from *this.
+	def GetCursor(this, element, context):
+		cursor = object.__new__(this.__class__)
+		cursor.__dict__.update(this.__dict__)
+		cursor.cursor = element
+		cursor.calling = True
+		cursor.context = context
+		return cursor
+
+
+	# Remove duplicate values from the given list, keeping the first of each.
+	# Values which can't be hashed (e.g. dicts) are compared by their json.
+	def Deduplicate(this, values):
+		seen = set()
+		ret = []
+		for value in values:
+			try:
+				hash(value)
+				key = (True, value)
+			except TypeError:
+				key = (False, json.dumps(value, sort_keys=True, default=str))
+			if (key in seen):
+				continue
+			seen.add(key)
+			ret.append(value)
+		return ret
+
+
+	# Override of Endpoint method. See that class for details
+	# The combined result is given as the structured data of the response, so nested multicalls don't have to parse it.
+	def ProcessResponse(this):
+		response = super().ProcessResponse()
+		if (response.structured is None):
+			response.structured = this.combined
+		return response
+
+
+	# Override of Endpoint method. See that class for details
+	# Call() has already called everything that follows *this.
+	def CallNext(this):
+		if (this.bypassCall):
+			return super().CallNext()
+		return None
 
 
-	# Override Fetch to append the cursor to each query.
-	# However, we only want to add this functionality AFTER we've Fetched the args for *this, i.e. only when downstream Endpoints call precursor.Fetch().
+	# Override FetchAsPrecursor to append the cursor to each query.
+	# However, we only want to add this functionality AFTER we've Fetched the args for *this, i.e. only when downstream Endpoints Fetch from their precursor.
 	# If the cursor prefixed query fails, return the unmodified Fetch call.
-	def Fetch(this, varName, default=None, fetchFrom=None, start=True, attempted=None):
+	def FetchAsPrecursor(this, varName, default):
 		if (this.calling):
-			if (start):
-				logging.debug(f"Fetching {varName} from {fetchFrom}...")
-			val, success = super().Fetch(f"{this.cursor}_{varName}", default, fetchFrom, False, attempted)
+			fetchFrom = [loc for loc in this.fetch.use if loc not in apie.FetchPlan.staticLocations]
+			val, success = this.Fetch(f"{this.cursor}_{varName}", default, fetchFrom, start=False)
 			if (success):
-				return val
-			return super().Fetch(varName, default, fetchFrom, False, attempted)
-		else:
-			return super().Fetch(varName, default, fetchFrom, start, attempted)
+				return val, True
+		return super().FetchAsPrecursor(varName, default)
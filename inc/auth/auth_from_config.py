@@ -3,6 +3,82 @@ import logging
 import apie
 import re
 
+# A PathMatcher answers whether a path matches any of a set of patterns, as re.match would for each pattern.
+# Patterns without any regex syntax are plain prefixes; these are stored in a trie, so checking them costs the same no matter how many there are.
+# All other patterns are combined into a single regex.
+class PathMatcher:
+
+	# Characters which make a pattern more than a literal prefix.
+	special = set('.^$*+?{}[]\\|()')
+
+	# Backreferences and conditionals.
+	groupReference = re.compile(r'\\[1-9]|\(\?P=|\(\?\(')
+
+	def __init__(this, patterns):
+		this.patterns = list(patterns)
+
+		# {character: {character: ..., }}; a node containing this.end completes a literal pattern.
+		this.trie = {}
+		this.end = object()
+
+		# The combined regex, if there is one.
+		this.regex = None
+
+		# Used instead of this.regex if the patterns could not be combined (e.g. they use backreferences).
+		this.regexes = []
+
+		expressions = []
+		for pattern in this.patterns:
+			if (any(c in this.special for c in pattern)):
+				expressions.append(pattern)
+			else:
+				this.AddLiteral(pattern)
+
+		if (not expressions):
+			return
+
+		# Group numbers change when patterns are combined, so patterns which refer to their groups must be matched separately.
+		if (any(this.groupReference.search(expression) for expression in expressions)):
+			this.regexes = [re.compile(expression) for expression in expressions]
+			return
+
+		try:
+			this.regex = re.compile('|'.join(f"(?:{expression})" for expression in expressions))
+		except re.error as e:
+			logging.debug(f"Could not combine anonymous endpoints into a single regex ({e}); matching them separately.")
+			this.regexes = [re.compile(expression) for expression in expressions]
+
+
+	def AddLiteral(this, literal):
+		node = this.trie
+		for c in literal:
+			node = node.setdefault(c, {})
+		node[this.end] = True
+
+
+	# RETURN whether or not any literal pattern is a prefix of path.
+	def MatchLiteral(this, path):
+		node = this.trie
+		if (this.end in node):
+			return True
+		for c in path:
+			node = node.get(c)
+			if (node is None):
+				return False
+			if (this.end in node):
+				return True
+		return False
+
+
+	# RETURN whether or not path matches any pattern.
+	def Match(this, path):
+		if (this.MatchLiteral(path)):
+			return True
+		if (this.regex is not None):
+			return this.regex.match(path) is not None
+		return any(regex.match(path) for regex in this.regexes)
+
+
 # The From Config Authenticator reads authentication settings from the apie.json
 class from_config(apie.Authenticator):
 	def __init__(this, name="From Config Authenticator"):
@@ -10,14 +86,45 @@ class from_config(apie.Authenticator):
 
 		this.staticKWArgs.append('anonymous_endpoints')
 
+		# The PathMatcher compiled from anonymous_endpoints (see ValidateStaticArgs).
+		this.anonymousMatcher = None
+
+		# PathMatchers by the patterns they were compiled from.
+		# Every instance of *this shares these, so the anonymous_endpoints are compiled once, not once per instance.
+		this.anonymousMatchers = apie.LRUCache(8)
+
+		# Whether or not each path recently requested can be accessed anonymously.
+		this.anonymousPaths = apie.LRUCache(4096)
+
+		this.sharedMembers.append('anonymousMatchers')
+		this.sharedMembers.append('anonymousPaths')
+
+
+	# Override of eons.Functor method. See that class for details
+	# The anonymous_endpoints are compiled here, since they are only read once.
+	def ValidateStaticArgs(this):
+		if (this.arg.valid.static):
+			return
+
+		super().ValidateStaticArgs()
+		patterns = tuple(this.anonymous_endpoints)
+		this.anonymousMatcher = this.anonymousMatchers.Get(patterns)
+		if (this.anonymousMatcher is None):
+			this.anonymousMatcher = PathMatcher(patterns)
+			this.anonymousMatchers.Set(patterns, this.anonymousMatcher)
+
 
 	def CanEndpointBeAccessedAnonymously(this):
-		for endpoint in this.anonymous_endpoints:
-			if (re.match(endpoint, this.path)):
-				logging.debug(f"Found match for {this.path} in anonymous endpoint: {endpoint}.")
-				return True
-		logging.debug(f"No match for {this.path} in anonymous endpoints.")		
-		return False
+		allowed = this.anonymousPaths.Get(this.path)
+		if (allowed is None):
+			allowed = this.anonymousMatcher.Match(this.path)
+			this.anonymousPaths.Set(this.path, allowed)
+
+		if (allowed):
+			logging.debug(f"Found match for {this.path} in anonymous endpoints.")
+		else:
+			logging.debug(f"No match for {this.path} in anonymous endpoints.")
+		return allowed
 
 	def Authenticate(this):
 		if (this.CanEndpointBeAccessedAnonymously()):
@@ -1,14 +1,35 @@
 import os
+import time
+import signal
 import logging
 import shutil
 import traceback
+import concurrent.futures
+import json
+import jsonpickle
 import eons
 import elderlang
 import eventlet
-from flask import Flask, request
-from flask_socketio import SocketIO
+from flask import Flask, Response, request, has_request_context
+from flask_socketio import SocketIO, emit
 from pathlib import Path
 from .Exceptions import *
+from .Endpoint import Endpoint
+from .Authenticator import Authenticator
+from .EndpointPool import EndpointPool
+from .AuthenticatorPool import AuthenticatorPool
+from .RequestContext import RequestContext
+from .ChainPlan import ChainPlan
+from .LRUCache import LRUCache
+from .ResponseCache import ResponseCache
+from .UploadRequest import UploadRequest
+from .PackageManifest import PackageManifest
+from .Metrics import Metrics
+from .Profiler import Profiler
+from .HTTPClient import HTTPClient
+from .Compressor import Compressor
+from .AdmissionController import AdmissionController
+from .RateLimiter import RateLimiter
 
 class APIE(elderlang.Executor):
 
@@ -28,6 +49,40 @@ class APIE(elderlang.Executor):
 		this.arg.kw.optional['preprocessor'] = ""
 		this.arg.kw.optional['socket_path'] = "socket.io"
 		this.arg.kw.optional['cors_allowed_origins'] = "*"
+		this.arg.kw.optional['endpoint_pool_size'] = 32
+		this.arg.kw.optional['plan_cache_size'] = 1024
+		this.arg.kw.optional['plan_failure_ttl'] = 60
+		this.arg.kw.optional['workers'] = 1
+		this.arg.kw.optional['worker_shutdown_timeout'] = 30
+		this.arg.kw.optional['serializer'] = "auto"
+		this.arg.kw.optional['response_cache_size'] = 0
+		this.arg.kw.optional['response_cache_ttl'] = 60
+		this.arg.kw.optional['upload_memory_threshold'] = 500 * 1024
+		this.arg.kw.optional['upload_directory'] = None
+		this.arg.kw.optional['preload'] = []
+		this.arg.kw.optional['preload_concurrency'] = 8
+		this.arg.kw.optional['offline'] = False
+		this.arg.kw.optional['package_max_age'] = None
+		this.arg.kw.optional['collect_metrics'] = True
+		this.arg.kw.optional['profile_sample_rate'] = 0.0
+		this.arg.kw.optional['profile_directory'] = "profiles"
+		this.arg.kw.optional['profile_keep'] = 50
+		this.arg.kw.optional['http_pool_size'] = 10
+		this.arg.kw.optional['http_timeout'] = 30
+		this.arg.kw.optional['http_pool_timeout'] = 10
+		this.arg.kw.optional['http_idle_timeout'] = 60
+		this.arg.kw.optional['compression_encodings'] = ['zstd', 'gzip', 'deflate']
+		this.arg.kw.optional['compression_threshold'] = 1024
+		this.arg.kw.optional['compression_types'] = None
+		this.arg.kw.optional['compression_level'] = 6
+		this.arg.kw.optional['max_in_flight'] = 0
+		this.arg.kw.optional['endpoint_max_in_flight'] = {}
+		this.arg.kw.optional['admission_queue_size'] = 64
+		this.arg.kw.optional['admission_queue_timeout'] = 1
+		this.arg.kw.optional['admission_retry_after'] = 1
+		this.arg.kw.optional['request_timeout'] = None
+		this.arg.kw.optional['rate_limits'] = []
+		this.arg.kw.optional['rate_limit_size'] = 100000
 
 		this.supportedMethods = [
 			'POST',
@@ -42,8 +97,70 @@ class APIE(elderlang.Executor):
 		this.flask = None
 		this.socket = None
 
-		# *this is single-threaded. If we want parallel processing, we can create replicas.
-		this.lastEndpoint = None
+		# Each request checks out its own Endpoints from here, so that requests can be processed concurrently.
+		this.pool = None
+
+		# Likewise, each request checks out its own Authenticator from here.
+		# They all share the state of this.auth.
+		this.authenticators = None
+
+		# Compiled ChainPlans, by (method, path).
+		this.plans = None
+
+		# The FetchPlan of each Functor class used with *this, by class (see Functor.GetFetchPlan).
+		this.fetchPlans = {}
+
+		# Responses from cacheable Endpoints (see ResponseCache).
+		# None if response_cache_size is 0.
+		this.responses = None
+
+		# Compresses responses for clients which accept it (see Compressor).
+		# None if there are no compression_encodings.
+		this.compressor = None
+
+		# How Endpoints turn their response.content.data into a json response (see Serialize).
+		# Set in Function(), based on this.serializer.
+		this.serialize = None
+
+		# Timings, status codes, etc. (see Metrics).
+		# None if collect_metrics is False.
+		this.metrics = None
+
+		# Profiles requests in dev mode (see Profiler).
+		this.profiler = None
+
+		# Limits how many requests are processed at once (see AdmissionController).
+		# None if nothing is limited.
+		this.admission = None
+
+		# For calling other services (see HTTPClient).
+		this.http = None
+
+		# The packages installed in the repo store (see LoadManifest).
+		this.manifest = None
+
+		# Clients may ask for their requests to be given up on after this many seconds (see GetDeadline).
+		this.deadlineHeader = 'X-Request-Timeout'
+
+		# Headers of the original request which are not given to the requests made through it (see ProcessSubrequest).
+		# These describe how the original request was sent, not what is being requested.
+		this.subrequestExcludedHeaders = [
+			'Accept-Encoding',
+			'Connection',
+			'Content-Length',
+			'Content-Type',
+			'If-Modified-Since',
+			'If-None-Match',
+			'Keep-Alive',
+			'Sec-Websocket-Extensions',
+			'Sec-Websocket-Key',
+			'Sec-Websocket-Version',
+			'Transfer-Encoding',
+			'Upgrade',
+		]
+
+		# When running more than 1 worker, this is {pid: start time} for each worker process.
+		this.workerProcesses = {}
 
 		this.defaultConfigFile = "apie.json"
 		this.defaultPackageType = "api"
@@ -61,32 +178,169 @@ class APIE(elderlang.Executor):
 
 
 	# Acquire and run the given endpoint with the given request.
-	def ProcessEndpoint(this, endpointName, request, **kwargs):
-
-		# Parse Endpoint syntax.
-		# "[..., ...]something" => multi(domain=[..., ...], next="something")
-		if (endpointName.startswith('[')):
+	# If prepare is given, it is called with the Endpoint once it is checked out, before it is run (e.g. see hack).
+	def ProcessEndpoint(this, endpointName, request, prepare=None, **kwargs):
+		context = kwargs.get('context')
+		if (context is None and kwargs.get('precursor') is not None):
+			context = kwargs['precursor'].context
+		if (context is None):
+			context = RequestContext(this, request)
+			kwargs['context'] = context
+
+		context.CheckDeadline(endpointName)
+
+		if (context.plan is not None and endpointName in context.plan.syntax):
+			endpointName, syntaxKWArgs = context.plan.syntax[endpointName]
+		else:
+			endpointName, syntaxKWArgs = this.ParseEndpointSyntax(endpointName)
+
+		if (syntaxKWArgs):
 			if ('domain' in kwargs):
-				raise APIError(f"Domain already exists in multicall; domain={kwargs['domain']}; multicall={endpointName}")
-
-			domainStrEndPos = endpointName.find(']')+1
-			domainStr = endpointName[:domainStrEndPos]
-			if ('next' in kwargs):
-				kwargs['next'] = [endpointName[domainStrEndPos:]].extend(kwargs['next'])
-			else:
-				kwargs['next'] = endpointName[domainStrEndPos:]
-
-			# Trim '(' and ')', then make list.
-			kwargs['domain'] = domainStr[1:-1].split(',')
-
-			endpointName = "multi"
-
-		if (endpointName in this.cachedFunctors):
-			return this.cachedFunctors[endpointName](executor=this, request=request, **kwargs)
-
-		endpoint = this.GetRegistered(endpointName, "api")
-		this.cachedFunctors.update({endpointName: endpoint})
-		return endpoint(executor=this, request=request, **kwargs)
+				raise APIError(f"Domain already exists in multicall; domain={kwargs['domain']}; multicall={syntaxKWArgs['domain']}")
+			kwargs['domain'] = syntaxKWArgs['domain']
+			kwargs['next'] = syntaxKWArgs['next'] + list(kwargs.get('next', []))
+
+		endpoint = context.Checkout(endpointName)
+		if (prepare is not None):
+			prepare(endpoint)
+
+		if (this.admission is None or endpointName in context.gates):
+			return endpoint(executor=this, request=request, **kwargs)
+
+		gate = this.admission.Enter(endpointName)
+		if (gate is not None):
+			context.gates.add(endpointName)
+		response = None
+		try:
+			response = endpoint(executor=this, request=request, **kwargs)
+			return response
+		finally:
+			if (gate is not None):
+				context.gates.discard(endpointName)
+			this.LeaveAfter(gate, response)
+
+
+	# Leave the given AdmissionGate (see AdmissionController.Enter) once the given response is done with.
+	# Streamed responses are still being made after they are returned, so their gates are only left once they are closed.
+	def LeaveAfter(this, gate, response):
+		if (gate is None):
+			return
+
+		if (response is None or isinstance(response, tuple) or not response.is_streamed):
+			this.admission.Leave(gate)
+			return
+
+		# Responses may be closed more than once, but may only leave once.
+		left = []
+		def Leave():
+			if (not left):
+				left.append(gate)
+				this.admission.Leave(gate)
+		response.call_on_close(Leave)
+
+
+	# Parse Endpoint syntax.
+	# "[..., ...]something" => multi(domain=[..., ...], next=["something"])
+	# RETURN the name of the Endpoint to call and any kwargs it should be called with.
+	def ParseEndpointSyntax(this, endpointName):
+		if (not endpointName.startswith('[')):
+			return endpointName, {}
+
+		domainStrEndPos = endpointName.find(']')+1
+		if (not domainStrEndPos):
+			raise APIError(f"Multicall domain is missing a ']': {endpointName}")
+
+		# Trim '[' and ']', then make list.
+		return "multi", {
+			'domain': endpointName[1:domainStrEndPos-1].split(','),
+			'next': [endpointName[domainStrEndPos:]],
+		}
+
+
+	# RETURN the ChainPlan for the given request.
+	# Plans are cached, so only the first request for a given method and path has to compile one.
+	def GetPlan(this, method, path):
+		plan = this.plans.Get((method, path))
+		if (plan is not None):
+			return plan
+
+		plan = this.CompilePlan(method, path)
+		if (plan.validated):
+			this.plans.Set((method, path), plan)
+		else:
+			# Endpoints may be installed later, so don't remember failures for long.
+			this.plans.Set((method, path), plan, float(this.plan_failure_ttl))
+		return plan
+
+
+	# Work out what we can about the given request before running it.
+	# If the plan can't be validated (e.g. because it calls an Endpoint that doesn't exist), the error is kept in the plan, to be raised for each request (see HandleRequest).
+	def CompilePlan(this, method, path):
+		plan = ChainPlan(method, path)
+		if (this.preprocessor):
+			plan.endpoints.append(this.preprocessor)
+		if (path.endswith('/')):
+			path = path[:-1]
+		plan.endpoints.extend(path.split('/'))
+
+		try:
+			# The Endpoints that will actually be called, in order.
+			sequence = []
+			toParse = list(plan.endpoints)
+			while (toParse):
+				name = toParse.pop(0)
+				endpointName, syntaxKWArgs = this.ParseEndpointSyntax(name)
+				plan.syntax[name] = (endpointName, syntaxKWArgs)
+				sequence.append(endpointName)
+				if (syntaxKWArgs):
+					toParse = syntaxKWArgs['next'] + toParse
+
+			for i, endpointName in enumerate(sequence):
+				plan.failedEndpoint = None
+				plan.classes[endpointName] = this.pool.GetClass(endpointName)
+				plan.failedEndpoint = endpointName
+				prototype = this.pool.GetPrototype(endpointName)
+				if (method not in prototype.supportedMethods):
+					raise OtherAPIError(f"Method not supported: {method}")
+				if (i+1 < len(sequence)):
+					prototype.ValidateNext(sequence[i+1])
+					plan.transitions.add((prototype.__class__, sequence[i+1]))
+
+			plan.failedEndpoint = None
+			plan.validated = True
+		except Exception as e:
+			logging.debug(f"Could not validate plan for {method} {path}: {e}")
+			plan.error = e
+
+		return plan
+
+
+	# Turn the given response data into json.
+	# RETURN the json as bytes.
+	def Serialize(this, data):
+		return this.serialize(data)
+
+
+	# Plain json.
+	# Much faster than jsonpickle, but only works for dicts, lists, strings, numbers, etc.
+	def SerializeJson(this, data):
+		return json.dumps(data).encode('utf-8')
+
+
+	# jsonpickle can handle arbitrary objects but is slow.
+	def SerializeJsonpickle(this, data):
+		# Dict subclasses (e.g. DotDicts) would otherwise be pickled as objects.
+		if (isinstance(data, dict)):
+			data = dict(data)
+		return jsonpickle.encode(data).encode('utf-8')
+
+
+	# Use plain json when we can and jsonpickle when we can't.
+	def SerializeAuto(this, data):
+		try:
+			return this.SerializeJson(data)
+		except (TypeError, ValueError):
+			return this.SerializeJsonpickle(data)
 
 
 	# What to do when a request causes an exception to be thrown.
@@ -99,15 +353,51 @@ class APIE(elderlang.Executor):
 	def Function(this):
 		super().Function()
 
+		stale = this.LoadManifest()
 		if (this.clean_start):
 			this.Clean()
 
 		if (this.external_port is None):
 			this.external_port = this.port
 
+		this.pool = EndpointPool(this, this.endpoint_pool_size)
+		admission = AdmissionController(int(this.max_in_flight), this.endpoint_max_in_flight, int(this.admission_queue_size), float(this.admission_queue_timeout), this.admission_retry_after)
+		if (admission.IsLimiting()):
+			this.admission = admission
+		this.http = HTTPClient(int(this.http_pool_size), float(this.http_timeout), float(this.http_pool_timeout), float(this.http_idle_timeout))
+		if (this.collect_metrics):
+			this.metrics = Metrics(this)
+
+		# Profiling exposes the internals of *this, so, like hacking, it is only allowed in development.
+		if (this.dev):
+			this.profiler = Profiler(this.profile_directory, this.profile_sample_rate, this.profile_keep)
+		this.Preload(stale)
+
 		this.auth = this.GetRegistered(this.authenticator, "auth")
+		rateLimiter = RateLimiter(this.rate_limits, int(this.rate_limit_size))
+		if (rateLimiter.IsLimiting()):
+			this.auth.rateLimiter = rateLimiter
+		this.authenticators = AuthenticatorPool(this.auth, this.endpoint_pool_size)
+		this.plans = LRUCache(this.plan_cache_size)
+
+		if (this.compression_encodings):
+			this.compressor = Compressor(this.compression_encodings, int(this.compression_threshold), this.compression_types, int(this.compression_level))
+
+		if (this.response_cache_size > 0):
+			this.responses = ResponseCache(this.response_cache_size, this.response_cache_ttl, this.compressor, this.auth.credentialHeaders)
+
+		this.serialize = getattr(this, f"Serialize{this.serializer.capitalize()}", None)
+		if (this.serialize is None):
+			raise APIError(f"Unknown serializer: {this.serializer}")
+
+		if (this.upload_directory):
+			Path(this.upload_directory).mkdir(parents=True, exist_ok=True)
 
 		this.flask = Flask(this.name)
+		this.flask.request_class = type('UploadRequest', (UploadRequest,), {
+			'memoryThreshold': int(this.upload_memory_threshold),
+			'directory': this.upload_directory,
+		})
 		this.socket = SocketIO(
 			this.flask,
 			path=this.socket_path,
@@ -127,6 +417,12 @@ class APIE(elderlang.Executor):
 		def handle_disconnect():
 			logging.info(f"Client disconnected: {request.sid}")
 
+		# Let clients make requests without making a new HTTP request for each.
+		# Each call is handled in its own green thread, so a client may have any number in flight at once; responses are matched to calls by their 'id'.
+		@this.socket.on('call')
+		def handle_call(message):
+			emit('response', this.ProcessSocketCall(request, message))
+
 
 		@this.flask.route("/", defaults={"path": ""}, methods = this.supportedMethods)
 		def root(path):
@@ -135,45 +431,7 @@ class APIE(elderlang.Executor):
 		@this.flask.route("/<string:path>", methods = this.supportedMethods)
 		@this.flask.route("/<path:path>", methods = this.supportedMethods)
 		def handler(path):
-			try:
-				if (this.auth(executor=this, path=path, request=request)):
-					endpoints = []
-					if (this.preprocessor):
-						endpoints.append(this.preprocessor)
-					if (path.endswith('/')):
-						path = path[:-1]
-					endpoints.extend(path.split('/'))
-					this.lastEndpoint = None
-					
-					logging.debug(f"Responding to {request} request for {path}...")
-					try:
-						logging.debug(f"...with files: {request.files}")
-					except:
-						pass
-					try:
-						logging.debug(f"...with forms: {request.form}")
-					except:
-						pass
-					try:
-						logging.debug(f"...with json: {request.json}")
-					except:
-						pass
-					
-					response = this.ProcessEndpoint(endpoints.pop(0), request, next=endpoints)
-					logging.debug(f"Got headers: {response.headers}")
-					logging.debug(f"Got response: {response}")
-					return response
-				else:
-					return this.auth.Unauthorized(path)
-			except Exception as error:
-				traceback.print_exc()
-				logging.error(str(error))
-				if (this.lastEndpoint):
-					try:
-						return this.lastEndpoint.HandleBadRequest(request, error)
-					except Exception:
-						pass
-				return this.HandleBadRequest(request, error) #fine. We'll do it ourselves.
+			return this.ProcessRequest(request, path)
 
 		# options = {}
 		# options['app'] = this.flask
@@ -193,15 +451,558 @@ class APIE(elderlang.Executor):
 
 		# For eventlet.
 		# Doesn't use options
-		eventlet.wsgi.server(eventlet.listen((this.host, this.port)), this.flask)
+		this.Serve(eventlet.listen((this.host, this.port)))
+
+
+	# RETURN the (name, packageType) of each package in this.preload.
+	# Packages are given as "name" for Endpoints or "name.type" for other types (e.g. "my_auth.auth").
+	# "all" means every Endpoint and Authenticator already known to *this.
+	def GetPreloadPackages(this):
+		preload = this.preload
+		if (isinstance(preload, str)):
+			if (preload == "all"):
+				packages = [(cls.__name__, "api") for cls in Endpoint.GetSubclasses()]
+				packages += [(cls.__name__, "auth") for cls in Authenticator.GetSubclasses()]
+				return list(dict.fromkeys(packages))
+			preload = [preload]
+
+		return [this.ParsePackageName(package) for package in preload]
+
+
+	# RETURN the (name, packageType) of the given package name (e.g. "my_auth.auth" => ("my_auth", "auth")).
+	# Names without a type are Endpoints.
+	def ParsePackageName(this, package):
+		name, dot, packageType = package.rpartition('.')
+		if (not dot):
+			return package, this.defaultPackageType
+		return name, packageType
+
+
+	# Get every package in this.preload ready before we start serving requests, so that the first request for each doesn't have to.
+	# Packages which aren't yet registered are downloaded in parallel, then registered 1 at a time.
+	# If any package can't be made ready, we fail immediately.
+	# Any additional packages given (e.g. those which were stale) are treated as if they were in this.preload.
+	def Preload(this, additional=None):
+		packages = this.GetPreloadPackages()
+		if (additional):
+			packages = list(dict.fromkeys(packages + [this.ParsePackageName(package) for package in additional]))
+		if (not packages):
+			return
+
+		logging.info(f"Preloading {len(packages)} packages")
+		started = time.perf_counter()
+		timing = {package: {} for package in packages}
+
+		missing = []
+		for name, packageType in packages:
+			try:
+				eons.SelfRegistering.GetClass(name)
+			except Exception:
+				missing.append((name, packageType))
+
+		if (missing):
+			with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, int(this.preload_concurrency))) as threads:
+				downloads = {threads.submit(this.DownloadForPreload, name, packageType): (name, packageType) for name, packageType in missing}
+				for download in concurrent.futures.as_completed(downloads):
+					package = downloads[download]
+					try:
+						timing[package]['download'] = download.result()
+					except Exception as e:
+						for pending in downloads.keys():
+							pending.cancel()
+						raise APIError(f"Could not preload {package[0]}.{package[1]}: {e}")
+
+			# Registering runs the package's code, which isn't safe to do in parallel.
+			for name, packageType in missing:
+				registerStarted = time.perf_counter()
+				this.RegisterAllClassesInDirectory(str(this.manifest.GetDirectory(f"{name}.{packageType}")))
+				timing[(name, packageType)]['register'] = time.perf_counter() - registerStarted
+			this.manifest.Save()
+
+		for name, packageType in packages:
+			loadStarted = time.perf_counter()
+			try:
+				if (packageType == "api"):
+					this.pool.GetPrototype(name)
+				else:
+					this.GetRegistered(name, packageType)
+			except Exception as e:
+				raise APIError(f"Could not preload {name}.{packageType}: {e}")
+			timing[(name, packageType)]['load'] = time.perf_counter() - loadStarted
+
+		for (name, packageType), times in timing.items():
+			logging.info(f"Preloaded {name}.{packageType} in {sum(times.values()):.3f}s ({', '.join([f'{step}: {seconds:.3f}s' for step, seconds in times.items()])})")
+		logging.info(f"Preloaded {len(packages)} packages in {time.perf_counter() - started:.3f}s")
+
+
+	# Make sure the given package is in the repo store, downloading it if necessary.
+	# Each package gets its own directory, so that they can be registered separately.
+	# RETURN how long it took.
+	def DownloadForPreload(this, name, packageType):
+		started = time.perf_counter()
+		packageName = f"{name}.{packageType}"
+		if (not this.manifest.GetDirectory(packageName).is_dir()):
+			if (not this.DownloadPackage(packageName, registerClasses=False, createSubDirectory=True)):
+				raise APIError(f"{packageName} could not be downloaded")
+		if (packageName not in this.manifest.packages):
+			this.manifest.Record(packageName)
+		return time.perf_counter() - started
+
+
+	# Override of eons.Executor method. See that class for details
+	# Every package is put in its own directory in the repo store and recorded in the manifest, including those installed while serving (e.g. by GetRegistered); otherwise, Clean would remove them.
+	def DownloadPackage(this, packageName, registerClasses=True, createSubDirectory=False):
+		if (this.manifest is None):
+			return super().DownloadPackage(packageName, registerClasses, createSubDirectory)
+
+		if (not super().DownloadPackage(packageName, registerClasses=False, createSubDirectory=True)):
+			return False
+
+		this.manifest.Record(packageName)
+		this.manifest.Save()
+		if (registerClasses):
+			this.RegisterAllClassesInDirectory(str(this.manifest.GetDirectory(packageName)))
+		return True
+
+
+	# Accept connections on the given socket until we are told to stop.
+	# With more than 1 worker, *this becomes the master of that many forked worker processes, each of which accepts connections on the same socket.
+	# Workers are forked after all Endpoints, etc. have been registered, so they don't need to do that work again.
+	def Serve(this, sock):
+		if (this.workers <= 1):
+			eventlet.wsgi.server(sock, this.flask)
+			return
+
+		if (not hasattr(os, 'fork')):
+			logging.warning(f"Cannot fork workers on this platform; serving with a single process.")
+			eventlet.wsgi.server(sock, this.flask)
+			return
+
+		this.Prefork(sock)
+
+
+	# Start this.workers workers and keep them running until we receive SIGTERM or SIGINT.
+	# Workers which exit while we are running are restarted.
+	def Prefork(this, sock):
+		stopping = False
+		def Stop(signum, frame):
+			nonlocal stopping
+			stopping = True
+
+		signal.signal(signal.SIGTERM, Stop)
+		signal.signal(signal.SIGINT, Stop)
+
+		logging.info(f"Starting {this.workers} workers on {this.host}:{this.port}")
+		for i in range(this.workers):
+			this.SpawnWorker(sock)
+
+		while (not stopping):
+			try:
+				pid, status = os.waitpid(-1, os.WNOHANG)
+			except ChildProcessError:
+				pid = 0
+
+			if (not pid):
+				time.sleep(0.5)
+				continue
+
+			started = this.workerProcesses.pop(pid, None)
+			if (started is None or stopping):
+				continue
+
+			logging.error(f"Worker {pid} exited with status {status}; restarting it.")
+
+			# Don't spin if workers are dying as soon as they start.
+			if (time.time() - started < 1):
+				time.sleep(1)
+
+			this.SpawnWorker(sock)
+
+		this.StopWorkers()
+
+
+	# Fork a new worker process which serves requests from the given socket.
+	def SpawnWorker(this, sock):
+		pid = os.fork()
+		if (pid):
+			this.workerProcesses[pid] = time.time()
+			return pid
+
+		# We are the worker now.
+		# The master decides when we stop; Ctrl+C is delivered to the whole process group, so leave it to the master.
+		def Exit(signum, frame):
+			raise SystemExit()
+
+		signal.signal(signal.SIGINT, signal.SIG_IGN)
+		signal.signal(signal.SIGTERM, Exit)
+
+		# Connections opened before forking are shared with the other workers, so don't use them.
+		this.http.Close()
+
+		code = 0
+		try:
+			# Finishes all in-progress requests before returning.
+			eventlet.wsgi.server(sock, this.flask)
+		except BaseException as e:
+			logging.error(f"Worker {os.getpid()} failed: {e}")
+			code = 1
+		os._exit(code)
+
+
+	# Tell all workers to finish what they're doing and exit.
+	# Workers which take longer than this.worker_shutdown_timeout are killed.
+	def StopWorkers(this):
+		logging.info(f"Stopping {len(this.workerProcesses)} workers")
+		for pid in this.workerProcesses.keys():
+			try:
+				os.kill(pid, signal.SIGTERM)
+			except ProcessLookupError:
+				pass
+
+		deadline = time.time() + this.worker_shutdown_timeout
+		while (this.workerProcesses and time.time() < deadline):
+			try:
+				pid, status = os.waitpid(-1, os.WNOHANG)
+			except ChildProcessError:
+				break
+			if (not pid):
+				time.sleep(0.1)
+				continue
+			this.workerProcesses.pop(pid, None)
+
+		for pid in this.workerProcesses.keys():
+			logging.warning(f"Worker {pid} did not stop in time; killing it.")
+			try:
+				os.kill(pid, signal.SIGKILL)
+				os.waitpid(pid, 0)
+			except (ProcessLookupError, ChildProcessError):
+				pass
+		this.workerProcesses.clear()
+
+
+	# Authenticate the given request and run the Endpoints in its path.
+	# Each call gets its own RequestContext, so this may be called for many requests at once.
+	# Requests made through other requests (e.g. by batch) have already been admitted, so they should not be admitted again (i.e. admit=False).
+	def ProcessRequest(this, request, path, admit=True):
+		gate = None
+		if (admit and this.admission is not None):
+			try:
+				gate = this.admission.Enter('')
+			except Overloaded as error:
+				if (this.metrics is not None):
+					this.metrics.CountStatus(503)
+				return this.admission.Reject(error)
+
+		response = None
+		try:
+			response = this.ProcessAdmittedRequest(request, path)
+			return response
+		finally:
+			this.LeaveAfter(gate, response)
+
+
+	# Do the work of ProcessRequest, once the request has been admitted.
+	def ProcessAdmittedRequest(this, request, path):
+		if (this.profiler is not None and this.profiler.ShouldProfile(request)):
+			return this.ProfileRequest(request, path)
+
+		if (this.metrics is None):
+			return this.HandleRequest(request, path)
+
+		started = time.perf_counter()
+		response = this.HandleRequest(request, path)
+		this.metrics.Observe('request', time.perf_counter() - started)
+		this.metrics.CountStatus(this.GetStatusCode(response))
+		return response
+
+
+	# Process the given request under this.profiler.
+	# The response says where the profile was saved.
+	# The Endpoint classes are given as a view, so that Endpoints first used by this request are summarized too.
+	def ProfileRequest(this, request, path):
+		response, profilePath = this.profiler.Profile(f"{request.method} {path}", this.pool.classes.values(), this.HandleRequest, request, path)
+		if (profilePath is not None and not isinstance(response, tuple)):
+			response.headers[Profiler.header] = profilePath.name
+		return response
+
+
+	# RETURN the status code of the given response, which may be a Flask Response or a (message, code) tuple.
+	def GetStatusCode(this, response):
+		if (isinstance(response, tuple)):
+			return response[1]
+		return response.status_code
+
+
+	# RETURN when the given request must be finished by (see RequestContext.deadline) or None, if it may take as long as it likes.
+	# Requests are given request_timeout seconds; clients may ask for less (but not more) with the deadlineHeader.
+	def GetDeadline(this, request):
+		timeout = None
+		if (this.request_timeout is not None):
+			timeout = float(this.request_timeout)
+
+		requested = request.headers.get(this.deadlineHeader)
+		if (requested):
+			try:
+				requested = float(requested)
+			except ValueError:
+				raise OtherAPIError(f"{this.deadlineHeader} must be a number of seconds; got: {requested}")
+			if (requested > 0 and (timeout is None or requested < timeout)):
+				timeout = requested
+
+		if (timeout is None):
+			return None
+		return time.monotonic() + timeout
+
+
+	# Tell the client how close it is to its rate limit (see Authenticator.Limit).
+	# RETURN the given response.
+	def AddRateLimitHeaders(this, context, response):
+		if (context.rateLimit is not None and response is not None and not isinstance(response, tuple)):
+			response.headers.update(this.auth.rateLimiter.GetHeaders(context.rateLimit[1]))
+		return response
+
+
+	# RETURN the response for a request which was not finished by its deadline.
+	def HandleExpiredRequest(this, request, error):
+		return Response(
+			response = f"Gateway timeout: {error}\n",
+			status = 504,
+			mimetype = 'text/plain'
+		)
+
+
+	# Do the work of ProcessRequest.
+	def HandleRequest(this, request, path):
+		context = RequestContext(this, request)
+
+		# Streamed responses keep using their Endpoints after we return; those are released once the stream is closed instead.
+		release = True
+
+		# Interrupts the request once its deadline has passed.
+		timer = None
+		try:
+			context.deadline = this.GetDeadline(request)
+			if (context.deadline is not None):
+				timer = eventlet.Timeout(context.GetRemainingTime(), DeadlineExceeded(f"Request for {path} was not finished by its deadline"))
+
+			started = time.perf_counter()
+			authenticator = this.authenticators.Checkout()
+			try:
+				authenticated = authenticator(executor=this, path=path, request=request, context=context)
+			finally:
+				this.authenticators.Checkin(authenticator)
+			if (this.metrics is not None):
+				this.metrics.Observe('auth', time.perf_counter() - started)
+
+			if (authenticated):
+				# Responses are only looked up after authenticating, so that cached responses are never given to someone who couldn't get them otherwise.
+				cacheKey = None
+				if (this.responses is not None and request.method == 'GET'):
+					cacheKey = this.responses.GetKey(request, path)
+					cached = this.responses.Get(cacheKey)
+					if (cached is not None):
+						logging.debug(f"Responding to {request} request for {path} from cache")
+						return this.AddRateLimitHeaders(context, this.responses.Respond(request, cached))
+
+				started = time.perf_counter()
+				context.plan = this.GetPlan(request.method, path)
+				endpoints = list(context.plan.endpoints)
+				if (this.metrics is not None):
+					this.metrics.Observe('plan', time.perf_counter() - started)
+
+				# Requests which can't be run fail as the Endpoint which would have failed would fail them, but without running anything.
+				if (context.plan.error is not None):
+					if (context.plan.failedEndpoint is not None):
+						context.endpoint = context.Checkout(context.plan.failedEndpoint)
+					raise context.plan.error.with_traceback(None)
+
+				# Logging the request data requires parsing it, so only do so when we're going to log it.
+				if (logging.getLogger().isEnabledFor(logging.DEBUG)):
+					logging.debug(f"Responding to {request} request for {path}...")
+					for field in ['files', 'form', 'json']:
+						try:
+							logging.debug(f"...with {field}: {context.GetRequestData(field)}")
+						except:
+							pass
+
+				response = this.ProcessEndpoint(endpoints.pop(0), request, context=context, next=endpoints)
+				logging.debug(f"Got headers: {response.headers}")
+				logging.debug(f"Got response: {response}")
+
+				if (response is not None and response.is_streamed):
+					response.call_on_close(context.Release)
+					release = False
+					return this.AddRateLimitHeaders(context, response)
+
+				if (cacheKey is not None and context.endpoint and context.endpoint.cacheable):
+					cached = this.responses.Store(cacheKey, response)
+					if (cached is not None):
+						return this.AddRateLimitHeaders(context, this.responses.Respond(request, cached))
+
+				if (response is not None and this.compressor is not None):
+					response = this.compressor.CompressResponse(request, response)
+				return this.AddRateLimitHeaders(context, response)
+			else:
+				return this.auth.Unauthorized(path)
+		except Overloaded as error:
+			return this.admission.Reject(error)
+		except RateLimited as error:
+			return this.auth.rateLimiter.Reject(error, context.rateLimit)
+		except DeadlineExceeded as error:
+			logging.warning(f"{request.method} {path}: {error}")
+			if (this.metrics is not None):
+				this.metrics.CountError(error, context.endpoint.__class__.__name__ if context.endpoint else '')
+			return this.HandleExpiredRequest(request, error)
+		except Exception as error:
+			traceback.print_exc()
+			logging.error(str(error))
+			if (this.metrics is not None):
+				this.metrics.CountError(error, context.endpoint.__class__.__name__ if context.endpoint else '')
+			if (context.endpoint):
+				try:
+					return context.endpoint.HandleBadRequest(request, error)
+				except Exception:
+					pass
+			return this.HandleBadRequest(request, error) #fine. We'll do it ourselves.
+		finally:
+			if (timer is not None):
+				timer.cancel()
+			if (release):
+				context.Release()
+
+
+	# Make a request through the given Socket.IO request.
+	# The message should be {'id': ..., 'path': ..., 'method': ..., 'headers': {...}, 'query': {...}, 'data': ...}, where only 'path' is required (see ProcessSubrequest).
+	# The call is authenticated with the headers the socket was opened with, along with any headers given in the message.
+	# RETURN the response (see GetSubresponse), with the message's id.
+	def ProcessSocketCall(this, request, message):
+		if (isinstance(message, str)):
+			message = {'path': message}
+
+		# Even bad calls are answered with their id, so that the client knows which failed.
+		callId = message.get('id') if isinstance(message, dict) else None
+		try:
+			if (not isinstance(message, dict) or 'path' not in message):
+				raise APIError(f"Calls must be a path or an object with a 'path'; got: {message}")
+			response = this.ProcessSubrequest(
+				message['path'],
+				method = message.get('method', 'GET'),
+				headers = message.get('headers'),
+				query = message.get('query'),
+				data = message.get('data'),
+				inherit = request.headers,
+				admit = True,
+			)
+		except Exception as error:
+			logging.error(f"Could not process call over socket: {error}")
+			response = {'status': 400, 'headers': {}, 'body': f"Bad request: {str(error)}"}
+
+		response['id'] = callId
+		return response
+
+
+	# Process a request which wasn't made (directly) over HTTP, as if it had been.
+	# The request is handled just like any other (i.e. by ProcessRequest), so it is authenticated, cached, etc. as usual.
+	# Headers to inherit (e.g. from the HTTP request this one was made through) are used unless overridden by the given headers (see subrequestExcludedHeaders).
+	# data may be anything json serializable or bytes / a string for a raw body.
+	# If the request this one was made through has already been admitted (see ProcessRequest), admit should be False.
+	# RETURN the response (see GetSubresponse).
+	def ProcessSubrequest(this, path, method='GET', headers=None, query=None, data=None, inherit=None, admit=False):
+		method = str(method).upper()
+		if (method not in this.supportedMethods):
+			return {'status': 405, 'headers': {}, 'body': f"Method not supported: {method}"}
+
+		excluded = [header.lower() for header in this.subrequestExcludedHeaders]
+		subrequestHeaders = {name: value for name, value in (inherit or {}).items() if name.lower() not in excluded}
+		subrequestHeaders.update(headers or {})
+
+		environ = {}
+		if (isinstance(data, (bytes, str))):
+			environ['data'] = data
+		elif (data is not None):
+			environ['json'] = data
+
+		# Requests made through another come from the same client (e.g. for rate limiting).
+		if (has_request_context() and request.remote_addr):
+			environ['environ_base'] = {'REMOTE_ADDR': request.remote_addr}
+
+		path = str(path).strip('/')
+		with this.flask.test_request_context(f"/{path}", method=method, headers=subrequestHeaders, query_string=query, **environ):
+			return this.GetSubresponse(this.ProcessRequest(request._get_current_object(), path, admit))
+
+
+	# RETURN the given response, which may be a Flask Response or a (message, code) tuple, as {'status': ..., 'headers': {...}, 'body': ...}.
+	# json bodies are parsed (ndjson bodies become lists), so they can be sent on as they are; other text is decoded; anything else is left as bytes.
+	def GetSubresponse(this, response):
+		if (isinstance(response, tuple)):
+			return {'status': response[1], 'headers': {}, 'body': response[0]}
+
+		try:
+			if (response.is_streamed):
+				body = b''.join(chunk.encode('utf-8') if isinstance(chunk, str) else chunk for chunk in response.response)
+			else:
+				body = response.get_data()
+		finally:
+			# Streamed responses release their Endpoints when closed.
+			response.close()
+
+		mimetype = response.mimetype
+		try:
+			if (mimetype == 'application/json'):
+				body = json.loads(body) if body else None
+			elif (mimetype == 'application/x-ndjson'):
+				body = [json.loads(line) for line in body.splitlines() if line.strip()]
+			elif (mimetype.startswith('text/')):
+				body = body.decode(response.mimetype_params.get('charset', 'utf-8'))
+		except ValueError:
+			pass
+
+		return {'status': response.status_code, 'headers': dict(response.headers), 'body': body}
+
+
+	# Remove cached responses for the given path (and everything under it) or all cached responses, if no path is given.
+	# Call this after changing something a cacheable Endpoint returns.
+	# RETURN how many responses were removed.
+	def InvalidateResponses(this, path=None):
+		if (this.responses is None):
+			return 0
+		return this.responses.Invalidate(path)
+
+
+	# Forget the values Functors have Fetched from *this and the environment.
+	# Those values are remembered, since they don't usually change; call this after changing any of them while serving.
+	def InvalidateFetches(this):
+		for plan in list(this.fetchPlans.values()):
+			plan.Clear()
+
+
+	# Read the manifest of installed packages and register those which are still valid.
+	# Packages which have changed since they were installed (or are older than package_max_age) are removed.
+	# If offline, the manifest is trusted and nothing is downloaded.
+	# RETURN the names of the removed packages, so that they can be downloaded again.
+	def LoadManifest(this):
+		this.manifest = PackageManifest(this.repo['store'])
+		this.manifest.Load()
+
+		if (this.offline):
+			this.repo['online'] = False
+
+		started = time.perf_counter()
+		valid, stale = this.manifest.Validate(trust=this.offline, maxAge=this.package_max_age)
+		for packageName in valid:
+			this.RegisterAllClassesInDirectory(str(this.manifest.GetDirectory(packageName)))
+		if (stale):
+			this.manifest.Save()
+
+		logging.info(f"Validated {len(valid)} installed packages in {time.perf_counter() - started:.3f}s; {len(stale)} will be downloaded again.")
+		return stale
 
 
 	# Remove possibly stale modules.
+	# Only packages which aren't in the manifest are removed (see LoadManifest for how stale packages are handled).
 	def Clean(this):
-		repoPath = Path(this.repo['store'])
-		if (repoPath.exists()):
-			shutil.rmtree(this.repo['store'])
-		repoPath.mkdir(parents=True, exist_ok=True)
+		Path(this.repo['store']).mkdir(parents=True, exist_ok=True)
+		this.manifest.RemoveUntracked()
 
 
 	# Helper function to get the URL for the web socket.
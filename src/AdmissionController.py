@@ -0,0 +1,109 @@
+import time
+import logging
+from flask import Response
+from eventlet.semaphore import Semaphore
+from .Exceptions import *
+
+# An AdmissionGate limits how many requests may be in 1 place (all of APIE or a single Endpoint) at once.
+class AdmissionGate:
+	def __init__(this, name, limit):
+		this.name = name
+		this.limit = limit
+		this.semaphore = Semaphore(limit)
+
+		# How many requests are waiting to get in.
+		this.waiting = 0
+
+		this.admitted = 0
+		this.queued = 0
+		this.waitSeconds = 0.0
+
+		# How many requests were turned away, by reason.
+		this.shed = {
+			'queue_full': 0,
+			'queue_timeout': 0,
+		}
+
+	# RETURN how many requests are in.
+	def GetInFlight(this):
+		return this.limit - this.semaphore.counter
+
+
+# The AdmissionController keeps APIE from taking on more requests than it can handle.
+# Without it, every request is started as soon as it arrives, so, when overloaded, every request slows down until they all time out.
+# With it, at most limit requests are processed at once (and at most endpointLimits[name] by each named Endpoint).
+# Requests beyond that wait in a short queue; if the queue is full or they wait too long, they are turned away immediately with a 503, so that the requests we do take on are still answered quickly.
+class AdmissionController:
+	def __init__(this, limit=0, endpointLimits=None, queueSize=64, queueTimeout=1.0, retryAfter=1):
+		# {name: AdmissionGate}, where the name '' is all of APIE.
+		# Only limited places have gates.
+		this.gates = {}
+		if (limit > 0):
+			this.gates[''] = AdmissionGate('', limit)
+		for name, endpointLimit in (endpointLimits or {}).items():
+			if (int(endpointLimit) > 0):
+				this.gates[name] = AdmissionGate(name, int(endpointLimit))
+
+		# How many requests may wait for each gate.
+		this.queueSize = queueSize
+
+		# How many seconds a request may wait for a gate.
+		this.queueTimeout = queueTimeout
+
+		# How many seconds to tell clients to wait before trying again.
+		this.retryAfter = retryAfter
+
+
+	# RETURN whether or not *this limits anything.
+	def IsLimiting(this):
+		return len(this.gates) > 0
+
+
+	# Let a request into the given place ('' for all of APIE or the name of an Endpoint), waiting if necessary.
+	# Call Leave() with the result when the request is done there.
+	# RETURN the gate entered or None, if the place isn't limited.
+	# Raises Overloaded if the request can't get in.
+	def Enter(this, name):
+		gate = this.gates.get(name)
+		if (gate is None):
+			return None
+
+		if (gate.semaphore.acquire(blocking=False)):
+			gate.admitted += 1
+			return gate
+
+		if (gate.waiting >= this.queueSize):
+			gate.shed['queue_full'] += 1
+			raise Overloaded(f"Too many requests waiting for {name or 'APIE'}")
+
+		gate.waiting += 1
+		gate.queued += 1
+		started = time.perf_counter()
+		try:
+			acquired = gate.semaphore.acquire(timeout=this.queueTimeout)
+		finally:
+			gate.waiting -= 1
+			gate.waitSeconds += time.perf_counter() - started
+
+		if (not acquired):
+			gate.shed['queue_timeout'] += 1
+			raise Overloaded(f"Timed out waiting for {name or 'APIE'}")
+
+		gate.admitted += 1
+		return gate
+
+
+	def Leave(this, gate):
+		if (gate is not None):
+			gate.semaphore.release()
+
+
+	# RETURN the response for a request which could not get in.
+	def Reject(this, error):
+		logging.debug(f"Shedding request: {error}")
+		return Response(
+			response = f"Service unavailable: {error}\n",
+			status = 503,
+			headers = {'Retry-After': str(int(this.retryAfter))},
+			mimetype = 'text/plain'
+		)
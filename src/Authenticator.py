@@ -2,22 +2,57 @@ import os
 import logging
 import shutil
 import jsonpickle
+import hashlib
 from pathlib import Path
 import eons
 from .Exceptions import *
 from .Functor import Functor
+from .LRUCache import LRUCache
 
 # Authenticator is a Functor which validates whether or not a request is valid.
 # The inputs will be the path of the request and the request itself.
 # If you need to check whether the request parameters, data, files, etc. are valid, please do so in your Endpoint.
 # Because this class will be invoked often, we have made some performant modifications to the default Functor methods.
 # Authenticators may be called sequentially but in such a case, only the last Authenticator will Authenticate(), all precursors are skipped over.
+# Each request is authenticated by its own instance of *this (see AuthenticatorPool), so anything which should last between requests must be listed in sharedMembers.
 # NOTE: All logic for *this should be in Authenticate. There are no extra functions called (e.g. PreCall, PostCall, etc.)
 # Authenticate should either return False or raise an exception if the provided request is invalid and should return True if it is.
+# If checking credentials is slow (e.g. it requires asking another server), set cacheCredentials to True and *this will remember its decisions for each set of credentials (see GetCredentialKey).
+# If the executor has rate_limits, *this also turns away clients which make requests too often, before any authentication is done (see Limit).
 class Authenticator(Functor):
 	def __init__(this, name="Authenticator"):
 		super().__init__(name)
 
+		# Remember whether or not each set of credentials was authenticated, so repeat callers can skip Authenticate().
+		# Only enable this if Authenticate() depends on nothing but the credentialHeaders and the path.
+		this.cacheCredentials = False
+
+		# The request headers which contain the credentials.
+		this.credentialHeaders = [
+			'Authorization',
+		]
+
+		# How many decisions to remember.
+		this.credentialCacheSize = 1024
+
+		# How many seconds to remember successful and failed authentications for.
+		this.credentialTTL = 300
+		this.credentialFailureTTL = 30
+
+		# The remembered decisions, if cacheCredentials is True (see Initialize).
+		this.credentials = None
+
+		# Limits how often each client may make requests (see RateLimiter).
+		# Set by the executor from its rate_limits; None if there are none.
+		this.rateLimiter = None
+
+		# Members which are shared by every instance of *this, rather than being kept for each request (see Share).
+		# If your Authenticator remembers anything between requests (e.g. a history of each user's requests), append it here.
+		this.sharedMembers = [
+			'credentials',
+			'rateLimiter',
+		]
+
 	# Override of eons.Functor method. See that class for details
 	# NOTE: All logic for *this should be in Authenticate. There are no extra functions called (e.g. PreCall, PostCall, etc.)
 	# Authenticate should either return False or raise an exception if the provided request is invalid and should return True if it is.
@@ -29,6 +64,130 @@ class Authenticator(Functor):
 		logging.debug(f"Unauthorized: {this.name} on {path}")
 		return "Unauthorized", 401
 
+	# Override of eons.Functor method. See that class for details
+	def Initialize(this):
+		super().Initialize()
+		this.PrepareCredentialCache()
+
+
+	def PrepareCredentialCache(this):
+		if (this.cacheCredentials and this.credentials is None):
+			this.credentials = LRUCache(this.credentialCacheSize)
+
+
+	# Give the given Authenticator (of the same class as *this) each of this.sharedMembers.
+	# Called by the AuthenticatorPool, so that each request can have its own Authenticator.
+	def Share(this, authenticator):
+		this.PrepareCredentialCache()
+		for member in this.sharedMembers:
+			authenticator.ResetAttr(member, getattr(this, member))
+
+
+	# Drop everything *this knows about the request it was last used for.
+	# Called when *this is returned to the executor's AuthenticatorPool.
+	def ReleaseRequest(this):
+		this.ResetAttr('args', [])
+		this.ResetAttr('kwargs', {})
+		this.ResetAttr('precursor', None)
+		this.ResetAttr('next', [])
+		this.request = None
+		this.context = None
+		this.path = None
+
+
+	# RETURN a fingerprint of the credentials in the given headers (e.g. request.headers).
+	# The credentials themselves are never stored.
+	def GetCredentialFingerprint(this, headers):
+		credentials = '\n'.join(f"{header}:{headers.get(header, '')}" for header in this.credentialHeaders)
+		return hashlib.sha256(credentials.encode('utf-8')).hexdigest()
+
+
+	# RETURN the key to remember the decision for the given request by, or None if the decision should not be remembered.
+	# The key must start with the credential fingerprint, so that the credentials can be revoked (see RevokeCredentials).
+	# Override this if your decisions depend on more than the credentials and the path.
+	def GetCredentialKey(this, request, path):
+		return (this.GetCredentialFingerprint(request.headers), path)
+
+
+	# Forget all decisions made for the credentials in the given headers.
+	# Call this when the credentials are revoked, so that they stop working before their decisions expire.
+	# RETURN how many decisions were forgotten.
+	def RevokeCredentials(this, headers):
+		fingerprint = this.GetCredentialFingerprint(headers)
+		if (this.rateLimiter is not None):
+			this.rateLimiter.verified.Pop(fingerprint)
+
+		if (this.credentials is None):
+			return 0
+
+		revoked = 0
+		for key in this.credentials.Keys():
+			if (key[0] == fingerprint):
+				this.credentials.Pop(key)
+				revoked += 1
+		return revoked
+
+
+	# Forget all decisions.
+	def RevokeAllCredentials(this):
+		if (this.rateLimiter is not None):
+			this.rateLimiter.verified.Clear()
+		if (this.credentials is not None):
+			this.credentials.Clear()
+
+
+	# RETURN how well the credential cache is doing.
+	def GetCredentialCacheStats(this):
+		if (this.credentials is None):
+			return {'enabled': False}
+
+		lookups = this.credentials.hits + this.credentials.misses
+		return {
+			'enabled': True,
+			'size': len(this.credentials),
+			'hits': this.credentials.hits,
+			'misses': this.credentials.misses,
+			'expirations': this.credentials.expirations,
+			'evictions': this.credentials.evictions,
+			'hit_rate': this.credentials.hits / lookups if lookups else 0.0,
+		}
+
+
+	# RETURN who the given request is from, as far as the given RateLimitRule is concerned (see RateLimitRule.key).
+	# Requests are limited before they are authenticated, so credentials are only trusted to tell clients apart once they have been authenticated (see Verify); until then, the client is its IP address.
+	# Override this to tell clients apart some other way (e.g. by the user their credentials belong to).
+	def GetRateLimitClient(this, rule, request, path):
+		if (rule.key == 'path'):
+			return ''
+		if (rule.key == 'credential' and any(request.headers.get(header) for header in this.credentialHeaders)):
+			fingerprint = this.GetCredentialFingerprint(request.headers)
+			if (this.rateLimiter.verified.Get(fingerprint)):
+				return fingerprint
+		return request.remote_addr
+
+
+	# Remember that the credentials of the given request were authenticated, so that its client can be told apart by them (see GetRateLimitClient).
+	def Verify(this, request):
+		if (this.rateLimiter is not None and this.rateLimiter.IsLimitingCredentials()):
+			this.rateLimiter.verified.Set(this.GetCredentialFingerprint(request.headers), True, this.credentialTTL)
+
+
+	# Count the given request against each of this.rateLimiter's rules which apply to it.
+	# The request counts against all of them or, if it is over any of them, none.
+	# The state of the most limiting bucket is saved in the given RequestContext, so its rate limit headers can be sent (see APIE.AddRateLimitHeaders).
+	# Raises RateLimited if the client has made too many requests.
+	def Limit(this, request, path, context=None):
+		limits = [(rule, this.GetRateLimitClient(rule, request, path)) for rule in this.rateLimiter.rules if rule.Applies(path)]
+		if (not limits):
+			return
+
+		allowed, limiting = this.rateLimiter.Take(limits)
+		if (context is not None):
+			context.rateLimit = limiting
+		if (not allowed):
+			raise RateLimited(f"Over the limit of {limiting[0].name} for {path}")
+
+
 	# Override of eons.Functor method. See that class for details
 	def ParseInitialArgs(this):
 		super().ParseInitialArgs()
@@ -37,7 +196,27 @@ class Authenticator(Functor):
 
 	# Override of eons.Functor method. See that class for details
 	# Slimmed down for performance
+	# If credentials are cached, remembered decisions are returned without running any of the usual pipeline.
+	# The key for the decision is made from the arguments of this call alone, before anything is stored on *this.
+	# Requests are rate limited first, so that remembered decisions can't be used to get around the limits; Authenticators called by other Authenticators don't count requests again.
 	def __call__(this, *args, **kwargs):
+		request = kwargs.get('request')
+		if (request is None and kwargs.get('precursor') is not None):
+			request = kwargs['precursor'].request
+		path = kwargs['path']
+
+		if (this.rateLimiter is not None and kwargs.get('precursor') is None):
+			this.Limit(request, path, kwargs.get('context'))
+
+		key = None
+		if (this.cacheCredentials):
+			this.PrepareCredentialCache()
+			key = this.GetCredentialKey(request, path)
+			if (key is not None):
+				authenticated = this.credentials.Get(key)
+				if (authenticated is not None):
+					return authenticated
+
 		this.args = args
 		this.kwargs = kwargs
 		
@@ -51,5 +230,14 @@ class Authenticator(Functor):
 		this.ValidateMethods()
 
 		if (this.next):
-			return this.CallNext()
-		return this.Authenticate()
+			authenticated = this.CallNext()
+		else:
+			authenticated = this.Authenticate()
+
+		if (key is not None):
+			this.credentials.Set(key, bool(authenticated), this.credentialTTL if authenticated else this.credentialFailureTTL)
+
+		if (authenticated and kwargs.get('precursor') is None):
+			this.Verify(request)
+
+		return authenticated
@@ -0,0 +1,35 @@
+import logging
+from .Exceptions import *
+
+# The AuthenticatorPool gives each request its own Authenticator, so that concurrent requests never share an Authenticator's path, request, etc.
+# Every Authenticator checked out shares the executor's Authenticator's state which lasts between requests (e.g. the credential cache; see Authenticator.sharedMembers).
+# Authenticators are only constructed when no idle Authenticator is available.
+class AuthenticatorPool:
+	def __init__(this, authenticator, size=32):
+		# The executor's Authenticator, whose state is shared.
+		# It is copied, never called, by *this.
+		this.authenticator = authenticator
+
+		# How many idle Authenticators to keep.
+		this.size = size
+
+		this.idle = []
+
+
+	# RETURN an Authenticator which no one else is using.
+	def Checkout(this):
+		if (this.idle):
+			authenticator = this.idle.pop()
+		else:
+			authenticator = this.authenticator.__class__()
+
+		# Shared state may have been replaced since this Authenticator was last used (e.g. a new rateLimiter), so it is shared each time.
+		this.authenticator.Share(authenticator)
+		return authenticator
+
+
+	# Make the given Authenticator available to future requests.
+	def Checkin(this, authenticator):
+		authenticator.ReleaseRequest()
+		if (len(this.idle) < this.size):
+			this.idle.append(authenticator)
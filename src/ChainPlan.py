@@ -0,0 +1,41 @@
+import logging
+from .Exceptions import *
+
+# A ChainPlan is everything APIE can work out about a request path before running it.
+# Plans are compiled once per (method, path) and cached by APIE (see APIE.GetPlan), so repeated requests can go straight to execution.
+# Plans which fail validation are cached too (for less time), so requests for paths which can't be run are cheap to turn away.
+class ChainPlan:
+	def __init__(this, method, path):
+		this.method = method
+		this.path = path
+
+		# The Endpoint names in the path, in order (including the preprocessor, if any).
+		this.endpoints = []
+
+		# The parsed syntax of each name in the path: {name: (endpointName, kwargs)}.
+		# For example, "[a,b]list" => ("multi", {'domain': ['a', 'b'], 'next': ['list']})
+		this.syntax = {}
+
+		# The Endpoint classes which will be called, by name.
+		this.classes = {}
+
+		# Every (Endpoint class, next Endpoint name) pair that has been validated.
+		this.transitions = set()
+
+		# True once the method and all transitions of *this have been validated.
+		this.validated = False
+
+		# Why *this could not be validated, if it couldn't, and the name of the Endpoint which would have failed (None if it doesn't exist).
+		# Requests for *this then fail with the same error, without running any Endpoints (see APIE.HandleRequest).
+		this.error = None
+		this.failedEndpoint = None
+
+
+	# RETURN whether or not the request method has already been validated for the given Endpoint.
+	def HasValidMethodFor(this, endpoint):
+		return this.validated and endpoint.__class__ in this.classes.values()
+
+
+	# RETURN whether or not calling next after the given Endpoint has already been validated.
+	def HasValidNextFor(this, endpoint, next):
+		return (endpoint.__class__, next) in this.transitions
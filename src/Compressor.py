@@ -0,0 +1,134 @@
+import gzip
+import zlib
+import logging
+from .Exceptions import *
+
+# zstd is only in the standard library from python 3.14.
+try:
+	from compression import zstd
+except ImportError:
+	zstd = None
+
+# The Compressor compresses responses for clients which accept it (i.e. send an Accept-Encoding header).
+# Only responses of at least threshold bytes and of one of the given types are compressed; others aren't worth the time.
+# Each encoding is done by a Compress{Encoding} method (e.g. CompressGzip); encodings are preferred in the order given when the client accepts several equally.
+class Compressor:
+	def __init__(this, encodings=None, threshold=1024, types=None, level=6):
+		# Lists given on the command line are comma separated strings.
+		if (isinstance(encodings, str)):
+			encodings = [encoding.strip() for encoding in encodings.split(',') if encoding.strip()]
+		if (isinstance(types, str)):
+			types = [mimetype.strip() for mimetype in types.split(',') if mimetype.strip()]
+
+		# The encodings we can use, most preferred first.
+		this.encodings = []
+		for encoding in (encodings if encodings is not None else ['zstd', 'gzip', 'deflate']):
+			if (not this.IsAvailable(encoding)):
+				logging.debug(f"Compression with {encoding} is not available; skipping it.")
+				continue
+			this.encodings.append(encoding)
+
+		# What to choose from when negotiating with the client.
+		this.candidates = this.encodings + ['identity']
+
+		# How many bytes a response must be before we bother compressing it.
+		this.threshold = threshold
+
+		# Mimetypes (without parameters, e.g. 'text/plain', not 'text/plain; charset=utf-8') which are worth compressing.
+		this.types = set(types if types is not None else [
+			'application/json',
+			'application/x-ndjson',
+			'application/javascript',
+			'application/xml',
+			'image/svg+xml',
+			'text/css',
+			'text/csv',
+			'text/html',
+			'text/plain',
+			'text/xml',
+		])
+
+		this.level = level
+
+		# By encoding.
+		this.compressed = {}
+		this.bytesIn = {}
+		this.bytesOut = {}
+
+
+	# RETURN whether or not we can compress with the given encoding.
+	def IsAvailable(this, encoding):
+		if (encoding == 'zstd'):
+			return zstd is not None
+		return hasattr(this, f"Compress{encoding.capitalize()}")
+
+
+	# RETURN the encoding to send the response to the given request in or None, if it should not be compressed.
+	def GetEncoding(this, request):
+		if (not this.encodings):
+			return None
+		encoding = request.accept_encodings.best_match(this.candidates)
+		if (encoding == 'identity'):
+			return None
+		return encoding
+
+
+	# RETURN whether or not a response of the given mimetype and length, with the given headers, should be compressed.
+	# Responses which are already encoded (e.g. forwarded from another service) are left alone.
+	def IsCompressible(this, mimetype, length, headers):
+		return (
+			length >= this.threshold
+			and mimetype in this.types
+			and 'Content-Encoding' not in headers
+		)
+
+
+	# RETURN the given bytes, compressed with the given encoding.
+	def Compress(this, encoding, body):
+		compressed = getattr(this, f"Compress{encoding.capitalize()}")(body)
+		this.compressed[encoding] = this.compressed.get(encoding, 0) + 1
+		this.bytesIn[encoding] = this.bytesIn.get(encoding, 0) + len(body)
+		this.bytesOut[encoding] = this.bytesOut.get(encoding, 0) + len(compressed)
+		return compressed
+
+
+	def CompressGzip(this, body):
+		# mtime=0 keeps the output (and so any ETag made from it) the same each time.
+		return gzip.compress(body, compresslevel=this.level, mtime=0)
+
+
+	def CompressDeflate(this, body):
+		return zlib.compress(body, this.level)
+
+
+	def CompressZstd(this, body):
+		return zstd.compress(body, this.level)
+
+
+	# Compress the given Flask Response, if the given request accepts it and the response is worth compressing.
+	# Streamed responses are sent as they are made, so they are never compressed.
+	# RETURN the response.
+	def CompressResponse(this, request, response):
+		if (response.is_streamed or response.status_code in [204, 304]):
+			return response
+
+		body = response.get_data()
+		if (not this.IsCompressible(response.mimetype, len(body), response.headers)):
+			return response
+
+		# Whether or not this client gets a compressed response, others might; caches between us must know that.
+		response.vary.add('Accept-Encoding')
+
+		encoding = this.GetEncoding(request)
+		if (encoding is None):
+			return response
+
+		response.set_data(this.Compress(encoding, body))
+		response.headers['Content-Encoding'] = encoding
+
+		# Each encoding is a different representation, so it must have a different ETag.
+		etag, weak = response.get_etag()
+		if (etag):
+			response.set_etag(f"{etag}-{encoding}", weak)
+
+		return response
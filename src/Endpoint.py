@@ -1,12 +1,14 @@
 import eons
 import os
+import time
 import logging
 import shutil
 import jsonpickle
 from pathlib import Path
-from flask import request, Response
+from flask import request, Response, stream_with_context, has_request_context
 from .Exceptions import *
 from .Functor import Functor
+from .EndpointResponse import EndpointResponse
 
 # Endpoints are what is run when a given request is successfully authenticated.
 # Put all your actual API logic in these!
@@ -19,6 +21,13 @@ from .Functor import Functor
 # What is returned by an Endpoint is the very last Endpoint's return value. All intermediate values are skipped (so you can throw errors if calling things like .../package without a further action).
 # NOTE: Endpoints should be published as api_s (i.e. projectType="api")
 class Endpoint(Functor):
+
+	# Members which describe, rather than do, and so are the same for many Endpoints (see InternMetadata).
+	metadata = ['supportedMethods', 'allowedNext', 'forbidden_headers']
+
+	# The frozensets shared by every Endpoint, by value.
+	internedMetadata = {}
+
 	def __init__(this, name=eons.INVALID_NAME()):
 		super().__init__(name)
 
@@ -29,6 +38,7 @@ class Endpoint(Functor):
 		this.bypassCall = False
 
 		# What methods can be used with this Endpoint?
+		# Feel free to change this in your constructor; it will be made immutable once *this is initialized (see InternMetadata).
 		this.supportedMethods = [
 			'POST',
 			'GET',
@@ -64,6 +74,7 @@ class Endpoint(Functor):
 
 		# If the client can store the result of *this locally, let them know.
 		# When querying this, it is best to use the IsCachable() method.
+		# If *this is the last Endpoint called for a GET request, APIE may also cache the response itself (see the response_cache_size setting).
 		this.cacheable = False
 
 		# If compiling data, from this.response.content.data for example, the response.content.message of *this will be overwritten.
@@ -72,9 +83,7 @@ class Endpoint(Functor):
 		this.clobberContent = True
 
 		# What is returned after Call()
-		this.response = eons.util.DotDict()
-		this.response.content = eons.util.DotDict()
-		this.ResetResponse()
+		this.response = EndpointResponse()
 
 	# Please override this for each of your Endpoints.
 	# RETURN a string that tells the user how to call *this.
@@ -120,44 +129,132 @@ LOL! Look at you: needing help. Pathetic.
 		pass
 
 
-	# Because APIE caches endpoints, the last response given will be stored in *this.
+	# RETURN the uploaded file with the given name (a werkzeug FileStorage) or None.
+	# Large uploads are kept on disk (see the upload_memory_threshold setting), so read them as streams or use GetUploadPath() rather than reading them all at once.
+	def GetUpload(this, name):
+		return this.context.GetUpload(name)
+
+
+	# RETURN the path of a file containing the upload with the given name, or None.
+	# The file is removed once the request completes, so move or copy it if you need to keep it.
+	def GetUploadPath(this, name):
+		return this.context.GetUploadPath(name)
+
+
+	# Remove responses APIE has cached for the given path (and everything under it).
+	# If no path is given, all cached responses are removed.
+	# Call this after changing something which a cacheable Endpoint returns.
+	def InvalidateCachedResponses(this, path=None):
+		return this.executor.InvalidateResponses(path)
+
+
+	# RETURN how many seconds are left before the request must be finished or None, if there is no deadline.
+	# Use this to bound anything slow, e.g. this.executor.http.Get(url, timeout=this.GetRemainingTime()).
+	def GetRemainingTime(this):
+		if (not this.context):
+			return None
+		return this.context.GetRemainingTime()
+
+
+	# Make sure the request still has time for *this to do the given thing.
+	# Raises DeadlineExceeded if not.
+	def CheckDeadline(this, doing):
+		if (this.context):
+			this.context.CheckDeadline(f"{this.name} could {doing}")
+
+
+	# Because APIE reuses Endpoints between requests, the last response given will be stored in *this.
 	# Call this method to clear the stale data.
 	def ResetResponse(this):
-		this.response.code = 200
-		this.response.headers = {}
-		this.response.content.data = {}
-		this.response.content.message = ""
+		this.response.Reset()
+
+
+	# Replace each of this.metadata with an immutable copy, shared with every other Endpoint which has the same value.
+	# Thousands of Endpoints may be kept (see EndpointPool), most of which support the same methods, etc., so this saves keeping a list of each for each.
+	# Called once, when *this is initialized, so that constructors can still change these as lists; after that, they can't be changed.
+	def InternMetadata(this):
+		for member in this.metadata:
+			value = frozenset(getattr(this, member))
+			setattr(this, member, Endpoint.internedMetadata.setdefault(value, value))
+
+
+	# RETURN whether or not this.response.content.message should be streamed to the client, rather than sent all at once.
+	# This is the case when the message is a generator or other iterable (other than a string).
+	def IsStreaming(this):
+		message = this.response.content.message
+		return hasattr(message, '__iter__') and not isinstance(message, (str, bytes, bytearray, dict))
+
+
+	# RETURN a generator of the bytes to send for the given iterable content.
+	# json content is sent as newline delimited json: 1 json value per line, per item in content.
+	def Stream(this, content, mime):
+		def Chunks():
+			try:
+				for chunk in content:
+					if (mime == 'application/x-ndjson'):
+						yield this.executor.Serialize(chunk) + b'\n'
+					elif (isinstance(chunk, str)):
+						yield chunk.encode('utf-8')
+					else:
+						yield chunk
+			except Exception as e:
+				# The status has already been sent, so all we can do is stop.
+				logging.error(f"{this.name} failed while streaming: {e}")
+				raise
+
+		if (has_request_context()):
+			return stream_with_context(Chunks())
+		return Chunks()
 
 
 	# Called right before *this returns.
 	# Handles json pickling, etc.
+	# If this.response.content.message is a generator (or other iterable), it is streamed to the client as it is iterated (see IsStreaming).
 	def ProcessResponse(this):
-		if (this.clobberContent):
+		mime = this.mime
+		streaming = this.IsStreaming()
+		if (streaming):
+			if (mime == 'application/json'):
+				mime = 'application/x-ndjson'
+
+			# We don't know how long the stream will be; the server will send it in chunks.
+			this.response.headers.pop('Content-Length', None)
+
+		elif (this.clobberContent):
 			if(this.mime == 'application/json'):
 				if (len(this.response.content.message)):
 					logging.info(f"Clobbering content.message ({this.response.content.message})")
 
 				this.response.content.data.update({'cacheable': this.cacheable})
-				this.response.content.message = jsonpickle.encode(dict(this.response.content.data))
+				this.response.content.message = this.executor.Serialize(this.response.content.data)
 
 		if ('Content-Type' not in this.response.headers):
-			this.response.headers.update({'Content-Type': this.mime})
+			this.response.headers.update({'Content-Type': mime})
 
-		for header in this.forbidden_headers:
-			try:
+		if (not this.forbidden_headers.isdisjoint(this.response.headers)):
+			for header in this.forbidden_headers.intersection(this.response.headers):
 				this.response.headers.pop(header)
-			except KeyError:
-				pass
 
-		return Response(
-			response = this.response.content.message,
+		content = this.response.content.message
+		if (streaming):
+			content = this.Stream(content, mime)
+
+		response = Response(
+			response = content,
 			status = this.response.code,
 			headers = this.response.headers.items(),
-			mimetype = str(this.mime), #This one is okay, I guess???
+			mimetype = str(mime), #This one is okay, I guess???
 			content_type = None, #why is this here, we set it in the header. This is a problem in Flask.
-			direct_passthrough = True # For speed??
+			direct_passthrough = not streaming # For speed?? Streams must go through werkzeug's iterator, which closes them (see call_on_close) once sent.
 		)
 
+		# Let other Endpoints (e.g. multi) use the data without parsing the json we just made.
+		response.structured = None
+		if (not streaming and this.clobberContent and this.mime == 'application/json'):
+			response.structured = this.response.content.data
+
+		return response
+
 
 	# Override of eons.Functor method. See that class for details
 	def Function(this):
@@ -167,14 +264,44 @@ LOL! Look at you: needing help. Pathetic.
 			return None
 
 		this.ResetResponse()
+
+		metrics = this.executor.metrics
+		if (metrics is None):
+			this.PreCall()
+			this.CheckDeadline('Call')
+			this.Call()
+			this.PostCall()
+			return this.ProcessResponse()
+
+		started = time.perf_counter()
 		this.PreCall()
+		this.CheckDeadline('Call')
+		preCalled = time.perf_counter()
 		this.Call()
+		called = time.perf_counter()
 		this.PostCall()
-		return this.ProcessResponse()
+		postCalled = time.perf_counter()
+		response = this.ProcessResponse()
+		processed = time.perf_counter()
+
+		endpoint = this.__class__.__name__
+		metrics.Observe('precall', preCalled - started, endpoint)
+		metrics.Observe('call', called - preCalled, endpoint)
+		metrics.Observe('postcall', postCalled - called, endpoint)
+		metrics.Observe('process_response', processed - postCalled, endpoint)
+		return response
 
 
 	#### SPECIALIZED OVERRIDES. I-NORE THESE ####
 
+	# Override of eons.Functor method. See that class for details
+	def Initialize(this):
+		if (this.initialized):
+			return
+
+		super().Initialize()
+		this.InternMetadata()
+
 	# API compatibility shim
 	def DidFunctionSucceed(this):
 		if (this.bypassCall):
@@ -184,8 +311,31 @@ LOL! Look at you: needing help. Pathetic.
 	def PopulatePrecursor(this):
 		super().PopulatePrecursor()
 
-		# We want to let the executor know who we are as soon as possible, in case any errors come up in validation.
-		this.executor.lastEndpoint = this
+		# We want to let the request know who we are as soon as possible, in case any errors come up in validation.
+		if (this.context):
+			this.context.endpoint = this
+
+	# Override of eons.Functor method. See that class for details
+	# The next Endpoint is checked out for the current request instead of being shared through the executor's cache.
+	def CallNext(this):
+		if (not this.next):
+			return None
+
+		next = this.next.pop(0)
+		this.CheckDeadline(f"call {next}")
+		if (not this.context or not this.context.plan or not this.context.plan.HasValidNextFor(this, next)):
+			this.ValidateNext(next)
+		return this.executor.ProcessEndpoint(next, this.request, precursor=this, next=this.next)
+
+	# Drop everything *this knows about the request it was last used for.
+	# Called when *this is returned to the executor's EndpointPool.
+	def ReleaseRequest(this):
+		this.ResetAttr('args', [])
+		this.ResetAttr('kwargs', {})
+		this.ResetAttr('precursor', None)
+		this.ResetAttr('next', [])
+		this.request = None
+		this.context = None
 
 	#Grab any known and necessary args from this.kwargs before any Fetch calls are made.
 	# This is executed first when calling *this.
@@ -193,7 +343,15 @@ LOL! Look at you: needing help. Pathetic.
 		super().ParseInitialArgs()
 
 
+	# Override of eons.Functor method. See that class for details
+	# In addition to the @methods of *this, make sure *this supports the request's http method.
+	def ValidateMethods(this):
+		super().ValidateMethods()
+		this.ValidateMethod()
+
 	def ValidateMethod(this):
+		if (this.context and this.context.plan and this.context.plan.HasValidMethodFor(this)):
+			return
 		if (this.request.method not in this.supportedMethods):
 			raise OtherAPIError(f"Method not supported: {this.request.method}")
 
@@ -0,0 +1,58 @@
+import logging
+from .Exceptions import *
+
+# The EndpointPool keeps ready-to-use Endpoints for each Endpoint name.
+# Every request checks out its own Endpoints, so concurrent requests never share an Endpoint's response, next, request, etc.
+# Endpoints are only constructed when no idle Endpoint of the requested name is available.
+class EndpointPool:
+	def __init__(this, executor, size=32):
+		this.executor = executor
+
+		# How many idle Endpoints to keep per name.
+		this.size = size
+
+		# The Endpoint class for each name we have resolved.
+		this.classes = {}
+
+		# Idle Endpoints, by name.
+		this.idle = {}
+
+		# Endpoints which are never called, only inspected (see GetPrototype).
+		this.prototypes = {}
+
+
+	# RETURN the Endpoint class for the given name.
+	# The first time a name is seen, it is acquired through the executor (i.e. GetRegistered), which may download it.
+	def GetClass(this, endpointName):
+		if (endpointName not in this.classes):
+			endpoint = this.executor.GetRegistered(endpointName, "api")
+			this.classes[endpointName] = endpoint.__class__
+			this.idle.setdefault(endpointName, []).append(endpoint)
+		return this.classes[endpointName]
+
+
+	# RETURN an Endpoint which can be used to learn about the given Endpoint name (e.g. its supportedMethods).
+	# Prototypes must not be called.
+	def GetPrototype(this, endpointName):
+		if (endpointName not in this.prototypes):
+			prototype = this.GetClass(endpointName)()
+			prototype.executor = this.executor
+			this.prototypes[endpointName] = prototype
+		return this.prototypes[endpointName]
+
+
+	# RETURN an Endpoint for the given name which no one else is using.
+	def Checkout(this, endpointName):
+		cls = this.GetClass(endpointName)
+		idle = this.idle.get(endpointName)
+		if (idle):
+			return idle.pop()
+		return cls()
+
+
+	# Make the given Endpoint available to future requests.
+	def Checkin(this, endpointName, endpoint):
+		endpoint.ReleaseRequest()
+		idle = this.idle.setdefault(endpointName, [])
+		if (len(idle) < this.size):
+			idle.append(endpoint)
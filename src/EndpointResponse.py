@@ -0,0 +1,73 @@
+# What an Endpoint is going to return: this.response.content.data (or .message), with this.response.code and this.response.headers.
+# There is 1 of these per Endpoint, and Endpoints are reused between requests (see EndpointPool), so these are kept small and are reset rather than remade (see Reset).
+# These used to be DotDicts, so they can still be used as dicts (e.g. this.response['code']); they only have the members listed in their __slots__, though.
+
+
+# Lets the classes below be used as the dicts they replaced.
+class ResponseMapping:
+	__slots__ = []
+
+	# The members which are part of the response; the rest of __slots__ are for internal use.
+	fields = []
+
+	def __getitem__(this, key):
+		try:
+			return getattr(this, key)
+		except AttributeError:
+			raise KeyError(key)
+
+	def __setitem__(this, key, value):
+		setattr(this, key, value)
+
+	def __contains__(this, key):
+		return key in this.keys()
+
+	def get(this, key, default=None):
+		return getattr(this, key, default)
+
+	# RETURN the names of the fields.
+	def keys(this):
+		return list(this.fields)
+
+	def items(this):
+		return [(key, getattr(this, key)) for key in this.keys()]
+
+	def update(this, values):
+		for key, value in dict(values).items():
+			setattr(this, key, value)
+
+
+class EndpointContent(ResponseMapping):
+	__slots__ = ['data', 'message']
+	fields = ['data', 'message']
+
+	def __init__(this):
+		this.data = {}
+		this.message = ""
+
+
+class EndpointResponse(ResponseMapping):
+	__slots__ = ['code', 'headers', 'content', 'ownHeaders']
+	fields = ['code', 'headers', 'content']
+
+	def __init__(this):
+		this.code = 200
+
+		# The dict which headers is reset to; we only ever clear our own dict, never one an Endpoint gave us.
+		this.ownHeaders = {}
+		this.headers = this.ownHeaders
+		this.content = EndpointContent()
+
+
+	# Forget everything set for the last request.
+	# The headers are copied into each Flask Response, so they are cleared in place.
+	# The data may still be in use after we're done with it (e.g. as the structured data of the last response; see Endpoint.ProcessResponse), so it is replaced instead.
+	def Reset(this):
+		this.code = 200
+
+		this.ownHeaders.clear()
+		this.headers = this.ownHeaders
+
+		content = this.content
+		content.data = {}
+		content.message = ""
@@ -3,4 +3,20 @@ class APIError(Exception): pass
 
 
 # Exception used for miscellaneous API errors.
-class OtherAPIError(APIError): pass
\ No newline at end of file
+class OtherAPIError(APIError): pass
+
+
+# Raised when no connection to an upstream host becomes available in time (see HTTPClient).
+class HTTPPoolTimeout(APIError): pass
+
+
+# Raised when APIE is too busy to process a request (see AdmissionController).
+class Overloaded(APIError): pass
+
+
+# Raised when a request is not finished by its deadline (see RequestContext.deadline).
+class DeadlineExceeded(APIError): pass
+
+
+# Raised when a client has made more requests than its rate limits allow (see RateLimiter).
+class RateLimited(APIError): pass
\ No newline at end of file
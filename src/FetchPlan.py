@@ -0,0 +1,64 @@
+import logging
+from .Exceptions import *
+
+# A FetchPlan is what a Functor class has learned about where its values can be Fetched from.
+# Each executor has one FetchPlan for each apie.Functor class, which is shared by every instance of that class (see Functor.GetFetchPlan).
+class FetchPlan:
+
+	# Sources which do not change between requests.
+	# Values found in these are cached until Clear() is called (see APIE.InvalidateFetches).
+	staticLocations = [
+		'executor',
+		'environment',
+	]
+
+	def __init__(this, cls, cacheStatic=True):
+		this.cls = cls
+
+		# Whether or not to cache values found in static locations.
+		# Functors without an executor have nothing to tie the cache to, so they don't.
+		this.cacheStatic = cacheStatic
+
+		# The locations to search, in order, for each fetchFrom list which has been used: {tuple(fetchFrom): [location, ...]}
+		# Locations which *this class can't Fetch from are dropped.
+		this.orders = {}
+
+		# Values found in static locations: {(location, varName, tuple(fetchFrom)): value}
+		# Values which weren't found are not remembered, since they may be set later (e.g. by another Functor).
+		this.static = {}
+
+		# How many Fetches have been made and how many locations had to be probed to complete them.
+		# probes / fetches is the average number of sources each Fetch needed.
+		this.fetches = 0
+		this.probes = 0
+		this.staticHits = 0
+
+
+	# RETURN the locations the given Functor should search, in order, for the given fetchFrom.
+	def GetOrder(this, functor, fetchFrom):
+		key = tuple(fetchFrom)
+		order = this.orders.get(key)
+		if (order is None):
+			order = [loc for loc in key if loc in functor.fetch.locations]
+			this.orders[key] = order
+		return order
+
+
+	# Search the given static location, using the cache if possible.
+	# RETURN the value found (or default) and whether or not it was found.
+	def FetchStatic(this, functor, location, varName, default, fetchFrom, attempted):
+		key = (location, varName, tuple(fetchFrom))
+		if (key in this.static):
+			this.staticHits += 1
+			return this.static[key], True
+
+		this.probes += 1
+		ret, found = functor.fetch.locations[location](varName, default, fetchFrom, attempted)
+		if (found and this.cacheStatic):
+			this.static[key] = ret
+		return ret, found
+
+
+	# Forget every value found in static locations.
+	def Clear(this):
+		this.static.clear()
@@ -6,16 +6,27 @@ import jsonpickle
 from pathlib import Path
 from flask import request, Response
 from .Exceptions import *
+from .RequestContext import RequestContext
+from .FetchPlan import FetchPlan
 
 # APIE Functors extend Eons Functors in order to:
 # 1. Improve Fetch() behavior when cascading multiple Functor executions.
 # 2. Allow Fetching from a http request.
 class Functor(eons.Functor):
+
+	# The FetchPlan of each Functor class, by class, for Functors which have no executor.
+	# Those with an executor use its fetchPlans instead (see GetFetchPlan).
+	fetchPlans = {}
+
 	def __init__(this, name=eons.INVALID_NAME()):
 		super().__init__(name)
 
 		this.enableRollback = False
 
+		# Functor tracking relies on global state, which would be shared between concurrent requests.
+		# Everything an APIE Functor needs is passed to it explicitly, so we don't need it.
+		this.feature.track = False
+
 		# See eons/Functor for details on Fetch mechanics.
 		this.fetch.possibilities.extend([
 			'request_args',
@@ -38,6 +49,27 @@ class Functor(eons.Functor):
 		# The request object to process
 		this.request = None
 
+		# The RequestContext *this is operating within.
+		this.context = None
+
+		# Where a Functor which follows *this may Fetch values from *this (see FetchAsPrecursor).
+		# The request and static sources are left for the follower to search itself, since they are the same for the whole chain.
+		this.fetch.precursor = [
+			'this',
+			'args',
+		]
+
+
+	# Override of eons.Functor method. See that class for details
+	# The RequestContext is passed down from the precursor, if there is one.
+	def PopulatePrecursor(this):
+		super().PopulatePrecursor()
+
+		context = this.kwargs.pop('context', None)
+		if (context is None and this.precursor):
+			context = getattr(this.precursor, 'context', None)
+		this.context = context
+
 
 	# Grab any known and necessary args from this.kwargs before any Fetch calls are made.
 	# There should always be a request.
@@ -48,9 +80,108 @@ class Functor(eons.Functor):
 		else:
 			this.request = this.kwargs.pop('request')
 
+		# Functors called outside of APIE.ProcessRequest still need somewhere to parse the request into.
+		if (this.context is None):
+			this.context = RequestContext(this.executor, this.request)
+
+
+	# RETURN the FetchPlan for the class of *this.
+	# Values in the executor differ between executors, so each executor keeps its own FetchPlans.
+	def GetFetchPlan(this):
+		plans = getattr(this.executor, 'fetchPlans', None)
+		cacheStatic = plans is not None
+		if (plans is None):
+			plans = Functor.fetchPlans
+
+		plan = plans.get(this.__class__)
+		if (plan is None):
+			plan = FetchPlan(this.__class__, cacheStatic)
+			plans[this.__class__] = plan
+		return plan
+
+
+	# Override of eons.Functor method. See that class for details
+	# The locations searched and the results from static sources (e.g. the executor) are reused between calls through the FetchPlan of *this's class.
+	def Fetch(this, varName, default=None, fetchFrom=None, start=True, attempted=None):
+		if (attempted is None):
+			attempted = []
+
+		if (this in attempted):
+			if (start):
+				return default
+			return default, False
 
+		attempted.append(this)
+
+		if (fetchFrom is None):
+			fetchFrom = this.fetch.use
+
+		plan = this.GetFetchPlan()
+		plan.fetches += 1
+
+		for loc in plan.GetOrder(this, fetchFrom):
+			if (loc in FetchPlan.staticLocations):
+				ret, found = plan.FetchStatic(this, loc, varName, default, fetchFrom, attempted)
+			else:
+				plan.probes += 1
+				ret, found = this.fetch.locations[loc](varName, default, fetchFrom, attempted)
+
+			if (found):
+				if (this.callback.fetch):
+					this.callback.fetch(varName = varName, location = loc, value = ret)
+				if (start):
+					return ret
+				return ret, True
+
+		if (this.callback.fetch):
+			this.callback.fetch(varName = varName, location = 'default', value = default)
+
+		if (start):
+			return default
+		return default, False
+
+
+	# RETURN the value of varName, as Fetched by a Functor which follows *this, and whether or not it was found.
+	# Override this if you'd like to change what your followers see.
+	def FetchAsPrecursor(this, varName, default):
+		return this.Fetch(varName, default, this.fetch.precursor, start=False)
+
+
+	# Override of eons.Functor method. See that class for details
+	# Rather than recursing through each precursor's full Fetch, walk the chain of precursors and search only what each owns.
+	def fetch_location_precursor(this, varName, default, fetchFrom, attempted):
+		precursor = this.precursor
+		while (precursor is not None):
+			if (isinstance(precursor, Functor)):
+				ret, found = precursor.FetchAsPrecursor(varName, default)
+				if (found):
+					return ret, True
+				precursor = precursor.precursor
+			else:
+				return precursor.FetchWithAndWithout(['this'], ['environment', 'globals', 'executor'], varName, default, fetchFrom, False, attempted)
+		return default, False
+
+
+	# Override of eons.Functor method. See that class for details
+	# Values which are not found on *this are not looked up through the precursor here, since the precursor is searched on its own.
+	def fetch_location_this(this, varName, default, fetchFrom, attempted):
+		if ('.' in varName):
+			return super().fetch_location_this(varName, default, fetchFrom, attempted)
+
+		if (varName in this.__dict__):
+			return this.__dict__[varName], True
+		if (hasattr(this.__class__, varName)):
+			return getattr(this, varName), True
+		if (varName in this.cache.compatibilities):
+			return eons.BackwardsCompatible.Get(this, varName), True
+		if (this.result.data and varName in this.result.data):
+			return this.result.data[varName], True
+		return default, False
+
+
+	# RETURN the value of varName from the given field of the request (see RequestContext.GetRequestData) and whether or not it was found.
 	def FetchFromRequest(this, field, varName, default):
-		val = getattr(this.request, field).get(varName)
+		val = this.context.GetRequestData(field).get(varName)
 		if (val is not None):
 			return val, True
 		return default, False
@@ -61,18 +192,12 @@ class Functor(eons.Functor):
 
 
 	def fetch_location_request_form(this, varName, default, fetchFrom, attempted):
-		if (not this.request.data):
-			return default, False
 		return this.FetchFromRequest('form', varName, default)
 
 
 	def fetch_location_request_json(this, varName, default, fetchFrom, attempted):
-		if (this.request.content_type != "application/json"):
-			return default, False
 		return this.FetchFromRequest('json', varName, default)
 
 
 	def fetch_location_request_files(this, varName, default, fetchFrom, attempted):
-		if (not this.request.files):
-			return  default, False
 		return this.FetchFromRequest('files', varName, default)
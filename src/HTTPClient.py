@@ -0,0 +1,145 @@
+import json
+import logging
+from urllib.parse import urlsplit, urlencode
+from eventlet.green.http.client import RemoteDisconnected
+from .Exceptions import *
+from .HTTPConnectionPool import HTTPConnectionPool
+
+# What HTTPClient returns.
+# The whole body has been read, so the connection it came from is already free for other requests.
+class HTTPResponse:
+	def __init__(this, status, reason, headers, body):
+		this.status = status
+		this.reason = reason
+
+		# A case-insensitive email.message.Message, as http.client gives.
+		this.headers = headers
+
+		# bytes
+		this.body = body
+
+	def GetText(this, encoding='utf-8'):
+		return this.body.decode(encoding)
+
+	def GetJson(this):
+		return json.loads(this.body)
+
+
+# The HTTPClient lets Endpoints and Authenticators call other services without connecting to them for every request.
+# APIE has 1 HTTPClient (see APIE.http), shared by every request; use it through this.executor.http, e.g.
+#   response = this.executor.http.Get("https://example.com/things", params={'page': 2})
+#   things = response.GetJson()
+# There is 1 HTTPConnectionPool per upstream host; see that class for details.
+class HTTPClient:
+	def __init__(this, poolSize=10, timeout=30, poolTimeout=10, idleTimeout=60):
+		# Passed to each HTTPConnectionPool.
+		this.poolSize = poolSize
+		this.timeout = timeout
+		this.poolTimeout = poolTimeout
+		this.idleTimeout = idleTimeout
+
+		# {(scheme, host, port): HTTPConnectionPool}
+		this.pools = {}
+
+		this.defaultPorts = {
+			'http': 80,
+			'https': 443,
+		}
+
+		# Methods which may be sent again if we can't tell whether the upstream host got them (see Request).
+		this.idempotentMethods = [
+			'GET',
+			'HEAD',
+			'PUT',
+			'DELETE',
+			'OPTIONS',
+			'TRACE',
+		]
+
+
+	# RETURN the HTTPConnectionPool for the given host, making it if necessary.
+	def GetPool(this, scheme, host, port):
+		key = (scheme, host, port)
+		pool = this.pools.get(key)
+		if (pool is None):
+			pool = HTTPConnectionPool(scheme, host, port, this.poolSize, this.timeout, this.poolTimeout, this.idleTimeout)
+			this.pools[key] = pool
+		return pool
+
+
+	# Make an HTTP request.
+	# If data is given, it is sent as the json body, with the appropriate Content-Type.
+	# If params are given, they are added to the url's query string.
+	# If timeout is given, it overrides this.timeout for this request.
+	# RETURN an HTTPResponse.
+	def Request(this, method, url, body=None, headers=None, data=None, params=None, timeout=None):
+		parts = urlsplit(url)
+		if (parts.scheme not in this.defaultPorts):
+			raise APIError(f"Cannot request {url}: only http and https urls are supported")
+
+		pool = this.GetPool(parts.scheme, parts.hostname, parts.port or this.defaultPorts[parts.scheme])
+
+		target = parts.path or '/'
+		query = parts.query
+		if (params):
+			query = '&'.join(part for part in [query, urlencode(params, doseq=True)] if part)
+		if (query):
+			target = f"{target}?{query}"
+
+		headers = dict(headers or {})
+		if (data is not None):
+			body = json.dumps(data).encode('utf-8')
+			headers.setdefault('Content-Type', 'application/json')
+		elif (isinstance(body, str)):
+			body = body.encode('utf-8')
+
+		if (timeout is None):
+			timeout = pool.timeout
+
+		# A kept-alive connection may have been closed by the upstream host since we last used it, in which case we try again on a new connection.
+		# If the connection failed while sending, the request can't have been handled, so that is always safe.
+		# If it failed after the request was sent, the upstream host may have handled it anyway, so only idempotent requests are sent again.
+		while (True):
+			connection, reused = pool.Checkout()
+			reuse = False
+			sent = False
+			try:
+				connection.timeout = timeout
+				if (connection.sock is not None):
+					connection.sock.settimeout(timeout)
+
+				connection.request(method, target, body=body, headers=headers)
+				sent = True
+				response = connection.getresponse()
+				content = response.read()
+				reuse = not response.will_close
+				pool.requests += 1
+				return HTTPResponse(response.status, response.reason, response.headers, content)
+			except (RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+				if (not reused or (sent and method.upper() not in this.idempotentMethods)):
+					raise
+				logging.debug(f"Kept-alive connection to {pool.host}:{pool.port} was closed ({e}); reconnecting.")
+			finally:
+				pool.Checkin(connection, reuse)
+
+
+	def Get(this, url, **kwargs):
+		return this.Request('GET', url, **kwargs)
+
+	def Post(this, url, **kwargs):
+		return this.Request('POST', url, **kwargs)
+
+	def Put(this, url, **kwargs):
+		return this.Request('PUT', url, **kwargs)
+
+	def Patch(this, url, **kwargs):
+		return this.Request('PATCH', url, **kwargs)
+
+	def Delete(this, url, **kwargs):
+		return this.Request('DELETE', url, **kwargs)
+
+
+	# Close every idle connection.
+	def Close(this):
+		for pool in list(this.pools.values()):
+			pool.Close()
@@ -0,0 +1,93 @@
+import time
+from eventlet.semaphore import Semaphore
+from eventlet.green.http.client import HTTPConnection, HTTPSConnection
+from .Exceptions import *
+
+# An HTTPConnectionPool keeps open (kept-alive) connections to a single upstream host, so that requests to it don't have to connect each time.
+# At most size connections are open at once; requests beyond that wait (up to a timeout) for a connection to be returned.
+# Connections are green (see eventlet.green), so waiting on an upstream host never blocks other requests.
+class HTTPConnectionPool:
+	def __init__(this, scheme, host, port, size=10, timeout=30, poolTimeout=10, idleTimeout=60):
+		this.scheme = scheme
+		this.host = host
+		this.port = port
+
+		# How many connections may be open at once.
+		this.size = size
+
+		# How many seconds to wait on the upstream host when connecting and reading.
+		this.timeout = timeout
+
+		# How many seconds to wait for a connection when all are in use.
+		this.poolTimeout = poolTimeout
+
+		# Idle connections older than this many seconds are likely to have been closed by the other end, so they are not reused.
+		this.idleTimeout = idleTimeout
+
+		# Held for each connection which is open.
+		this.semaphore = Semaphore(size)
+
+		# [(connection, time it was returned)], most recently returned last.
+		this.idle = []
+
+		this.requests = 0
+		this.opened = 0
+		this.reused = 0
+
+		# How many times and for how long requests had to wait for a connection.
+		this.waits = 0
+		this.waitSeconds = 0.0
+		this.timeouts = 0
+
+
+	# RETURN how many connections are in use.
+	def GetActive(this):
+		return this.size - this.semaphore.counter
+
+
+	# RETURN a connection no one else is using and whether or not it has been used before.
+	# Call Checkin() with the connection when done with it.
+	def Checkout(this):
+		if (not this.semaphore.acquire(blocking=False)):
+			this.waits += 1
+			started = time.perf_counter()
+			acquired = this.semaphore.acquire(timeout=this.poolTimeout)
+			this.waitSeconds += time.perf_counter() - started
+			if (not acquired):
+				this.timeouts += 1
+				raise HTTPPoolTimeout(f"Timed out waiting for a connection to {this.host}:{this.port}")
+
+		now = time.monotonic()
+		while (this.idle):
+			connection, returned = this.idle.pop()
+			if (now - returned < this.idleTimeout):
+				this.reused += 1
+				return connection, True
+			connection.close()
+
+		this.opened += 1
+		return this.Connect(), False
+
+
+	# Make the given connection available to other requests.
+	# Connections which can't be reused (e.g. because the response wasn't read or the upstream host closed them) should be checked in with reuse=False.
+	def Checkin(this, connection, reuse=True):
+		if (reuse):
+			this.idle.append((connection, time.monotonic()))
+		else:
+			connection.close()
+		this.semaphore.release()
+
+
+	# RETURN a new connection to our host.
+	def Connect(this):
+		if (this.scheme == 'https'):
+			return HTTPSConnection(this.host, this.port, timeout=this.timeout)
+		return HTTPConnection(this.host, this.port, timeout=this.timeout)
+
+
+	# Close every idle connection.
+	def Close(this):
+		while (this.idle):
+			connection, returned = this.idle.pop()
+			connection.close()
@@ -0,0 +1,34 @@
+import bisect
+
+# A Histogram counts observations (e.g. how many seconds something took) in fixed buckets.
+# Recording an observation is just a bisect and 2 additions, so it is cheap enough to do for every request.
+class Histogram:
+
+	# Upper bounds (in seconds) of the default buckets.
+	defaultBuckets = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+
+	def __init__(this, buckets=None):
+		this.buckets = list(buckets or this.defaultBuckets)
+
+		# How many observations fell into each bucket; the last is for observations larger than every bucket.
+		this.counts = [0] * (len(this.buckets) + 1)
+
+		this.sum = 0.0
+		this.count = 0
+
+
+	def Observe(this, value):
+		this.counts[bisect.bisect_left(this.buckets, value)] += 1
+		this.sum += value
+		this.count += 1
+
+
+	# RETURN (upper bound, observations <= upper bound) for each bucket, ending with ('+Inf', count).
+	def GetCumulativeCounts(this):
+		ret = []
+		total = 0
+		for bound, count in zip(this.buckets, this.counts):
+			total += count
+			ret.append((bound, total))
+		ret.append(('+Inf', this.count))
+		return ret
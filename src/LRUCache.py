@@ -0,0 +1,84 @@
+import time
+from collections import OrderedDict
+
+# A size-bounded cache which evicts the least recently used entries first.
+# Entries may also be given a ttl (in seconds), after which they are treated as missing.
+# Hits, misses, evictions, and expirations are counted so that the size can be tuned.
+# A size of 0 disables the cache.
+class LRUCache:
+	def __init__(this, size=1024, ttl=None):
+		this.size = size
+
+		# The default ttl for new entries; None means entries don't expire.
+		this.ttl = ttl
+
+		# {key: (value, expiration time or None)}
+		this.entries = OrderedDict()
+
+		this.hits = 0
+		this.misses = 0
+		this.evictions = 0
+		this.expirations = 0
+
+	def __len__(this):
+		return len(this.entries)
+
+	def __contains__(this, key):
+		return key in this.entries
+
+
+	# RETURN the value stored for key or default if there is none.
+	def Get(this, key, default=None):
+		try:
+			value, expires = this.entries[key]
+		except KeyError:
+			this.misses += 1
+			return default
+
+		if (expires is not None and expires <= time.monotonic()):
+			del this.entries[key]
+			this.expirations += 1
+			this.misses += 1
+			return default
+
+		this.entries.move_to_end(key)
+		this.hits += 1
+		return value
+
+
+	# Store value for key, evicting old entries as necessary.
+	# If ttl is not given, this.ttl is used.
+	def Set(this, key, value, ttl=None):
+		if (this.size <= 0):
+			return
+
+		if (ttl is None):
+			ttl = this.ttl
+
+		expires = None
+		if (ttl is not None):
+			expires = time.monotonic() + ttl
+
+		this.entries[key] = (value, expires)
+		this.entries.move_to_end(key)
+		while (len(this.entries) > this.size):
+			this.entries.popitem(last=False)
+			this.evictions += 1
+
+
+	# Remove key from *this.
+	# RETURN the value that was stored or default.
+	def Pop(this, key, default=None):
+		if (key not in this.entries):
+			return default
+		return this.entries.pop(key)[0]
+
+
+	# RETURN all keys currently stored, including any which have expired but have not yet been removed.
+	def Keys(this):
+		return list(this.entries.keys())
+
+
+	# Remove everything from *this.
+	def Clear(this):
+		this.entries.clear()
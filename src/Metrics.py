@@ -0,0 +1,174 @@
+import logging
+from .Exceptions import *
+from .Histogram import Histogram
+
+# Metrics records how long each stage of each request takes, along with the status codes and errors returned.
+# The executor, when metrics are enabled, has 1 Metrics object (see APIE.metrics), which the 'metrics' Endpoint renders for Prometheus.
+# NOTE: each worker process keeps its own Metrics.
+class Metrics:
+	def __init__(this, executor):
+		this.executor = executor
+
+		# Timings, by (stage, endpoint).
+		# Stages which don't belong to an Endpoint (e.g. 'auth') use an endpoint of ''.
+		this.timings = {}
+
+		# How many responses were sent, by status code.
+		this.statuses = {}
+
+		# How many errors were raised, by (endpoint, error type).
+		this.errors = {}
+
+
+	# Record that the given stage took the given number of seconds.
+	def Observe(this, stage, seconds, endpoint=''):
+		key = (stage, endpoint)
+		histogram = this.timings.get(key)
+		if (histogram is None):
+			histogram = Histogram()
+			this.timings[key] = histogram
+		histogram.Observe(seconds)
+
+
+	def CountStatus(this, code):
+		this.statuses[code] = this.statuses.get(code, 0) + 1
+
+
+	def CountError(this, error, endpoint=''):
+		key = (endpoint, error.__class__.__name__)
+		this.errors[key] = this.errors.get(key, 0) + 1
+
+
+	# RETURN the given labels in Prometheus' format.
+	@staticmethod
+	def FormatLabels(**labels):
+		escaped = []
+		for name, value in labels.items():
+			value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+			escaped.append(f'{name}="{value}"')
+		return '{' + ','.join(escaped) + '}'
+
+
+	# RETURN everything *this (and the rest of the executor) knows, in the Prometheus text format.
+	def Render(this):
+		lines = []
+
+		lines.append("# HELP apie_stage_seconds How long each stage of handling a request took.")
+		lines.append("# TYPE apie_stage_seconds histogram")
+		for (stage, endpoint), histogram in list(this.timings.items()):
+			for bound, count in histogram.GetCumulativeCounts():
+				lines.append(f"apie_stage_seconds_bucket{this.FormatLabels(stage=stage, endpoint=endpoint, le=bound)} {count}")
+			lines.append(f"apie_stage_seconds_sum{this.FormatLabels(stage=stage, endpoint=endpoint)} {histogram.sum}")
+			lines.append(f"apie_stage_seconds_count{this.FormatLabels(stage=stage, endpoint=endpoint)} {histogram.count}")
+
+		lines.append("# HELP apie_responses_total Responses sent, by status code.")
+		lines.append("# TYPE apie_responses_total counter")
+		for code, count in list(this.statuses.items()):
+			lines.append(f"apie_responses_total{this.FormatLabels(code=code)} {count}")
+
+		lines.append("# HELP apie_errors_total Errors raised while handling requests.")
+		lines.append("# TYPE apie_errors_total counter")
+		for (endpoint, error), count in list(this.errors.items()):
+			lines.append(f"apie_errors_total{this.FormatLabels(endpoint=endpoint, error=error)} {count}")
+
+		for name, help, kind, samples in this.GetExecutorStats():
+			lines.append(f"# HELP {name} {help}")
+			lines.append(f"# TYPE {name} {kind}")
+			for labels, value in samples:
+				lines.append(f"{name}{this.FormatLabels(**labels) if labels else ''} {value}")
+
+		return '\n'.join(lines) + '\n'
+
+
+	# RETURN (name, help, type, [(labels, value), ...]) for each statistic kept by the rest of the executor (pools, caches, etc.).
+	def GetExecutorStats(this):
+		executor = this.executor
+		stats = []
+
+		if (executor.pool is not None):
+			stats.append(("apie_endpoint_pool_idle", "Idle Endpoints ready for new requests.", "gauge", [
+				({'endpoint': name}, len(idle)) for name, idle in list(executor.pool.idle.items())
+			]))
+
+		caches = [
+			('plan', "compiled request plans", executor.plans),
+		]
+		if (executor.responses is not None):
+			caches.append(('response', "responses", executor.responses.entries))
+		if (executor.auth is not None and getattr(executor.auth, 'credentials', None) is not None):
+			caches.append(('credential', "authentication decisions", executor.auth.credentials))
+
+		for cache, description, lru in caches:
+			if (lru is None):
+				continue
+			stats.append((f"apie_{cache}_cache_size", f"Cached {description}.", "gauge", [({}, len(lru))]))
+			for counter in ['hits', 'misses', 'evictions', 'expirations']:
+				stats.append((f"apie_{cache}_cache_{counter}_total", f"Cached {description}: {counter}.", "counter", [({}, getattr(lru, counter))]))
+
+		if (executor.admission is not None):
+			gates = list(executor.admission.gates.values())
+			for value, name, kind, description in [
+				(lambda gate: gate.GetInFlight(), "apie_admission_in_flight", "gauge", "Requests being processed"),
+				(lambda gate: gate.limit, "apie_admission_limit", "gauge", "How many requests may be processed at once"),
+				(lambda gate: gate.waiting, "apie_admission_queue_depth", "gauge", "Requests waiting to be processed"),
+				(lambda gate: gate.admitted, "apie_admission_admitted_total", "counter", "Requests admitted"),
+				(lambda gate: gate.queued, "apie_admission_queued_total", "counter", "Requests which had to wait to be admitted"),
+				(lambda gate: gate.waitSeconds, "apie_admission_wait_seconds_total", "counter", "Time requests spent waiting to be admitted"),
+			]:
+				stats.append((name, f"{description}, by Endpoint ('' for all requests).", kind, [
+					({'endpoint': gate.name}, value(gate)) for gate in gates
+				]))
+			stats.append(("apie_admission_shed_total", "Requests turned away with a 503, by Endpoint ('' for all requests) and reason.", "counter", [
+				({'endpoint': gate.name, 'reason': reason}, count) for gate in gates for reason, count in gate.shed.items()
+			]))
+
+		rateLimiter = getattr(executor.auth, 'rateLimiter', None)
+		if (rateLimiter is not None):
+			for counts, name, description in [
+				(rateLimiter.allowed, "apie_rate_limit_allowed_total", "Requests within their rate limits"),
+				(rateLimiter.limited, "apie_rate_limit_limited_total", "Requests turned away with a 429"),
+			]:
+				stats.append((name, f"{description}, by rule.", "counter", [
+					({'rule': rule}, count) for rule, count in counts.items()
+				]))
+			stats.append(("apie_rate_limit_buckets", "Clients being rate limited.", "gauge", [({}, len(rateLimiter.buckets))]))
+			stats.append(("apie_rate_limit_bucket_evictions_total", "Clients forgotten to make room for others before their limits had reset.", "counter", [({}, rateLimiter.buckets.evictions)]))
+
+		if (executor.http is not None):
+			pools = list(executor.http.pools.values())
+			for counter, name, kind, description in [
+				(lambda pool: pool.GetActive(), "apie_http_connections_active", "gauge", "Connections to upstream hosts in use"),
+				(lambda pool: len(pool.idle), "apie_http_connections_idle", "gauge", "Kept-alive connections to upstream hosts waiting to be reused"),
+				(lambda pool: pool.requests, "apie_http_requests_total", "counter", "Requests made to upstream hosts"),
+				(lambda pool: pool.opened, "apie_http_connections_opened_total", "counter", "Connections opened to upstream hosts"),
+				(lambda pool: pool.reused, "apie_http_connections_reused_total", "counter", "Requests to upstream hosts which reused a kept-alive connection"),
+				(lambda pool: pool.waits, "apie_http_pool_waits_total", "counter", "Requests to upstream hosts which had to wait for a connection"),
+				(lambda pool: pool.waitSeconds, "apie_http_pool_wait_seconds_total", "counter", "Time spent waiting for connections to upstream hosts"),
+				(lambda pool: pool.timeouts, "apie_http_pool_timeouts_total", "counter", "Requests to upstream hosts which gave up waiting for a connection"),
+			]:
+				stats.append((name, f"{description}, by host.", kind, [
+					({'host': f"{pool.scheme}://{pool.host}:{pool.port}"}, counter(pool)) for pool in pools
+				]))
+
+		if (executor.compressor is not None):
+			compressor = executor.compressor
+			for counts, name, description in [
+				(compressor.compressed, "apie_compressed_responses_total", "Responses compressed"),
+				(compressor.bytesIn, "apie_compression_bytes_in_total", "Bytes of responses before compression"),
+				(compressor.bytesOut, "apie_compression_bytes_out_total", "Bytes of responses after compression"),
+			]:
+				stats.append((name, f"{description}, by encoding.", "counter", [
+					({'encoding': encoding}, count) for encoding, count in list(counts.items())
+				]))
+
+		plans = list(executor.fetchPlans.items())
+		for counter, name, description in [
+			('fetches', "apie_fetches_total", "Fetches made"),
+			('probes', "apie_fetch_probes_total", "Locations searched by Fetches"),
+			('staticHits', "apie_fetch_static_hits_total", "Fetches answered from cached static locations"),
+		]:
+			stats.append((name, f"{description}, by Functor class.", "counter", [
+				({'functor': cls.__name__}, getattr(plan, counter)) for cls, plan in plans
+			]))
+
+		return stats
@@ -0,0 +1,141 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from .Exceptions import *
+
+# The PackageManifest records which packages APIE has installed in its repo store and what they contained when they were installed.
+# This lets APIE tell which installed packages can be used as they are and which need to be downloaded again, instead of downloading everything each time it starts.
+# The manifest is kept as json in the store (see fileName).
+class PackageManifest:
+
+	fileName = "apie_manifest.json"
+
+	def __init__(this, store):
+		this.store = Path(store)
+		this.path = this.store.joinpath(this.fileName)
+
+		# {packageName: {'directory': ..., 'sha256': ..., 'installed': ...}}
+		this.packages = {}
+
+		# Packages may be installed by many threads at once (e.g. while preloading).
+		this.lock = threading.Lock()
+
+
+	# Read the manifest from disk, if there is one.
+	def Load(this):
+		if (not this.path.exists()):
+			return
+		try:
+			this.packages = json.loads(this.path.read_text())
+		except Exception as e:
+			logging.warning(f"Could not read {this.path}; all packages will be treated as missing: {e}")
+			this.packages = {}
+
+
+	# Write the manifest to disk.
+	def Save(this):
+		with this.lock:
+			this.store.mkdir(parents=True, exist_ok=True)
+			temporary = this.path.with_suffix('.tmp')
+			temporary.write_text(json.dumps(this.packages, indent=2, sort_keys=True))
+			os.replace(temporary, this.path)
+
+
+	# RETURN the directory the given package is installed in.
+	def GetDirectory(this, packageName):
+		return this.store.joinpath(packageName)
+
+
+	# RETURN the sha256 of everything in the given directory.
+	@staticmethod
+	def Hash(directory):
+		directory = Path(directory)
+		sha = hashlib.sha256()
+		for path in sorted(directory.rglob('*')):
+			if (not path.is_file() or '__pycache__' in path.parts):
+				continue
+			sha.update(str(path.relative_to(directory)).encode('utf-8'))
+			sha.update(b'\0')
+			with open(path, 'rb') as file:
+				for chunk in iter(lambda: file.read(65536), b''):
+					sha.update(chunk)
+			sha.update(b'\0')
+		return sha.hexdigest()
+
+
+	# Remember that the given package is installed, as it is now.
+	def Record(this, packageName):
+		directory = this.GetDirectory(packageName)
+		entry = {
+			'directory': str(directory),
+			'sha256': this.Hash(directory),
+			'installed': time.time(),
+		}
+		with this.lock:
+			this.packages[packageName] = entry
+
+
+	# Forget the given package and remove it from the store.
+	def Remove(this, packageName):
+		with this.lock:
+			this.packages.pop(packageName, None)
+		directory = this.GetDirectory(packageName)
+		if (directory.exists()):
+			shutil.rmtree(directory)
+
+
+	# RETURN whether or not the given package is still as it was when it was installed.
+	# If trust is True, the package is only checked for existence, not hashed.
+	# If maxAge is given, packages installed more than that many seconds ago are stale.
+	def IsValid(this, packageName, trust=False, maxAge=None):
+		entry = this.packages.get(packageName)
+		if (entry is None):
+			return False
+
+		directory = this.GetDirectory(packageName)
+		if (not directory.is_dir()):
+			return False
+
+		if (trust):
+			return True
+
+		if (maxAge is not None and time.time() - entry.get('installed', 0) > maxAge):
+			return False
+
+		return this.Hash(directory) == entry.get('sha256')
+
+
+	# Check every package in *this.
+	# Packages which are no longer valid are removed from the store and *this.
+	# RETURN the names of the valid and removed packages.
+	def Validate(this, trust=False, maxAge=None):
+		valid = []
+		stale = []
+		for packageName in list(this.packages.keys()):
+			if (this.IsValid(packageName, trust, maxAge)):
+				valid.append(packageName)
+			else:
+				logging.info(f"{packageName} is missing or has changed since it was installed.")
+				stale.append(packageName)
+				this.Remove(packageName)
+		return valid, stale
+
+
+	# Remove everything in the store which *this doesn't know about (e.g. old downloads).
+	def RemoveUntracked(this):
+		if (not this.store.exists()):
+			return
+		tracked = set(this.packages.keys())
+		for path in this.store.iterdir():
+			if (path.name in tracked or path == this.path):
+				continue
+			logging.debug(f"Removing untracked {path}")
+			if (path.is_dir()):
+				shutil.rmtree(path)
+			else:
+				path.unlink()
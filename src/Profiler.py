@@ -0,0 +1,131 @@
+import os
+import io
+import time
+import random
+import pstats
+import inspect
+import logging
+import cProfile
+from pathlib import Path
+from .Exceptions import *
+
+# The Profiler runs individual requests under cProfile, so slow Endpoints can be found without profiling the whole server.
+# A request is profiled if it asks to be (see ShouldProfile) or is randomly sampled.
+# Each profile is written to the profile directory as a pstats file (e.g. for snakeviz or `python -m pstats`), along with a text summary of the top functions in each Endpoint.
+# Only the newest profiles are kept.
+# NOTE: cProfile follows the process's thread, not the request; other requests running at the same time may show up in a profile.
+class Profiler:
+
+	# Requests can ask to be profiled with this header (or a 'profile' query arg).
+	header = 'X-APIE-Profile'
+
+	def __init__(this, directory, sampleRate=0.0, keep=50, top=10):
+		this.directory = Path(directory)
+		this.sampleRate = float(sampleRate)
+
+		# How many profiles to keep.
+		this.keep = int(keep)
+
+		# How many functions to list for each Endpoint in the summary.
+		this.top = int(top)
+
+		# Only 1 profiler can run at a time.
+		this.active = False
+
+		this.profiled = 0
+
+
+	# RETURN whether or not the given request should be profiled.
+	def ShouldProfile(this, request):
+		if (this.active):
+			return False
+		if ('profile' in request.args or request.headers.get(this.header)):
+			return True
+		return this.sampleRate > 0 and random.random() < this.sampleRate
+
+
+	# Call the given function with the given args under the profiler.
+	# The profile is summarized for the given Endpoint classes.
+	# RETURN what the function returned and the path of the saved profile.
+	def Profile(this, name, classes, function, *args, **kwargs):
+		profile = cProfile.Profile()
+		this.active = True
+		try:
+			profile.enable()
+			try:
+				ret = function(*args, **kwargs)
+			finally:
+				profile.disable()
+		finally:
+			this.active = False
+
+		path = None
+		try:
+			path = this.Save(profile, name, classes)
+		except Exception as e:
+			logging.error(f"Could not save profile for {name}: {e}")
+		return ret, path
+
+
+	# Write the given profile and its summary to this.directory.
+	# RETURN the path of the pstats file.
+	def Save(this, profile, name, classes):
+		this.directory.mkdir(parents=True, exist_ok=True)
+		this.profiled += 1
+
+		safeName = ''.join(c if c.isalnum() or c in '-_' else '_' for c in name)[:64]
+		base = this.directory.joinpath(f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{this.profiled}-{safeName}")
+
+		path = base.with_suffix('.prof')
+		profile.dump_stats(str(path))
+
+		summary = this.Summarize(profile, name, classes)
+		base.with_suffix('.txt').write_text(summary)
+		logging.info(summary)
+
+		this.Rotate()
+		return path
+
+
+	# RETURN a text summary of the given profile: the top functions overall and in each of the given Endpoint classes.
+	def Summarize(this, profile, name, classes):
+		stream = io.StringIO()
+		stats = pstats.Stats(profile, stream=stream)
+		stats.sort_stats('cumulative')
+
+		stream.write(f"Profile of {name}\n\n")
+		stats.print_stats(this.top)
+
+		# {(source file, line, function name): Endpoint name}, for each method of each Endpoint.
+		methods = {}
+		for cls in classes:
+			for member in vars(cls).values():
+				if (inspect.isfunction(member)):
+					code = member.__code__
+					methods[(os.path.abspath(code.co_filename), code.co_firstlineno, code.co_name)] = cls.__name__
+
+		# {Endpoint name: [(cumulative time, total time, calls, function), ...]}
+		byEndpoint = {}
+		for (file, line, function), (primitiveCalls, calls, totalTime, cumulativeTime, callers) in stats.stats.items():
+			endpoint = methods.get((os.path.abspath(file), line, function))
+			if (endpoint is None):
+				continue
+			byEndpoint.setdefault(endpoint, []).append((cumulativeTime, totalTime, calls, f"{function} (line {line})"))
+
+		for endpoint, functions in byEndpoint.items():
+			stream.write(f"\nTop functions in {endpoint}:\n")
+			for cumulativeTime, totalTime, calls, function in sorted(functions, reverse=True)[:this.top]:
+				stream.write(f"  {cumulativeTime:10.6f}s cumulative  {totalTime:10.6f}s own  {calls:6d} calls  {function}\n")
+
+		return stream.getvalue()
+
+
+	# Remove all but the newest this.keep profiles.
+	def Rotate(this):
+		profiles = sorted(this.directory.glob('*.prof'), key=lambda path: path.stat().st_mtime)
+		for path in profiles[:max(0, len(profiles) - this.keep)]:
+			for stale in [path, path.with_suffix('.txt')]:
+				try:
+					stale.unlink()
+				except OSError:
+					pass
@@ -0,0 +1,156 @@
+import re
+import math
+import time
+import logging
+from flask import Response
+from .Exceptions import *
+from .LRUCache import LRUCache
+
+# A RateLimitRule says how often each client may make requests.
+# Each client gets limit requests per period seconds, in bursts of at most burst requests.
+# Clients are told apart by key:
+#   'credential' - the credentials sent (see Authenticator.credentialHeaders), if they were recently authenticated; otherwise, the IP address.
+#   'ip' - the IP address the request came from.
+#   'path' - not at all; every request this rule applies to counts against the same limit.
+# If paths are given, the rule only applies to request paths which one of them matches (as in re.match, i.e. from the start of the path).
+class RateLimitRule:
+	def __init__(this, limit, period=1, burst=None, key='ip', paths=None, name=None):
+		if (key not in ['credential', 'ip', 'path']):
+			raise APIError(f"Unknown rate limit key: {key}")
+
+		this.limit = float(limit)
+		this.period = float(period)
+		if (this.limit <= 0 or this.period <= 0):
+			raise APIError(f"Rate limits must allow some requests; got {limit} per {period} seconds")
+
+		# Tokens per second.
+		this.rate = this.limit / this.period
+
+		# How many tokens a bucket holds.
+		this.burst = float(burst if burst is not None else limit)
+
+		this.key = key
+
+		this.paths = None
+		if (paths):
+			this.paths = re.compile('|'.join(f"(?:{path})" for path in paths))
+
+		# Identifies *this in metrics and in the keys of its buckets.
+		this.name = name
+		if (this.name is None):
+			this.name = f"{key}:{limit}/{period}"
+			if (paths):
+				this.name += f":{'|'.join(paths)}"
+
+	# RETURN whether or not *this applies to the given path.
+	def Applies(this, path):
+		return this.paths is None or this.paths.match(path) is not None
+
+
+# A TokenBucket holds the tokens left for 1 client under 1 rule.
+# There may be very many of these, so they are kept small.
+class TokenBucket:
+	__slots__ = ['tokens', 'updated']
+
+	def __init__(this, tokens, updated):
+		this.tokens = tokens
+		this.updated = updated
+
+
+# The RateLimiter keeps clients from making more requests than their RateLimitRules allow, using a token bucket for each client and rule.
+# Buckets are refilled when they are next used, rather than on a timer, so each request costs the same no matter how many clients there are.
+# Buckets which have refilled completely are the same as new ones, so they are forgotten; at most size buckets are kept, the least recently used being forgotten first.
+# A request takes a token from every bucket it counts against or from none of them, so requests which are turned away don't use up any of the client's other limits.
+class RateLimiter:
+	def __init__(this, rules=None, size=100000):
+		this.rules = []
+		for rule in (rules or []):
+			if (isinstance(rule, dict)):
+				rule = RateLimitRule(**rule)
+			this.rules.append(rule)
+
+		# {(rule name, client): TokenBucket}
+		this.buckets = LRUCache(size)
+
+		# Fingerprints of credentials which were recently authenticated (see Authenticator.GetRateLimitClient).
+		# Only these get their own 'credential' buckets, so clients can't escape their limits (or push others' buckets out) by making up credentials.
+		this.verified = LRUCache(size)
+
+		# By rule name.
+		this.allowed = {rule.name: 0 for rule in this.rules}
+		this.limited = {rule.name: 0 for rule in this.rules}
+
+
+	# RETURN whether or not *this limits anything.
+	def IsLimiting(this):
+		return len(this.rules) > 0
+
+
+	# RETURN whether or not *this has any rules which tell clients apart by their credentials.
+	def IsLimitingCredentials(this):
+		return any(rule.key == 'credential' for rule in this.rules)
+
+
+	# Take a token from the bucket for each of the given (rule, client) pairs, if every one of them has a token to give; otherwise, take none.
+	# RETURN whether or not the tokens were taken and the most limiting (rule, bucket state), where the state is (limit, remaining, reset) and reset is how many seconds until the bucket is full again.
+	# If the tokens weren't taken, the most limiting rule is always one which had none to give.
+	def Take(this, limits):
+		now = time.monotonic()
+		buckets = []
+		for rule, client in limits:
+			bucket = this.buckets.Get((rule.name, client))
+			if (bucket is None):
+				bucket = TokenBucket(rule.burst, now)
+			else:
+				bucket.tokens = min(rule.burst, bucket.tokens + (now - bucket.updated) * rule.rate)
+				bucket.updated = now
+			buckets.append(bucket)
+
+		allowed = all(bucket.tokens >= 1 for bucket in buckets)
+
+		limiting = None
+		for (rule, client), bucket in zip(limits, buckets):
+			if (allowed):
+				bucket.tokens -= 1
+				this.allowed[rule.name] += 1
+			elif (bucket.tokens < 1):
+				this.limited[rule.name] += 1
+
+			# Once full, the bucket may be forgotten (see LRUCache.Get).
+			reset = (rule.burst - bucket.tokens) / rule.rate
+			this.buckets.Set((rule.name, client), bucket, reset)
+
+			state = (rule.burst, bucket.tokens, reset)
+			if (limiting is None or state[1] < limiting[1][1]):
+				limiting = (rule, state)
+
+		return allowed, limiting
+
+
+	# RETURN how many seconds until a token is available in a bucket with the given state.
+	def GetRetryAfter(this, rule, state):
+		return max(0.0, (1 - state[1]) / rule.rate)
+
+
+	# RETURN the standard rate limit headers for a bucket with the given state.
+	def GetHeaders(this, state):
+		limit, remaining, reset = state
+		return {
+			'RateLimit-Limit': str(int(limit)),
+			'RateLimit-Remaining': str(int(remaining)),
+			'RateLimit-Reset': str(math.ceil(reset)),
+		}
+
+
+	# RETURN the response for a request which was over its limit, with the given state (see RequestContext.rateLimit).
+	def Reject(this, error, state):
+		logging.debug(f"Rate limiting request: {error}")
+		rule, bucket = state
+		headers = this.GetHeaders(bucket)
+		headers['Retry-After'] = str(max(1, math.ceil(this.GetRetryAfter(rule, bucket))))
+		return Response(
+			response = f"Too many requests: {error}\n",
+			status = 429,
+			headers = headers,
+			mimetype = 'text/plain'
+		)
@@ -0,0 +1,159 @@
+import os
+import copy
+import time
+import shutil
+import logging
+import tempfile
+from .Exceptions import *
+
+# A RequestContext holds everything that is specific to a single request.
+# APIE creates one for each request it receives and hands it down the Endpoint chain (see Functor.PopulatePrecursor).
+# Because many requests may be processed at once, request-specific state should live here and not on the executor.
+# The request's data (args, form, json, and files) are only parsed when first requested and are then shared by every Functor in the chain.
+class RequestContext:
+	def __init__(this, executor, request):
+		this.executor = executor
+		this.request = request
+
+		# The Endpoint currently being processed.
+		# This allows that Endpoint to handle errors in its own execution.
+		this.endpoint = None
+
+		# The ChainPlan for this request, if one has been compiled.
+		this.plan = None
+
+		# Request data which has already been parsed, by field (see GetRequestData).
+		this.data = {}
+
+		# All Endpoints checked out for this request, as (name, Endpoint) pairs.
+		# These are returned to the executor's EndpointPool when the request completes.
+		this.checkedOut = []
+
+		# Paths of files made for this request (see GetUploadPath).
+		# These are deleted when the request completes.
+		this.temporaryFiles = []
+
+		# When the request must be finished by (as a time.monotonic() time) or None, if it may take as long as it likes.
+		# See APIE.GetDeadline.
+		this.deadline = None
+
+		# The most limiting (RateLimitRule, bucket state) this request was counted against or None, if it wasn't rate limited.
+		# See Authenticator.Limit.
+		this.rateLimit = None
+
+		# The names of the AdmissionGates this request is in (see APIE.ProcessEndpoint).
+		# Endpoints which appear more than once in a chain (e.g. .../multi/.../multi) only enter their gate once, rather than waiting on themselves.
+		this.gates = set()
+
+
+	# RETURN the given field of the request ('args', 'form', 'json', or 'files') as a plain dict.
+	# Each field is parsed the first time it is requested and never again; fields that are never requested are never parsed.
+	def GetRequestData(this, field):
+		if (field not in this.data):
+			this.data[field] = getattr(this, f"Parse{field.capitalize()}")()
+		return this.data[field]
+
+
+	def ParseArgs(this):
+		return this.request.args.to_dict()
+
+
+	def ParseForm(this):
+		if (this.request.mimetype not in ['application/x-www-form-urlencoded', 'multipart/form-data']):
+			return {}
+		return this.request.form.to_dict()
+
+
+	def ParseJson(this):
+		if (not this.request.is_json):
+			return {}
+		parsed = this.request.get_json(silent=True)
+		if (not isinstance(parsed, dict)):
+			return {}
+		return parsed
+
+
+	def ParseFiles(this):
+		if (this.request.mimetype != 'multipart/form-data'):
+			return {}
+		return this.request.files.to_dict()
+
+
+	# RETURN the uploaded file with the given name (a werkzeug FileStorage) or None.
+	# Read it as a stream (e.g. upload.stream.read(size)) to avoid holding the whole file in memory.
+	def GetUpload(this, name):
+		return this.GetRequestData('files').get(name)
+
+
+	# RETURN the path of a file on disk which contains the uploaded file with the given name, or None if there is no such upload.
+	# Uploads which were already written to disk as they were received (see SpooledUpload) are used as they are; smaller ones are copied in chunks to the executor's upload_directory.
+	# Either way, the file is deleted when the request completes.
+	def GetUploadPath(this, name):
+		upload = this.GetUpload(name)
+		if (upload is None):
+			return None
+
+		if (getattr(upload, 'uploadPath', None)):
+			return upload.uploadPath
+
+		spooledPath = getattr(upload.stream, 'path', None)
+		if (spooledPath):
+			upload.stream.flush()
+			upload.uploadPath = spooledPath
+			return spooledPath
+
+		with tempfile.NamedTemporaryFile('wb', dir=this.executor.upload_directory, delete=False) as file:
+			this.temporaryFiles.append(file.name)
+			upload.stream.seek(0)
+			shutil.copyfileobj(upload.stream, file)
+		upload.stream.seek(0)
+
+		upload.uploadPath = file.name
+		return file.name
+
+
+	# RETURN how many seconds are left before the deadline or None, if there is no deadline.
+	def GetRemainingTime(this):
+		if (this.deadline is None):
+			return None
+		return max(0.0, this.deadline - time.monotonic())
+
+
+	# Make sure there is still time to do the given thing.
+	# Raises DeadlineExceeded if not.
+	def CheckDeadline(this, doing):
+		if (this.deadline is not None and time.monotonic() >= this.deadline):
+			raise DeadlineExceeded(f"Deadline exceeded before {doing}")
+
+
+	# RETURN a RequestContext for part of this request which runs alongside the rest of it (e.g. each element of a multicall).
+	# Everything but the Endpoint being processed is shared with *this, so errors in each part are tracked separately but everything is still released with *this.
+	# Each part starts in the gates *this is in but enters others on its own, so parts running alongside each other are each counted.
+	def Fork(this):
+		fork = copy.copy(this)
+		fork.endpoint = None
+		fork.gates = set(this.gates)
+		return fork
+
+
+	# Get an Endpoint which is used by this request alone.
+	def Checkout(this, endpointName):
+		endpoint = this.executor.pool.Checkout(endpointName)
+		this.checkedOut.append((endpointName, endpoint))
+		return endpoint
+
+
+	# Give all Endpoints used by this request back to the executor.
+	# Call this once the response has been sent.
+	def Release(this):
+		for endpointName, endpoint in this.checkedOut:
+			this.executor.pool.Checkin(endpointName, endpoint)
+		this.checkedOut = []
+		this.endpoint = None
+
+		for path in this.temporaryFiles:
+			try:
+				os.remove(path)
+			except OSError as e:
+				logging.warning(f"Could not remove temporary file {path}: {e}")
+		this.temporaryFiles = []
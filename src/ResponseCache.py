@@ -0,0 +1,130 @@
+import logging
+import hashlib
+from flask import Response
+from .Exceptions import *
+from .LRUCache import LRUCache
+
+# The ResponseCache stores the responses of cacheable Endpoints so that identical requests can be answered without running any Endpoints.
+# Only GET requests whose final Endpoint sets cacheable = True are stored.
+# Responses are keyed on their path, query string, and any headers which could change the response (see vary).
+# Any extra headers given (e.g. the Authenticator's credentialHeaders) are added to vary.
+# Each stored response is given a strong ETag, so clients which already have the response can be answered with a 304.
+# If a Compressor is given, compressed copies of each response are stored as they are first requested, so each is only compressed once.
+# NOTE: each worker process has its own ResponseCache. Invalidate() only affects the process it is called in.
+class ResponseCache:
+	def __init__(this, size=1024, ttl=60, compressor=None, vary=None):
+		this.entries = LRUCache(size, ttl)
+
+		# See Compressor; None to never compress.
+		this.compressor = compressor
+
+		# Request headers which are part of the key.
+		# Responses are never shared between requests which differ in any of these.
+		this.vary = [
+			'Authorization',
+			'Cookie',
+			'Accept',
+		]
+		for header in (vary or []):
+			if (header.lower() not in [known.lower() for known in this.vary]):
+				this.vary.append(header)
+
+		# Response headers which are not stored.
+		this.uncacheableHeaders = [
+			'Content-Length',
+			'ETag',
+		]
+
+		this.notModified = 0
+
+	def __len__(this):
+		return len(this.entries)
+
+
+	# RETURN the key to store the response to the given request under.
+	def GetKey(this, request, path):
+		return (path, request.query_string, tuple(request.headers.get(header) for header in this.vary))
+
+
+	# RETURN the stored entry for the given key or None.
+	def Get(this, key):
+		return this.entries.Get(key)
+
+
+	# Store the given Flask Response under the given key.
+	# RETURN the stored entry or None, if the response could not be stored.
+	def Store(this, key, response):
+		if (response.status_code != 200 or response.is_streamed):
+			return None
+
+		# Never hand one client's cookies to another.
+		if ('Set-Cookie' in response.headers):
+			return None
+
+		body = response.get_data()
+		entry = {
+			'body': body,
+			'status': response.status_code,
+			'headers': [(name, value) for name, value in response.headers.items() if name not in this.uncacheableHeaders],
+			'mimetype': response.mimetype,
+			'etag': hashlib.sha256(body).hexdigest(),
+			'path': key[0],
+
+			# {encoding: compressed body}, filled in by Respond().
+			'encoded': {},
+		}
+		this.entries.Set(key, entry)
+		return entry
+
+
+	# RETURN a Flask Response for the given entry, compressed if the request accepts it (see Compressor).
+	# If the request already has this version of the response, the response will be an empty 304.
+	def Respond(this, request, entry):
+		body = entry['body']
+		etag = entry['etag']
+		headers = list(entry['headers'])
+
+		compressible = this.compressor is not None and this.compressor.IsCompressible(entry['mimetype'], len(body), dict(headers))
+		if (compressible):
+			encoding = this.compressor.GetEncoding(request)
+			if (encoding is not None):
+				if (encoding not in entry['encoded']):
+					entry['encoded'][encoding] = this.compressor.Compress(encoding, body)
+				body = entry['encoded'][encoding]
+				etag = f"{etag}-{encoding}"
+				headers.append(('Content-Encoding', encoding))
+
+		if (request.if_none_match.contains(etag)):
+			this.notModified += 1
+			response = Response(status=304)
+		else:
+			response = Response(
+				response = body,
+				status = entry['status'],
+				headers = headers,
+				mimetype = entry['mimetype'],
+				content_type = None,
+				direct_passthrough = True
+			)
+		response.set_etag(etag)
+		if (compressible):
+			response.vary.add('Accept-Encoding')
+		return response
+
+
+	# Remove stored responses.
+	# If path is given, only responses for that path and the paths under it are removed; otherwise, everything is removed.
+	# RETURN how many responses were removed.
+	def Invalidate(this, path=None):
+		if (path is None):
+			removed = len(this.entries)
+			this.entries.Clear()
+			return removed
+
+		path = path.strip('/')
+		removed = 0
+		for key in this.entries.Keys():
+			if (key[0] == path or key[0].startswith(f"{path}/")):
+				this.entries.Pop(key)
+				removed += 1
+		return removed
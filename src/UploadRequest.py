@@ -0,0 +1,75 @@
+import io
+import os
+import logging
+import tempfile
+from flask import Request
+from .Exceptions import *
+
+# A file which is kept in memory until it grows past threshold bytes and is then moved to a named file in directory.
+# Unlike tempfile.SpooledTemporaryFile, the file on disk has a path, so RequestContext.GetUploadPath can hand that out instead of copying the upload again.
+# The file on disk is removed when *this is closed, which werkzeug does once the request completes.
+class SpooledUpload:
+	def __init__(this, threshold, directory=None):
+		this.threshold = threshold
+		this.directory = directory
+		this.file = io.BytesIO()
+
+		# The path of the file on disk or None, while *this is still in memory.
+		this.path = None
+
+		if (this.threshold <= 0):
+			this.Rollover()
+
+
+	# Move *this to disk.
+	def Rollover(this):
+		if (this.path is not None):
+			return
+		memory = this.file
+		this.file = tempfile.NamedTemporaryFile('wb+', dir=this.directory, delete=False)
+		this.path = this.file.name
+		this.file.write(memory.getbuffer())
+		this.file.seek(memory.tell())
+
+
+	def write(this, data):
+		if (this.path is None and this.file.tell() + len(data) > this.threshold):
+			this.Rollover()
+		return this.file.write(data)
+
+
+	def close(this):
+		this.file.close()
+		if (this.path is None):
+			return
+		try:
+			os.remove(this.path)
+		except FileNotFoundError:
+			pass # e.g. an Endpoint moved it somewhere else.
+
+
+	def __iter__(this):
+		return iter(this.file)
+
+
+	# Everything else (read, seek, flush, etc.) goes to the file.
+	def __getattr__(this, name):
+		return getattr(this.file, name)
+
+
+# APIE's Flask Request class.
+# As in werkzeug, uploaded files are kept in memory only until they reach memoryThreshold bytes; after that, they are written to a temporary file (see SpooledUpload).
+# This only lets the threshold and the directory those files are written to be configured; werkzeug's default is 500KiB in the system's temporary directory.
+# APIE makes a subclass of this with the memoryThreshold and directory from its config (see APIE.Function).
+class UploadRequest(Request):
+
+	# How many bytes of each uploaded file to keep in memory before spilling to disk.
+	memoryThreshold = 500 * 1024
+
+	# Where to spill uploaded files to; None for the system default.
+	directory = None
+
+	# Override of werkzeug.Request method.
+	# RETURN a file for werkzeug to write each uploaded file to as it is received.
+	def _get_file_stream(this, total_content_length, content_type, filename=None, content_length=None):
+		return SpooledUpload(this.memoryThreshold, this.directory)
@@ -0,0 +1,34 @@
+import time
+import apie
+
+# Times Fetching from each of the places Endpoints usually Fetch from.
+# Call this after bench_pass so that there is a precursor to Fetch from (i.e. .../bench_pass/bench_fetch).
+# RETURNS {'seconds': {location: seconds taken for fetch_count Fetches}, 'fetch_count': ...}
+class bench_fetch(apie.Endpoint):
+	def __init__(this, name="bench_fetch"):
+		super().__init__(name)
+
+		this.optionalKWArgs['fetch_count'] = 1000
+
+		this.bench_own = "from bench_fetch"
+
+		# {location: the name to Fetch from there}
+		this.fetchNames = {
+			'this': 'bench_own',
+			'precursor': 'bench_value',
+			'executor': 'plan_cache_size',
+			'missing': 'bench_missing',
+		}
+
+		this.allowedNext = []
+
+	def Call(this):
+		count = int(this.fetch_count)
+		seconds = {}
+		for location, varName in this.fetchNames.items():
+			started = time.perf_counter()
+			for i in range(count):
+				this.Fetch(varName, None)
+			seconds[location] = time.perf_counter() - started
+		this.response.content.data['seconds'] = seconds
+		this.response.content.data['fetch_count'] = count
@@ -0,0 +1,12 @@
+import apie
+
+# The smallest Endpoint we can make: it returns a tiny json object.
+# Used to measure the cost of the request pipeline itself.
+class bench_hello(apie.Endpoint):
+	def __init__(this, name="bench_hello"):
+		super().__init__(name)
+
+		this.allowedNext = []
+
+	def Call(this):
+		this.response.content.data['hello'] = "world"
@@ -0,0 +1,11 @@
+import apie
+
+# Does nothing but hand the request on to the next Endpoint.
+# Sets bench_value for the next Endpoint to Fetch from its precursor.
+class bench_pass(apie.Endpoint):
+	def __init__(this, name="bench_pass"):
+		super().__init__(name)
+
+		this.bench_value = "from bench_pass"
+
+		this.allowedNext = []
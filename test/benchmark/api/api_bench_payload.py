@@ -0,0 +1,16 @@
+import apie
+
+# Returns a list of `items` records, to measure serializing larger responses.
+class bench_payload(apie.Endpoint):
+	def __init__(this, name="bench_payload"):
+		super().__init__(name)
+
+		this.optionalKWArgs['items'] = 100
+
+		this.allowedNext = []
+
+	def Call(this):
+		this.response.content.data['items'] = [
+			{'id': i, 'name': f"item {i}", 'tags': ['a', 'b', 'c'], 'score': i / 7}
+			for i in range(int(this.items))
+		]
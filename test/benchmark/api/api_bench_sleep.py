@@ -0,0 +1,15 @@
+import eventlet
+import apie
+
+# Waits for `sleep` seconds without blocking other requests, as an Endpoint waiting on a database or another service would.
+class bench_sleep(apie.Endpoint):
+	def __init__(this, name="bench_sleep"):
+		super().__init__(name)
+
+		this.optionalKWArgs['sleep'] = 0.01
+
+		this.allowedNext = []
+
+	def Call(this):
+		eventlet.sleep(float(this.sleep))
+		this.response.content.data['slept'] = float(this.sleep)
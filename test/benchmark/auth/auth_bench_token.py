@@ -0,0 +1,16 @@
+import hmac
+import apie
+
+# Allows requests with an "Authorization: Bearer <token>" header.
+# Decisions are cached, as a real Authenticator which checked tokens with another service would.
+class bench_token(apie.Authenticator):
+	def __init__(this, name="Benchmark Token Authenticator"):
+		super().__init__(name)
+
+		this.cacheCredentials = True
+
+		this.token = "bench"
+
+	def Authenticate(this):
+		header = this.request.headers.get('Authorization', '')
+		return hmac.compare_digest(header, f"Bearer {this.token}")
@@ -0,0 +1,77 @@
+import sys
+import logging
+from pathlib import Path
+import apie
+
+# The synthetic Endpoints and Authenticators the benchmarks use.
+benchmarkDirectory = Path(__file__).resolve().parent
+
+# The config every benchmark runs with, unless told otherwise.
+# Nothing is downloaded, so results only depend on the code under test.
+defaultOptions = {
+	'host': "127.0.0.1",
+	'port': 0,
+	'no_repo': True,
+	'authenticator': "bench_token",
+	'verbosity': 0,
+}
+
+# BenchAPIE is APIE with the synthetic Endpoints and Authenticators in test/benchmark registered.
+# If serve is False, BenchAPIE sets itself up as usual but doesn't serve; requests can then be made through this.flask.test_client(), etc.
+class BenchAPIE(apie.APIE):
+	def __init__(this, serve=True):
+		super().__init__()
+
+		this.serve = serve
+
+		# The socket we would have served on, if serve is False.
+		this.sock = None
+
+	# Override of eons.Executor method. See that class for details
+	def RegisterIncludedClasses(this):
+		super().RegisterIncludedClasses()
+		this.RegisterAllClassesInDirectory(str(benchmarkDirectory.joinpath("api")))
+		this.RegisterAllClassesInDirectory(str(benchmarkDirectory.joinpath("auth")))
+
+	# Override of apie.APIE method. See that class for details
+	def Serve(this, sock):
+		if (this.serve):
+			return super().Serve(sock)
+		this.sock = sock
+
+
+# RETURN the given options as command line arguments.
+def GetArgs(options):
+	args = []
+	for key, value in options.items():
+		args += [f"--{key}", str(value)]
+	return args
+
+
+# Make a BenchAPIE with the given options (which override defaultOptions).
+# APIE reads its config from the command line, so this replaces sys.argv while setting up.
+# RETURN the ready BenchAPIE.
+def Start(options=None, serve=False):
+	args = dict(defaultOptions)
+	args.update(options or {})
+
+	argv = sys.argv
+	sys.argv = [argv[0]] + GetArgs(args)
+	bench = BenchAPIE(serve)
+	try:
+		bench()
+	except SystemExit:
+		pass
+	finally:
+		sys.argv = argv
+
+	# Keep the benchmark's own output readable.
+	logging.getLogger().setLevel(logging.CRITICAL)
+	return bench
+
+
+# Serve with the given command line args, e.g. `python bench_apie.py --port 8080`.
+# This is what the load generator in benchmark.py runs.
+if (__name__ == '__main__'):
+	sys.argv = [sys.argv[0]] + GetArgs(defaultOptions) + sys.argv[1:]
+	BenchAPIE()()
@@ -0,0 +1,436 @@
+import os
+import gc
+import sys
+import json
+import time
+import socket
+import argparse
+import platform
+import tempfile
+import subprocess
+import http.client
+import tracemalloc
+import concurrent.futures
+from pathlib import Path
+
+# Benchmarks for APIE's request pipeline.
+#
+# Microbenchmarks run each stage (handling a whole request, ProcessEndpoint, Fetch, serialization, planning, authentication, and multi) in this process, without a network.
+# The memory benchmark measures how much memory each idle Endpoint takes, since APIE keeps many of them (see EndpointPool), and how much garbage resetting their responses makes.
+# The load test starts a real APIE server on localhost and measures throughput and latency at each of the given concurrencies.
+# Both use the synthetic Endpoints and Authenticator in this directory (see bench_apie.py).
+#
+# Results are written as json, so runs can be compared, e.g.:
+#   python test/benchmark/benchmark.py --output before.json
+#   (make changes)
+#   python test/benchmark/benchmark.py --output after.json --compare before.json
+
+benchmarkDirectory = Path(__file__).resolve().parent
+sys.path.insert(0, str(benchmarkDirectory))
+
+authorization = {'Authorization': "Bearer bench"}
+
+# The requests the load test makes.
+scenarios = {
+	'hello': "/bench_hello",
+	'chain': "/bench_pass/bench_pass/bench_hello",
+	'payload': "/bench_payload?items=100",
+	'multi': "/[one,two,three,four]bench_sleep?sleep=0.005",
+}
+
+
+# RETURN the given sorted list's value at the given percentile (0 - 100).
+def Percentile(ordered, percentile):
+	if (not ordered):
+		return None
+	index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+	return ordered[index]
+
+
+# RETURN a summary of the given latencies (in seconds), in microseconds.
+def Summarize(latencies):
+	ordered = sorted(latencies)
+	return {
+		'count': len(ordered),
+		'mean_us': sum(ordered) / len(ordered) * 1e6 if ordered else None,
+		'p50_us': Percentile(ordered, 50) * 1e6 if ordered else None,
+		'p99_us': Percentile(ordered, 99) * 1e6 if ordered else None,
+	}
+
+
+# Call the given function repeatedly for about the given number of seconds, after warming it up.
+# RETURN a summary of how long each call took.
+def Measure(function, seconds, warmup=20):
+	for i in range(warmup):
+		function()
+
+	latencies = []
+	stop = time.perf_counter() + seconds
+	while (True):
+		started = time.perf_counter()
+		function()
+		finished = time.perf_counter()
+		latencies.append(finished - started)
+		if (finished >= stop):
+			break
+	return Summarize(latencies)
+
+
+# Run each microbenchmark for the given number of seconds.
+# RETURN {benchmark: summary} and the time spent in each stage, as recorded by APIE's own metrics.
+def RunMicrobenchmarks(seconds):
+	import apie
+	from flask import request
+	from bench_apie import Start
+
+	bench = Start({'response_cache_size': 0})
+	client = bench.flask.test_client()
+	results = {}
+
+	def Check(response):
+		if (response.status_code != 200):
+			raise RuntimeError(f"Benchmark request failed ({response.status_code}): {response.get_data(as_text=True)}")
+		return response
+
+	def Get(path):
+		return lambda: Check(client.get(path, headers=authorization))
+
+	# The whole pipeline, as Flask sees it.
+	results['handler'] = Measure(Get("/bench_hello"), seconds)
+	results['handler_chain'] = Measure(Get(scenarios['chain']), seconds)
+	results['handler_payload'] = Measure(Get(scenarios['payload']), seconds)
+	results['unauthorized'] = Measure(lambda: client.get("/bench_hello"), seconds)
+	results['multi'] = Measure(Get("/[one,two,three,four]bench_hello"), seconds)
+	results['multi_sleep'] = Measure(Get(scenarios['multi']), seconds)
+
+	# Below the handler.
+	with bench.flask.test_request_context("/bench_payload", headers=authorization):
+		def ProcessEndpoint():
+			context = apie.RequestContext(bench, request)
+			try:
+				bench.ProcessEndpoint("bench_payload", request._get_current_object(), context=context, next=[])
+			finally:
+				context.Release()
+		results['process_endpoint'] = Measure(ProcessEndpoint, seconds)
+
+		def Authenticate():
+			authenticator = bench.authenticators.Checkout()
+			try:
+				if (not authenticator(executor=bench, path="bench_payload", request=request._get_current_object(), context=apie.RequestContext(bench, request))):
+					raise RuntimeError("Benchmark request was not authenticated")
+			finally:
+				bench.authenticators.Checkin(authenticator)
+		results['auth'] = Measure(Authenticate, seconds)
+
+	results['plan_compile'] = Measure(lambda: bench.CompilePlan('GET', "bench_pass/bench_pass/bench_hello"), seconds)
+	results['plan_cached'] = Measure(lambda: bench.GetPlan('GET', "bench_pass/bench_pass/bench_hello"), seconds)
+
+	data = {'items': [{'id': i, 'name': f"item {i}", 'tags': ['a', 'b', 'c'], 'score': i / 7} for i in range(100)]}
+	for serializer in ['Json', 'Jsonpickle', 'Auto']:
+		results[f"serialize_{serializer.lower()}"] = Measure(lambda: getattr(bench, f"Serialize{serializer}")(data), seconds)
+
+	# Fetch is too quick to time on its own, so bench_fetch times many Fetches from inside an Endpoint.
+	count = 1000
+	totals = {}
+	stop = time.perf_counter() + seconds
+	rounds = 0
+	while (rounds == 0 or time.perf_counter() < stop):
+		timings = Check(client.get(f"/bench_pass/bench_fetch?fetch_count={count}", headers=authorization)).get_json()
+		for location, taken in timings['seconds'].items():
+			totals[location] = totals.get(location, 0) + taken
+		rounds += 1
+	for location, taken in totals.items():
+		results[f"fetch_{location}"] = {
+			'count': rounds * count,
+			'mean_us': taken / (rounds * count) * 1e6,
+		}
+
+	return results, GetStages(bench)
+
+
+# Make the given number of Endpoints, as the EndpointPool would, and measure how much memory they take.
+# RETURN {measurement: value}.
+def RunMemoryBenchmark(count):
+	from bench_apie import Start
+
+	bench = Start({'response_cache_size': 0})
+	client = bench.flask.test_client()
+
+	# Load everything a request needs, so that only the Endpoints themselves are measured.
+	client.get("/bench_hello", headers=authorization)
+	cls = bench.pool.GetClass("bench_hello")
+
+	endpoints = []
+	gc.collect()
+	objects = len(gc.get_objects())
+	tracemalloc.start()
+	try:
+		before = tracemalloc.get_traced_memory()[0]
+		for i in range(count):
+			endpoint = cls()
+			endpoint.Initialize()
+			endpoints.append(endpoint)
+		gc.collect()
+		after = tracemalloc.get_traced_memory()[0]
+	finally:
+		tracemalloc.stop()
+
+	results = {
+		'endpoints': count,
+		'bytes_per_endpoint': (after - before) / count,
+		'objects_per_endpoint': (len(gc.get_objects()) - objects) / count,
+	}
+
+	# Endpoints are reset for every request they're used for.
+	endpoint = endpoints[0]
+	def Reset():
+		endpoint.response.headers['X-Bench'] = "bench"
+		endpoint.response.content.data['hello'] = "world"
+		endpoint.ResetResponse()
+
+	started = time.perf_counter()
+	for i in range(count * 100):
+		Reset()
+	finished = time.perf_counter()
+	results['reset_us'] = (finished - started) / (count * 100) * 1e6
+
+	# How much memory is allocated (and then freed) each time.
+	allocated = 0
+	tracemalloc.start()
+	try:
+		for i in range(count):
+			tracemalloc.reset_peak()
+			current = tracemalloc.get_traced_memory()[0]
+			Reset()
+			allocated += tracemalloc.get_traced_memory()[1] - current
+	finally:
+		tracemalloc.stop()
+	results['reset_bytes'] = allocated / count
+
+	return results
+
+
+# RETURN the mean time spent in each stage of each Endpoint, from the given APIE's metrics.
+def GetStages(bench):
+	if (bench.metrics is None):
+		return {}
+	stages = {}
+	for (stage, endpoint), histogram in bench.metrics.timings.items():
+		if (not histogram.count):
+			continue
+		name = f"{endpoint}.{stage}" if endpoint else stage
+		stages[name] = {
+			'count': histogram.count,
+			'mean_us': histogram.sum / histogram.count * 1e6,
+		}
+	return stages
+
+
+# RETURN a port nothing is listening on.
+def GetFreePort():
+	with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+		sock.bind(("127.0.0.1", 0))
+		return sock.getsockname()[1]
+
+
+# Start a BenchAPIE server in its own process.
+# RETURN the process and the port it is serving on.
+def StartServer(directory, workers):
+	port = GetFreePort()
+	command = [sys.executable, str(benchmarkDirectory.joinpath("bench_apie.py")), '--port', str(port), '--workers', str(workers)]
+	server = subprocess.Popen(command, cwd=directory, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+	deadline = time.time() + 60
+	while (time.time() < deadline):
+		if (server.poll() is not None):
+			raise RuntimeError(f"Benchmark server exited with {server.returncode}")
+		try:
+			connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+			connection.request('GET', "/bench_hello", headers=authorization)
+			connection.getresponse().read()
+			connection.close()
+			return server, port
+		except OSError:
+			time.sleep(0.2)
+
+	server.kill()
+	raise RuntimeError("Benchmark server did not start in time")
+
+
+def StopServer(server):
+	server.terminate()
+	try:
+		server.wait(timeout=30)
+	except subprocess.TimeoutExpired:
+		server.kill()
+		server.wait()
+
+
+# Make requests for the given path over 1 kept-alive connection until the given time.
+# RETURN the latency of each successful request and how many failed.
+def Client(port, path, stop):
+	latencies = []
+	errors = 0
+	connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+	while (time.perf_counter() < stop):
+		started = time.perf_counter()
+		try:
+			connection.request('GET', path, headers=authorization)
+			response = connection.getresponse()
+			response.read()
+			if (response.status == 200):
+				latencies.append(time.perf_counter() - started)
+			else:
+				errors += 1
+		except (OSError, http.client.HTTPException):
+			errors += 1
+			connection.close()
+			connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+	connection.close()
+	return latencies, errors
+
+
+# Run each scenario against a real server at each concurrency for the given number of seconds.
+# RETURN a list of results.
+def RunLoadTest(concurrencies, seconds, workers):
+	results = []
+	with tempfile.TemporaryDirectory() as directory:
+		server, port = StartServer(directory, workers)
+		try:
+			for scenario, path in scenarios.items():
+				for concurrency in concurrencies:
+					# Warm up (e.g. fill the Endpoint pool) before measuring.
+					Client(port, path, time.perf_counter() + min(0.5, seconds))
+
+					started = time.perf_counter()
+					stop = started + seconds
+					with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+						outcomes = list(pool.map(lambda i: Client(port, path, stop), range(concurrency)))
+					elapsed = time.perf_counter() - started
+
+					latencies = [latency for outcome in outcomes for latency in outcome[0]]
+					result = {
+						'scenario': scenario,
+						'path': path,
+						'concurrency': concurrency,
+						'workers': workers,
+						'seconds': elapsed,
+						'errors': sum(outcome[1] for outcome in outcomes),
+						'requests_per_second': len(latencies) / elapsed,
+					}
+					result.update(Summarize(latencies))
+					results.append(result)
+					print(f"  {scenario:10} concurrency {concurrency:4}: {result['requests_per_second']:10.1f} req/s  p50 {Format(result['p50_us'])}  p99 {Format(result['p99_us'])}  errors {result['errors']}")
+		finally:
+			StopServer(server)
+	return results
+
+
+# RETURN the given microseconds, readably.
+def Format(microseconds):
+	if (microseconds is None):
+		return "       n/a"
+	if (microseconds >= 1000):
+		return f"{microseconds / 1000:8.2f}ms"
+	return f"{microseconds:8.2f}us"
+
+
+# RETURN information about where the benchmarks were run, so results from different machines aren't mistaken for a regression.
+def GetEnvironment():
+	try:
+		commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=benchmarkDirectory, capture_output=True, text=True).stdout.strip() or None
+	except OSError:
+		commit = None
+	return {
+		'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+		'commit': commit,
+		'python': platform.python_version(),
+		'platform': platform.platform(),
+		'processor': platform.processor(),
+		'cpus': os.cpu_count(),
+	}
+
+
+# Print how the given results differ from the previous results.
+def Compare(results, previous):
+	print(f"\nCompared to {previous['environment'].get('commit')} ({previous['environment'].get('time')}):")
+
+	for name, result in results.get('micro', {}).items():
+		before = previous.get('micro', {}).get(name)
+		if (before is None or not before.get('mean_us')):
+			continue
+		change = (result['mean_us'] - before['mean_us']) / before['mean_us'] * 100
+		print(f"  {name:20} {Format(before['mean_us'])} -> {Format(result['mean_us'])}  ({change:+.1f}% time)")
+
+	for name, result in results.get('memory', {}).items():
+		before = previous.get('memory', {}).get(name)
+		if (before is None or name == 'endpoints'):
+			continue
+		print(f"  {name:20} {before:10.2f} -> {result:10.2f}")
+
+	earlier = {(result['scenario'], result['concurrency'], result['workers']): result for result in previous.get('load', [])}
+	for result in results.get('load', []):
+		before = earlier.get((result['scenario'], result['concurrency'], result['workers']))
+		if (before is None or not before.get('requests_per_second')):
+			continue
+		change = (result['requests_per_second'] - before['requests_per_second']) / before['requests_per_second'] * 100
+		print(f"  {result['scenario']:10} concurrency {result['concurrency']:4}: {before['requests_per_second']:10.1f} -> {result['requests_per_second']:10.1f} req/s  ({change:+.1f}%)  p99 {Format(before['p99_us'])} -> {Format(result['p99_us'])}")
+
+
+def Main():
+	parser = argparse.ArgumentParser(description="Benchmark APIE's request pipeline.")
+	parser.add_argument('--output', default="benchmark.json", help="where to write the results (json)")
+	parser.add_argument('--compare', default=None, help="results from a previous run to compare against")
+	parser.add_argument('--seconds', type=float, default=1.0, help="how long to run each microbenchmark")
+	parser.add_argument('--load-seconds', type=float, default=5.0, help="how long to run each load test")
+	parser.add_argument('--concurrency', default="1,8,32", help="comma separated concurrencies to load test with")
+	parser.add_argument('--workers', type=int, default=1, help="how many worker processes the load tested server should use")
+	parser.add_argument('--skip-micro', action='store_true', help="don't run the microbenchmarks")
+	parser.add_argument('--skip-load', action='store_true', help="don't run the load test")
+	parser.add_argument('--skip-memory', action='store_true', help="don't run the memory benchmark")
+	parser.add_argument('--endpoints', type=int, default=1000, help="how many Endpoints the memory benchmark should make")
+	args = parser.parse_args()
+
+	results = {'environment': GetEnvironment()}
+
+	# APIE writes its repo store, etc. to the working directory.
+	cwd = os.getcwd()
+	if (not args.skip_micro):
+		print("Microbenchmarks:")
+		with tempfile.TemporaryDirectory() as directory:
+			os.chdir(directory)
+			try:
+				results['micro'], results['stages'] = RunMicrobenchmarks(args.seconds)
+			finally:
+				os.chdir(cwd)
+		for name, result in results['micro'].items():
+			print(f"  {name:20} {Format(result['mean_us'])} mean  p50 {Format(result.get('p50_us'))}  p99 {Format(result.get('p99_us'))}")
+		print("Mean time in each stage:")
+		for name, result in sorted(results['stages'].items()):
+			print(f"  {name:40} {Format(result['mean_us'])}")
+
+	if (not args.skip_memory):
+		print("Memory:")
+		with tempfile.TemporaryDirectory() as directory:
+			os.chdir(directory)
+			try:
+				results['memory'] = RunMemoryBenchmark(args.endpoints)
+			finally:
+				os.chdir(cwd)
+		for name, result in results['memory'].items():
+			print(f"  {name:20} {result:10.2f}")
+
+	if (not args.skip_load):
+		print("Load test:")
+		concurrencies = [int(concurrency) for concurrency in args.concurrency.split(',')]
+		results['load'] = RunLoadTest(concurrencies, args.load_seconds, args.workers)
+
+	Path(args.output).write_text(json.dumps(results, indent=2))
+	print(f"\nResults written to {args.output}")
+
+	if (args.compare):
+		Compare(results, json.loads(Path(args.compare).read_text()))
+
+
+if (__name__ == '__main__'):
+	Main()
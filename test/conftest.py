@@ -0,0 +1,53 @@
+import sys
+import pytest
+from pathlib import Path
+
+# The tests use the synthetic Endpoints and Authenticator from the benchmarks (see benchmark/bench_apie.py).
+sys.path.insert(0, str(Path(__file__).resolve().parent.joinpath("benchmark")))
+
+import apie
+from bench_apie import Start
+
+
+# Streams a few lines of text.
+# Defined here so that every test module can request it (see the stream fixture).
+class stream_lines(apie.Endpoint):
+	def __init__(this, name="stream_lines"):
+		super().__init__(name)
+
+		this.allowedNext = []
+		this.mime = 'text/plain'
+
+	def Call(this):
+		this.response.content.message = (f"line {i}\n" for i in range(3))
+
+
+# RETURN a function which makes a ready (but not serving) APIE with the given options (see bench_apie.Start).
+# Requests can then be made through its flask.test_client().
+# APIE writes its repo store, etc. to the working directory, so each test gets its own.
+@pytest.fixture
+def start(tmp_path, monkeypatch):
+	monkeypatch.chdir(tmp_path)
+	return Start
+
+
+# RETURN the headers which the benchmark Authenticator (bench_token) accepts.
+@pytest.fixture
+def authorization():
+	return {'Authorization': "Bearer bench"}
+
+
+# RETURN a function which makes a test client for the given APIE, which sends the authorization with every request.
+@pytest.fixture
+def connect(authorization):
+	def Connect(bench):
+		client = bench.flask.test_client()
+		client.environ_base['HTTP_AUTHORIZATION'] = authorization['Authorization']
+		return client
+	return Connect
+
+
+# RETURN the name of the streaming Endpoint and the body it streams.
+@pytest.fixture
+def stream():
+	return "stream_lines", "line 0\nline 1\nline 2\n"
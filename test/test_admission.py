@@ -0,0 +1,68 @@
+import eventlet
+import apie
+
+
+def test_requests_beyond_the_limit_are_shed(start, connect):
+	bench = start({'max_in_flight': 1, 'admission_queue_size': 0})
+	client = connect(bench)
+
+	slow = eventlet.spawn(client.get, "/bench_sleep?sleep=0.1")
+	eventlet.sleep(0.01)
+
+	shed = client.get("/bench_hello")
+	assert shed.status_code == 503
+	assert shed.headers['Retry-After'] == "1"
+
+	assert slow.wait().status_code == 200
+	assert client.get("/bench_hello").status_code == 200
+	assert bench.admission.gates[''].shed['queue_full'] == 1
+
+
+def test_streams_hold_their_gates_until_closed(start, connect, stream):
+	name, body = stream
+	bench = start({'max_in_flight': 1, 'admission_queue_size': 0})
+	bench.admission.gates[name] = apie.AdmissionGate(name, 1)
+	client = connect(bench)
+
+	response = client.get(f"/{name}", buffered=False)
+	assert response.status_code == 200
+	assert bench.admission.gates[''].GetInFlight() == 1
+	assert bench.admission.gates[name].GetInFlight() == 1
+	assert client.get("/bench_hello").status_code == 503
+
+	assert response.get_data(as_text=True) == body
+	response.close()
+	assert bench.admission.gates[''].GetInFlight() == 0
+	assert bench.admission.gates[name].GetInFlight() == 0
+	assert client.get("/bench_hello").status_code == 200
+
+
+def test_overloaded_multicall_elements_are_503(start, connect):
+	bench = start()
+	bench.admission = apie.AdmissionController(0, {'bench_sleep': 1}, 0)
+	client = connect(bench)
+
+	response = client.get("/[a,b]bench_sleep?sleep=0.05")
+	assert response.status_code == 200
+	codes = sorted(ret['code'] for ret in response.get_json()[-1])
+	assert codes == [200, 503]
+
+
+def test_endpoints_repeated_in_a_chain_do_not_wait_on_themselves(start, connect):
+	bench = start()
+	bench.admission = apie.AdmissionController(0, {'bench_pass': 1}, 1, 0.05)
+	client = connect(bench)
+	gate = bench.admission.gates['bench_pass']
+
+	response = client.get("/bench_pass/bench_pass/bench_pass/bench_hello")
+	assert response.status_code == 200
+	assert gate.admitted == 1
+	assert gate.shed == {'queue_full': 0, 'queue_timeout': 0}
+	assert gate.GetInFlight() == 0
+
+	# Other requests still wait for the gate.
+	slow = eventlet.spawn(client.get, "/bench_pass/bench_sleep?sleep=0.1")
+	eventlet.sleep(0.01)
+	assert client.get("/bench_pass/bench_pass/bench_hello").status_code == 503
+	assert slow.wait().status_code == 200
+	assert gate.shed['queue_timeout'] == 1
@@ -0,0 +1,107 @@
+import time
+import eventlet
+import apie
+
+
+# Waits before deciding, so that other requests are authenticated in the meantime.
+class slow_path_auth(apie.Authenticator):
+	def __init__(this, name="Slow Path Authenticator"):
+		super().__init__(name)
+
+	def Authenticate(this):
+		eventlet.sleep(0.05)
+		return this.path == "bench_hello"
+
+
+def test_concurrent_requests_are_authenticated_separately(start):
+	bench = start({'authenticator': "slow_path_auth"})
+	client = bench.flask.test_client()
+
+	statuses = {}
+	def Get(path):
+		statuses[path] = client.get(f"/{path}").status_code
+
+	first = eventlet.spawn(Get, "bench_payload")
+	eventlet.sleep(0.01)
+	second = eventlet.spawn(Get, "bench_hello")
+	first.wait()
+	second.wait()
+
+	assert statuses == {'bench_payload': 401, 'bench_hello': 200}
+
+
+def test_pooled_authenticators_share_state(start):
+	bench = start()
+	first = bench.authenticators.Checkout()
+	second = bench.authenticators.Checkout()
+
+	assert first is not second
+	assert first.credentials is not None
+	assert first.credentials is bench.auth.credentials
+	assert second.credentials is bench.auth.credentials
+
+	bench.authenticators.Checkin(first)
+	bench.authenticators.Checkin(second)
+	assert bench.authenticators.Checkout() in [first, second]
+
+
+
+# Remembers its decisions and counts how many it has made.
+class counting_auth(apie.Authenticator):
+	decisions = 0
+
+	def __init__(this, name="Counting Authenticator"):
+		super().__init__(name)
+
+		this.cacheCredentials = True
+		this.credentialTTL = 0.1
+
+	def Authenticate(this):
+		counting_auth.decisions += 1
+		return this.request.headers.get('Authorization') == "Bearer good"
+
+
+def Decide(client, token, path="bench_hello"):
+	before = counting_auth.decisions
+	status = client.get(f"/{path}", headers={'Authorization': f"Bearer {token}"}).status_code
+	return status, counting_auth.decisions - before
+
+
+def test_credential_decisions_are_remembered(start):
+	bench = start({'authenticator': "counting_auth"})
+	client = bench.flask.test_client()
+
+	assert Decide(client, "good") == (200, 1)
+	assert Decide(client, "good") == (200, 0)
+	assert Decide(client, "bad") == (401, 1)
+	assert Decide(client, "bad") == (401, 0)
+
+	# Each path is decided separately.
+	assert Decide(client, "good", "bench_payload")[1] == 1
+	assert bench.auth.GetCredentialCacheStats()['hits'] == 2
+
+
+def test_credential_decisions_expire(start):
+	bench = start({'authenticator': "counting_auth"})
+	client = bench.flask.test_client()
+
+	assert Decide(client, "good") == (200, 1)
+	time.sleep(0.15)
+	assert Decide(client, "good") == (200, 1)
+	assert bench.auth.GetCredentialCacheStats()['expirations'] == 1
+
+
+def test_revoked_credentials_are_decided_again(start):
+	bench = start({'authenticator': "counting_auth"})
+	client = bench.flask.test_client()
+
+	Decide(client, "good")
+	Decide(client, "good", "bench_payload")
+	Decide(client, "other")
+
+	assert bench.auth.RevokeCredentials({'Authorization': "Bearer good"}) == 2
+	assert Decide(client, "good") == (200, 1)
+	assert Decide(client, "other") == (401, 0)
+
+	bench.auth.RevokeAllCredentials()
+	assert Decide(client, "other") == (401, 1)
@@ -0,0 +1,30 @@
+def Batch(client, entries):
+	response = client.post("/batch", json=entries)
+	assert response.status_code == 200
+	return response.get_json()
+
+
+def test_batches_cannot_contain_batches(start, connect):
+	client = connect(start())
+
+	inner = [{'path': "bench_hello"}]
+	responses = Batch(client, [
+		{'path': "bench_hello"},
+		{'path': "batch", 'method': "POST", 'body': inner},
+		{'path': "/batch/", 'method': "POST", 'body': inner},
+		{'path': "[a,b]batch", 'method': "POST", 'body': inner},
+	])
+
+	assert responses[0]['status'] == 200
+	assert responses[0]['body']['hello'] == "world"
+	for response in responses[1:]:
+		assert response['status'] == 400
+		assert "Batches cannot contain batches" in str(response['body'])
+
+
+def test_batches_can_follow_batches(start, connect):
+	client = connect(start())
+
+	for i in range(2):
+		responses = Batch(client, [{'path': "bench_hello"}])
+		assert responses[0]['status'] == 200
@@ -0,0 +1,202 @@
+import gzip
+import zlib
+import pytest
+import apie
+
+
+# Returns size bytes of text.
+# The type, code, encoding, and etag args set those parts of the response.
+class compressed_text(apie.Endpoint):
+	def __init__(this, name="compressed_text"):
+		super().__init__(name)
+
+		this.supportedMethods = ['GET']
+		this.allowedNext = []
+		this.mime = 'text/plain'
+
+	def Call(this):
+		args = this.request.args
+		this.response.content.message = "x" * int(args.get('size', 2000))
+		this.response.code = int(args.get('code', 200))
+		this.mime = args.get('type', 'text/plain')
+		if ('encoding' in args):
+			this.response.headers['Content-Encoding'] = args['encoding']
+		if ('etag' in args):
+			this.response.headers['ETag'] = f'"{args["etag"]}"'
+
+
+# Returns a little over 2000 bytes of json, which may be cached.
+class compressed_cached(apie.Endpoint):
+	calls = 0
+
+	def __init__(this, name="compressed_cached"):
+		super().__init__(name)
+
+		this.supportedMethods = ['GET']
+		this.allowedNext = []
+		this.cacheable = True
+
+	def Call(this):
+		compressed_cached.calls += 1
+		this.response.content.data['text'] = "x" * 2000
+
+
+def Decompress(response):
+	decompress = {
+		None: lambda body: body,
+		'gzip': gzip.decompress,
+		'deflate': zlib.decompress,
+	}[response.headers.get('Content-Encoding')]
+	return decompress(response.get_data())
+
+
+@pytest.fixture
+def compress(start, connect):
+	def Start(options=None):
+		bench = start(options)
+		client = connect(bench)
+		def Get(query="", encoding="gzip", **kwargs):
+			headers = kwargs.pop('headers', {})
+			if (encoding is not None):
+				headers['Accept-Encoding'] = encoding
+			return client.get(f"/compressed_text?{query}", headers=headers, **kwargs)
+		return bench, Get
+	return Start
+
+
+@pytest.mark.parametrize('accept, expected', [
+	("gzip", 'gzip'),
+	("deflate", 'deflate'),
+	("gzip;q=0.5, deflate", 'deflate'),
+	("gzip, deflate", 'gzip'),
+	("*", 'gzip'),
+	("br", None),
+	("identity", None),
+	("gzip;q=0, identity", None),
+	(None, None),
+])
+def test_encoding_is_negotiated(compress, accept, expected):
+	bench, Get = compress({'compression_encodings': "gzip,deflate"})
+	response = Get(encoding=accept)
+
+	assert response.status_code == 200
+	assert response.headers.get('Content-Encoding') == expected
+	assert Decompress(response) == b"x" * 2000
+	assert 'Accept-Encoding' in response.vary
+	if (expected is not None):
+		assert int(response.headers['Content-Length']) == len(response.get_data()) < 2000
+
+
+def test_encodings_are_preferred_in_order(compress):
+	bench, Get = compress({'compression_encodings': "deflate,gzip"})
+	assert Get(encoding="gzip, deflate").headers['Content-Encoding'] == 'deflate'
+
+
+def test_compression_can_be_turned_off(compress):
+	bench, Get = compress({'compression_encodings': ""})
+	response = Get()
+
+	assert bench.compressor is None
+	assert 'Content-Encoding' not in response.headers
+	assert 'Accept-Encoding' not in response.vary
+
+
+def test_small_responses_are_not_compressed(compress):
+	bench, Get = compress()
+	response = Get("size=1023")
+	assert 'Content-Encoding' not in response.headers
+	assert 'Accept-Encoding' not in response.vary
+
+	assert Get("size=1024").headers['Content-Encoding'] == 'gzip'
+
+
+def test_the_threshold_can_be_changed(compress):
+	bench, Get = compress({'compression_threshold': 100})
+	assert Get("size=100").headers['Content-Encoding'] == 'gzip'
+	assert 'Content-Encoding' not in Get("size=99").headers
+
+
+def test_only_compressible_types_are_compressed(compress):
+	bench, Get = compress()
+	assert 'Content-Encoding' not in Get("type=image/png").headers
+	assert Get("type=text/plain; charset=utf-8").headers['Content-Encoding'] == 'gzip'
+
+
+def test_the_types_can_be_changed(compress):
+	bench, Get = compress({'compression_types': "image/png"})
+	assert Get("type=image/png").headers['Content-Encoding'] == 'gzip'
+	assert 'Content-Encoding' not in Get().headers
+
+
+def test_encoded_responses_are_not_compressed_again(compress):
+	bench, Get = compress()
+	response = Get("encoding=br")
+
+	assert response.headers['Content-Encoding'] == 'br'
+	assert response.get_data() == b"x" * 2000
+
+
+@pytest.mark.parametrize('code', [204, 304])
+def test_empty_responses_are_not_compressed(compress, code):
+	bench, Get = compress()
+	response = Get(f"code={code}")
+
+	assert response.status_code == code
+	assert 'Content-Encoding' not in response.headers
+
+
+def test_streamed_responses_are_not_compressed(start, connect, stream):
+	name, body = stream
+	bench = start({'compression_threshold': 0})
+	response = connect(bench).get(f"/{name}", headers={'Accept-Encoding': "gzip"})
+
+	assert 'Content-Encoding' not in response.headers
+	assert response.get_data(as_text=True) == body
+
+
+def test_each_encoding_has_its_own_etag(compress):
+	bench, Get = compress()
+	plain = Get("etag=abc", encoding=None)
+	compressed = Get("etag=abc")
+
+	assert plain.headers['ETag'] == '"abc"'
+	assert compressed.headers['ETag'] == '"abc-gzip"'
+
+
+def test_cached_responses_are_compressed_once_per_encoding(start, connect):
+	bench = start({'response_cache_size': 16, 'compression_encodings': "gzip,deflate"})
+	client = connect(bench)
+	def Get(encoding, etag=None):
+		headers = {'Accept-Encoding': encoding}
+		if (etag is not None):
+			headers['If-None-Match'] = etag
+		return client.get("/compressed_cached", headers=headers)
+
+	calls = compressed_cached.calls
+	gzipped = Get("gzip")
+	deflated = Get("deflate")
+	plain = Get("identity")
+	again = Get("gzip")
+
+	assert compressed_cached.calls == calls + 1
+	assert bench.compressor.compressed == {'gzip': 1, 'deflate': 1}
+
+	etags = [response.headers['ETag'] for response in [gzipped, deflated, plain]]
+	assert len(set(etags)) == 3
+	assert etags[0] == f'{etags[2][:-1]}-gzip"'
+	assert etags[1] == f'{etags[2][:-1]}-deflate"'
+	assert again.headers['ETag'] == etags[0]
+	assert again.get_data() == gzipped.get_data()
+	assert Decompress(gzipped) == Decompress(deflated) == plain.get_data()
+
+	for response in [gzipped, deflated, plain, again]:
+		assert 'Accept-Encoding' in response.vary
+
+	# Clients only have the version they were sent.
+	notModified = Get("gzip", etags[0])
+	assert notModified.status_code == 304
+	assert notModified.get_data() == b""
+	assert notModified.headers['ETag'] == etags[0]
+	assert Get("identity", etags[0]).status_code == 200
+	assert Get("deflate", etags[0]).status_code == 200
+	assert Get("identity", etags[2]).status_code == 304
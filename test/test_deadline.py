@@ -0,0 +1,138 @@
+import time
+import pytest
+import apie
+
+
+# Reports how long it has left.
+class deadline_remaining(apie.Endpoint):
+	def __init__(this, name="deadline_remaining"):
+		super().__init__(name)
+
+		this.supportedMethods = ['GET']
+		this.allowedNext = []
+
+	def Call(this):
+		this.response.content.data['remaining'] = this.GetRemainingTime()
+
+
+# Works for 0.1 seconds without ever waiting, so it can't be interrupted.
+class deadline_busy(apie.Endpoint):
+	def __init__(this, name="deadline_busy"):
+		super().__init__(name)
+
+		this.supportedMethods = ['GET']
+		this.allowedNext = []
+
+	def Call(this):
+		time.sleep(0.1)
+
+
+# Counts how many times it is called.
+class deadline_after(apie.Endpoint):
+	calls = 0
+
+	def __init__(this, name="deadline_after"):
+		super().__init__(name)
+
+		this.supportedMethods = ['GET']
+		this.allowedNext = []
+
+	def Call(this):
+		deadline_after.calls += 1
+
+
+def Timeout(seconds):
+	return {'X-Request-Timeout': str(seconds)}
+
+
+def test_requests_without_deadlines_may_take_as_long_as_they_like(start, connect):
+	client = connect(start())
+	assert client.get("/bench_sleep?sleep=0.05").status_code == 200
+	assert client.get("/deadline_remaining").get_json()['remaining'] is None
+
+
+def test_requests_past_the_request_timeout_are_504(start, connect):
+	client = connect(start({'request_timeout': 0.05}))
+	response = client.get("/bench_sleep?sleep=1")
+
+	assert response.status_code == 504
+	assert response.get_data(as_text=True).startswith("Gateway timeout:")
+	assert client.get("/bench_sleep?sleep=0.01").status_code == 200
+
+
+def test_clients_may_ask_for_shorter_deadlines(start, connect):
+	client = connect(start())
+	assert client.get("/bench_sleep?sleep=1", headers=Timeout(0.05)).status_code == 504
+	assert client.get("/bench_sleep?sleep=0.01", headers=Timeout(1)).status_code == 200
+
+
+def test_clients_may_not_ask_for_longer_deadlines(start, connect):
+	client = connect(start({'request_timeout': 0.05}))
+	assert client.get("/bench_sleep?sleep=1", headers=Timeout(10)).status_code == 504
+
+	remaining = client.get("/deadline_remaining", headers=Timeout(10)).get_json()['remaining']
+	assert 0 < remaining <= 0.05
+
+
+@pytest.mark.parametrize('header', ["soon", "1s", "nan?"])
+def test_bad_deadline_headers_are_400(start, connect, header):
+	client = connect(start())
+	response = client.get("/bench_hello", headers={'X-Request-Timeout': header})
+
+	assert response.status_code == 400
+	assert "X-Request-Timeout" in response.get_data(as_text=True)
+
+
+def test_endpoints_know_how_long_they_have_left(start, connect):
+	client = connect(start())
+	remaining = client.get("/deadline_remaining", headers=Timeout(5)).get_json()['remaining']
+	assert 4 < remaining <= 5
+
+
+def test_no_endpoints_are_started_past_the_deadline(start, connect):
+	client = connect(start())
+	calls = deadline_after.calls
+
+	response = client.get("/deadline_busy/deadline_after", headers=Timeout(0.05))
+	assert response.status_code == 504
+	assert "deadline_after" in response.get_data(as_text=True)
+	assert deadline_after.calls == calls
+
+
+def test_remaining_time_and_checks(start):
+	context = apie.RequestContext(start(), None)
+	assert context.GetRemainingTime() is None
+	context.CheckDeadline("anything")
+
+	context.deadline = time.monotonic() + 10
+	assert 9 < context.GetRemainingTime() <= 10
+	context.CheckDeadline("anything")
+
+	context.deadline = time.monotonic() - 1
+	assert context.GetRemainingTime() == 0.0
+	with pytest.raises(apie.DeadlineExceeded, match="before doing this"):
+		context.CheckDeadline("doing this")
+
+
+def test_hacked_requests_keep_their_deadlines(start, connect):
+	client = connect(start({'dev': True}))
+	assert client.get("/hack/bench_sleep?sleep=0.01").get_json()['slept'] == 0.01
+
+	response = client.get("/hack/bench_sleep?sleep=1", headers=Timeout(0.05))
+	assert response.status_code == 504
+
+
+def test_hacked_requests_are_admitted(start, connect):
+	bench = start({'dev': True})
+	bench.admission = apie.AdmissionController(0, {'bench_hello': 1}, 0)
+	client = connect(bench)
+	gate = bench.admission.gates['bench_hello']
+
+	assert client.get("/hack/bench_hello").status_code == 200
+	assert gate.admitted == 1
+
+	gate.semaphore.acquire()
+	response = client.get("/hack/bench_hello")
+	assert response.status_code == 503
+	assert gate.shed['queue_full'] == 1
+	gate.semaphore.release()
@@ -0,0 +1,78 @@
+import flask
+import pytest
+import apie
+
+
+# Uses this.response as the dict it used to be and forbids a header of its own.
+class dict_response(apie.Endpoint):
+	def __init__(this, name="dict_response"):
+		super().__init__(name)
+
+		this.allowedNext = []
+		this.forbidden_headers.append('X-Internal')
+
+	def Call(this):
+		this.response['code'] = 201
+		this.response['headers']['X-Internal'] = "secret"
+		this.response['headers']['X-Public'] = "hello"
+		this.response.content['data']['from'] = "dict"
+
+
+def test_responses_can_be_used_as_dicts(start, connect):
+	bench = start()
+	client = connect(bench)
+
+	response = client.get("/dict_response")
+	assert response.status_code == 201
+	assert response.get_json()['from'] == "dict"
+	assert response.headers['X-Public'] == "hello"
+	assert 'X-Internal' not in response.headers
+
+	endpoint = bench.pool.idle['dict_response'][0]
+	assert 'code' in endpoint.response
+	assert endpoint.response.keys() == ['code', 'headers', 'content']
+	assert endpoint.response.content.keys() == ['data', 'message']
+	assert endpoint.response.get('missing', "default") == "default"
+	with pytest.raises(KeyError):
+		endpoint.response['missing']
+
+
+def test_responses_only_have_their_own_members(start, connect):
+	bench = start()
+	connect(bench).get("/dict_response")
+
+	endpoint = bench.pool.idle['dict_response'][0]
+	assert not hasattr(endpoint.response, '__dict__')
+	with pytest.raises(AttributeError):
+		endpoint.response.extra = "not kept"
+	with pytest.raises(AttributeError):
+		endpoint.response.content['extra'] = "not kept"
+
+
+def test_structured_data_outlives_the_endpoint(start):
+	bench = start()
+	with bench.flask.test_request_context("/dict_response"):
+		context = apie.RequestContext(bench, flask.request)
+		response = bench.ProcessEndpoint('dict_response', flask.request, context=context, next=[])
+		endpoint = context.checkedOut[0][1]
+		context.Release()
+
+	assert response.structured == {'from': "dict", 'cacheable': False}
+
+	# The Endpoint is reused for the next request.
+	assert bench.pool.Checkout('dict_response') is endpoint
+	endpoint.ResetResponse()
+	endpoint.response.content.data['from'] = "the next request"
+
+	assert response.structured == {'from': "dict", 'cacheable': False}
+	assert response.get_json() == response.structured
+
+
+def test_metadata_is_frozen_once_called(start, connect):
+	bench = start()
+	connect(bench).get("/dict_response")
+
+	endpoint = bench.pool.idle['dict_response'][0]
+	assert 'X-Internal' in endpoint.forbidden_headers
+	with pytest.raises(AttributeError):
+		endpoint.allowedNext.append('help')
@@ -0,0 +1,42 @@
+import apie
+
+
+# Returns the test_value it Fetches.
+class fetch_value(apie.Endpoint):
+	def __init__(this, name="fetch_value"):
+		super().__init__(name)
+
+		this.supportedMethods = ['GET']
+		this.allowedNext = []
+
+	def Call(this):
+		this.response.content.data['value'] = this.Fetch('test_value', None)
+
+
+def GetValue(client):
+	return client.get("/fetch_value").get_json()['value']
+
+
+def test_executors_do_not_share_fetched_values(start, connect):
+	first = connect(start({'test_value': "first"}))
+	second = connect(start({'test_value': "second"}))
+
+	assert GetValue(first) == "first"
+	assert GetValue(second) == "second"
+	assert GetValue(first) == "first"
+
+
+def test_fetched_values_can_change(start, connect):
+	bench = start()
+	client = connect(bench)
+	assert GetValue(client) is None
+
+	# Values which weren't found aren't remembered.
+	bench.test_value = "set"
+	assert GetValue(client) == "set"
+
+	# Values which were found are, until they're invalidated.
+	bench.test_value = "changed"
+	assert GetValue(client) == "set"
+	bench.InvalidateFetches()
+	assert GetValue(client) == "changed"
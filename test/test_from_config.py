@@ -0,0 +1,118 @@
+import re
+import flask
+import pytest
+import apie
+
+
+@pytest.fixture
+def bench(start):
+	bench = start({'authenticator': "from_config"})
+	bench.anonymous_endpoints = ["bench_hello", "bench_pass/bench_.*"]
+	return bench
+
+
+# The globals of the module from_config was loaded from.
+@pytest.fixture
+def module(bench):
+	return type(bench.auth).ValidateStaticArgs.__globals__
+
+
+@pytest.fixture
+def PathMatcher(module):
+	return module['PathMatcher']
+
+
+def test_literal_patterns_are_prefixes(PathMatcher):
+	matcher = PathMatcher(["health", "public/docs", "public/images"])
+
+	assert matcher.regex is None
+	assert matcher.regexes == []
+	assert matcher.Match("health")
+	assert matcher.Match("healthz")
+	assert matcher.Match("public/docs/index.html")
+	assert matcher.Match("public/images")
+	assert not matcher.Match("public/doc")
+	assert not matcher.Match("public")
+	assert not matcher.Match("private/health")
+	assert not matcher.Match("")
+
+
+def test_an_empty_literal_matches_everything(PathMatcher):
+	matcher = PathMatcher([""])
+	assert matcher.Match("")
+	assert matcher.Match("anything")
+
+
+def test_expressions_are_combined(PathMatcher):
+	matcher = PathMatcher(["health", r"user/[0-9]+$", r"static/.*\.css", "a|b"])
+
+	assert matcher.regex is not None
+	assert matcher.regexes == []
+	assert matcher.Match("health/check")
+	assert matcher.Match("user/42")
+	assert not matcher.Match("user/42/delete")
+	assert matcher.Match("static/site.css")
+	assert not matcher.Match("static/site.js")
+
+	# Each alternative stays in its own group.
+	assert matcher.Match("b/anything")
+	assert not matcher.Match("c/a")
+
+
+def test_backreferences_are_matched_separately(PathMatcher):
+	patterns = [r"(a+)/\1$", r"(?P<word>[a-z]+)-(?P=word)", r"user/[0-9]+$"]
+	matcher = PathMatcher(patterns)
+
+	assert matcher.regex is None
+	assert len(matcher.regexes) == 3
+	assert matcher.Match("aa/aa")
+	assert not matcher.Match("aa/a")
+	assert matcher.Match("echo-echo")
+	assert not matcher.Match("echo-ecco")
+	assert matcher.Match("user/7")
+
+
+@pytest.mark.parametrize('path', ["health", "healthy", "user/1", "user/1/x", "aa/aa", "aa/a", "static/x.css", "b", "xyz", ""])
+def test_matching_is_the_same_as_re_match(PathMatcher, path):
+	for patterns in [
+		["health", r"user/[0-9]+$"],
+		[r"static/.*\.css", "b", "x"],
+		[r"(a+)/\1$", "health"],
+	]:
+		expected = any(re.match(pattern, path) for pattern in patterns)
+		assert PathMatcher(patterns).Match(path) == expected
+
+
+def test_anonymous_endpoints_need_no_credentials(bench):
+	client = bench.flask.test_client()
+
+	assert client.get("/bench_hello").status_code == 200
+	assert client.get("/bench_pass/bench_hello").status_code == 200
+	assert client.get("/bench_payload").status_code == 401
+
+	# Remembered decisions are the same.
+	assert client.get("/bench_hello").status_code == 200
+	assert client.get("/bench_payload").status_code == 401
+
+
+def test_anonymous_endpoints_are_compiled_once(bench, module, PathMatcher, monkeypatch):
+	compiled = []
+	class CountingPathMatcher(PathMatcher):
+		def __init__(this, patterns):
+			compiled.append(patterns)
+			super().__init__(patterns)
+	monkeypatch.setitem(module, 'PathMatcher', CountingPathMatcher)
+
+	first = bench.authenticators.Checkout()
+	second = bench.authenticators.Checkout()
+	assert first is not second
+
+	with bench.flask.test_request_context("/bench_payload"):
+		for authenticator in [first, second]:
+			context = apie.RequestContext(bench, flask.request)
+			assert not authenticator(executor=bench, path="bench_payload", request=flask.request, context=context)
+
+	assert compiled == [("bench_hello", "bench_pass/bench_.*")]
+	assert first.anonymousMatcher is second.anonymousMatcher
+	assert first.anonymousPaths is second.anonymousPaths
+	assert first.anonymousPaths.Get("bench_payload") is False
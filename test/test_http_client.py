@@ -0,0 +1,199 @@
+import json
+import time
+import eventlet
+import pytest
+from eventlet.green.http.client import RemoteDisconnected
+import apie
+
+
+# A minimal kept-alive HTTP/1.1 server which records every request it gets.
+# If drop is set, connections are closed after each response without telling the client, as an upstream host's idle timeout would.
+# Requests for the targets in hangUp are closed without any response, once each.
+class Upstream:
+	def __init__(this):
+		this.sock = eventlet.listen(('127.0.0.1', 0))
+		this.port = this.sock.getsockname()[1]
+		this.url = f"http://127.0.0.1:{this.port}"
+
+		this.drop = False
+		this.hangUp = []
+		this.connections = 0
+
+		# [(method, target, body)]
+		this.requests = []
+
+		this.threads = [eventlet.spawn(this.Serve)]
+
+	def Serve(this):
+		while (True):
+			client, address = this.sock.accept()
+			this.connections += 1
+			this.threads.append(eventlet.spawn(this.Handle, client))
+
+	def Handle(this, client):
+		file = client.makefile('rb')
+		try:
+			while (True):
+				line = file.readline()
+				if (not line):
+					return
+				method, target, version = line.decode().split()
+
+				headers = {}
+				for header in iter(file.readline, b"\r\n"):
+					name, value = header.decode().split(':', 1)
+					headers[name.strip().lower()] = value.strip()
+				body = file.read(int(headers.get('content-length', 0)))
+				this.requests.append((method, target, body))
+				if (target in this.hangUp):
+					this.hangUp.remove(target)
+					return
+
+				content = json.dumps({'request': len(this.requests)}).encode()
+				client.sendall(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: " + str(len(content)).encode() + b"\r\n\r\n" + content)
+				if (this.drop):
+					return
+		finally:
+			file.close()
+			client.close()
+
+	def Stop(this):
+		for thread in this.threads:
+			thread.kill()
+		this.sock.close()
+
+
+@pytest.fixture
+def upstream():
+	upstream = Upstream()
+	yield upstream
+	upstream.Stop()
+
+
+@pytest.fixture
+def http():
+	http = apie.HTTPClient(poolSize=2, timeout=5, poolTimeout=1)
+	yield http
+	http.Close()
+
+
+def test_connections_are_reused(upstream, http):
+	for i in range(3):
+		response = http.Get(f"{upstream.url}/things", params={'page': i})
+		assert response.status == 200
+		assert response.GetJson() == {'request': i + 1}
+
+	pool = http.GetPool('http', '127.0.0.1', upstream.port)
+	assert upstream.connections == 1
+	assert (pool.requests, pool.opened, pool.reused) == (3, 1, 2)
+	assert [target for method, target, body in upstream.requests] == ["/things?page=0", "/things?page=1", "/things?page=2"]
+
+
+def test_requests_send_json(upstream, http):
+	http.Post(f"{upstream.url}/things?kind=new", data={'name': "thing"})
+	assert upstream.requests == [('POST', "/things?kind=new", b'{"name": "thing"}')]
+
+
+def test_each_host_has_its_own_pool(upstream, http):
+	http.Get(f"{upstream.url}/")
+	http.Get(f"http://localhost:{upstream.port}/")
+
+	assert len(http.pools) == 2
+	assert upstream.connections == 2
+
+
+def test_only_http_urls_are_supported(http):
+	with pytest.raises(apie.APIError):
+		http.Get("ftp://127.0.0.1/file")
+
+
+def test_closed_connections_are_reconnected(upstream, http):
+	upstream.drop = True
+	http.Get(f"{upstream.url}/first")
+	eventlet.sleep(0.01)
+
+	response = http.Get(f"{upstream.url}/second")
+	assert response.GetJson() == {'request': 2}
+
+	pool = http.GetPool('http', '127.0.0.1', upstream.port)
+	assert upstream.connections == 2
+	assert (pool.requests, pool.opened) == (2, 2)
+	assert pool.GetActive() == 0
+
+
+def test_requests_which_were_not_sent_are_sent_again(upstream, http):
+	upstream.drop = True
+	http.Get(f"{upstream.url}/first")
+	eventlet.sleep(0.01)
+
+	assert http.Post(f"{upstream.url}/second", data={}).status == 200
+	assert [target for method, target, body in upstream.requests] == ["/first", "/second"]
+
+
+def test_idempotent_requests_are_sent_again(upstream, http):
+	http.Get(f"{upstream.url}/first")
+	upstream.hangUp = ["/second"]
+
+	assert http.Get(f"{upstream.url}/second").status == 200
+	assert [target for method, target, body in upstream.requests] == ["/first", "/second", "/second"]
+
+
+def test_requests_which_may_have_been_handled_are_not_sent_again(upstream, http):
+	http.Get(f"{upstream.url}/first")
+	upstream.hangUp = ["/second"]
+
+	with pytest.raises((RemoteDisconnected, ConnectionResetError)):
+		http.Post(f"{upstream.url}/second", data={})
+
+	assert [target for method, target, body in upstream.requests] == ["/first", "/second"]
+	assert http.GetPool('http', '127.0.0.1', upstream.port).GetActive() == 0
+
+
+def test_new_connections_are_not_retried(upstream, http):
+	upstream.hangUp = ["/first"]
+
+	with pytest.raises((RemoteDisconnected, ConnectionResetError)):
+		http.Get(f"{upstream.url}/first")
+	assert len(upstream.requests) == 1
+
+
+def test_idle_connections_expire(upstream):
+	http = apie.HTTPClient(idleTimeout=0.05)
+	http.Get(f"{upstream.url}/first")
+	time.sleep(0.1)
+	http.Get(f"{upstream.url}/second")
+
+	pool = http.GetPool('http', '127.0.0.1', upstream.port)
+	assert (pool.opened, pool.reused) == (2, 0)
+	http.Close()
+
+
+def test_checkouts_wait_for_a_connection():
+	pool = apie.HTTPConnectionPool('http', '127.0.0.1', 1, size=1, poolTimeout=1)
+	first, reused = pool.Checkout()
+	assert not reused
+	assert pool.GetActive() == 1
+
+	eventlet.spawn_after(0.05, pool.Checkin, first)
+	second, reused = pool.Checkout()
+
+	assert second is first
+	assert reused
+	assert pool.waits == 1
+	assert pool.waitSeconds > 0
+	assert pool.timeouts == 0
+
+
+def test_checkouts_time_out():
+	pool = apie.HTTPConnectionPool('http', '127.0.0.1', 1, size=1, poolTimeout=0.05)
+	connection, reused = pool.Checkout()
+
+	with pytest.raises(apie.HTTPPoolTimeout):
+		pool.Checkout()
+	assert (pool.waits, pool.timeouts) == (1, 1)
+
+	# Connections which can't be reused still free their place in the pool.
+	pool.Checkin(connection, reuse=False)
+	connection, reused = pool.Checkout()
+	assert not reused
+	assert pool.opened == 2
@@ -0,0 +1,169 @@
+import time
+import eons
+import pytest
+import apie
+
+
+@pytest.fixture
+def store(tmp_path):
+	return tmp_path / "store"
+
+
+# Install a package with the given files directly into the store.
+def Install(store, packageName, files=None):
+	directory = store / packageName
+	directory.mkdir(parents=True)
+	for name, contents in (files or {'module.py': "# installed\n"}).items():
+		(directory / name).write_text(contents)
+	return directory
+
+
+@pytest.fixture
+def manifest(store):
+	manifest = apie.PackageManifest(store)
+	Install(store, "kept.api")
+	manifest.Record("kept.api")
+	manifest.Save()
+	return manifest
+
+
+def test_recorded_packages_are_saved(manifest, store):
+	loaded = apie.PackageManifest(store)
+	loaded.Load()
+
+	assert list(loaded.packages.keys()) == ["kept.api"]
+	assert loaded.packages["kept.api"]['sha256'] == apie.PackageManifest.Hash(store / "kept.api")
+	assert loaded.IsValid("kept.api")
+
+
+def test_changed_packages_are_removed(manifest, store):
+	(store / "kept.api" / "module.py").write_text("# changed\n")
+
+	assert not manifest.IsValid("kept.api")
+	valid, stale = manifest.Validate()
+	assert valid == []
+	assert stale == ["kept.api"]
+	assert not (store / "kept.api").exists()
+	assert manifest.packages == {}
+
+
+def test_added_files_change_the_hash(manifest, store):
+	(store / "kept.api" / "extra.py").write_text("")
+	assert not manifest.IsValid("kept.api")
+
+
+def test_compiled_files_do_not_change_the_hash(manifest, store):
+	(store / "kept.api" / "__pycache__").mkdir()
+	(store / "kept.api" / "__pycache__" / "module.pyc").write_bytes(b"\0")
+	assert manifest.IsValid("kept.api")
+
+
+def test_missing_packages_are_not_valid(manifest, store):
+	assert not manifest.IsValid("unknown.api")
+
+	(store / "kept.api" / "module.py").unlink()
+	(store / "kept.api").rmdir()
+	assert not manifest.IsValid("kept.api")
+	assert not manifest.IsValid("kept.api", trust=True)
+
+
+def test_old_packages_are_stale(manifest):
+	assert manifest.IsValid("kept.api", maxAge=60)
+
+	manifest.packages["kept.api"]['installed'] = time.time() - 120
+	assert not manifest.IsValid("kept.api", maxAge=60)
+	assert manifest.IsValid("kept.api")
+
+
+def test_trusted_packages_are_not_hashed(manifest, store, monkeypatch):
+	(store / "kept.api" / "module.py").write_text("# changed\n")
+	manifest.packages["kept.api"]['installed'] = 0
+
+	def Hash(directory):
+		raise AssertionError("trusted packages should not be hashed")
+	monkeypatch.setattr(apie.PackageManifest, 'Hash', staticmethod(Hash))
+
+	assert manifest.IsValid("kept.api", trust=True, maxAge=60)
+	assert manifest.Validate(trust=True) == (["kept.api"], [])
+
+
+def test_only_untracked_files_are_removed(manifest, store):
+	Install(store, "untracked.api")
+	(store / "partial.zip").write_bytes(b"")
+
+	manifest.RemoveUntracked()
+
+	assert sorted(path.name for path in store.iterdir()) == [apie.PackageManifest.fileName, "kept.api"]
+
+
+def test_unreadable_manifests_are_empty(store):
+	store.mkdir()
+	(store / apie.PackageManifest.fileName).write_text("{")
+	manifest = apie.PackageManifest(store)
+	manifest.Load()
+	assert manifest.packages == {}
+
+
+@pytest.fixture
+def bench(start, store):
+	return start({'repo_store': str(store)})
+
+
+# Pretends to download packageName by installing an Endpoint of the same name into the store.
+@pytest.fixture
+def download(store, monkeypatch):
+	downloaded = []
+	def DownloadPackage(this, packageName, registerClasses=True, createSubDirectory=False):
+		downloaded.append((packageName, registerClasses, createSubDirectory))
+		name = packageName.rpartition('.')[0]
+		Install(store, packageName, {f"{name}.py": f"import apie\nclass {name}(apie.Endpoint):\n\tpass\n"})
+		return True
+	monkeypatch.setattr(eons.Executor, 'DownloadPackage', DownloadPackage)
+	return downloaded
+
+
+def test_packages_installed_while_serving_are_recorded(bench, store, download):
+	assert bench.DownloadPackage("manifest_jit.api")
+
+	# Each package is put in its own directory and registered from there.
+	assert download == [("manifest_jit.api", False, True)]
+	assert eons.SelfRegistering.GetClass("manifest_jit").__name__ == "manifest_jit"
+
+	assert bench.manifest.IsValid("manifest_jit.api")
+	saved = apie.PackageManifest(store)
+	saved.Load()
+	assert "manifest_jit.api" in saved.packages
+
+	bench.Clean()
+	assert (store / "manifest_jit.api").is_dir()
+
+
+def test_changed_packages_are_downloaded_again(bench, store, download):
+	bench.DownloadPackage("manifest_changed.api")
+	(store / "manifest_changed.api" / "manifest_changed.py").write_text("")
+
+	assert bench.LoadManifest() == ["manifest_changed.api"]
+	assert not (store / "manifest_changed.api").exists()
+
+
+def test_old_packages_are_downloaded_again(bench, store, download):
+	bench.DownloadPackage("manifest_old.api")
+	bench.manifest.packages["manifest_old.api"]['installed'] = time.time() - 120
+	bench.manifest.Save()
+
+	bench.package_max_age = 60
+	assert bench.LoadManifest() == ["manifest_old.api"]
+
+	bench.DownloadPackage("manifest_old.api")
+	assert bench.LoadManifest() == []
+
+
+def test_offline_trusts_the_manifest(bench, store, download):
+	bench.DownloadPackage("manifest_offline.api")
+	(store / "manifest_offline.api" / "manifest_offline.py").write_text("import apie\nclass manifest_offline(apie.Endpoint):\n\tpass\n")
+
+	bench.offline = True
+	bench.repo['online'] = True
+	assert bench.LoadManifest() == []
+	assert not bench.repo['online']
+	assert (store / "manifest_offline.api").is_dir()
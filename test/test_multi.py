@@ -0,0 +1,37 @@
+import apie
+
+
+# Fails for the "bad" element of a multicall.
+class picky(apie.Endpoint):
+	def __init__(this, name="picky"):
+		super().__init__(name)
+
+		this.allowedNext = []
+
+	def Call(this):
+		if (this.Fetch('which', None) == "bad"):
+			raise apie.OtherAPIError("Bad element")
+		this.response.content.data['ok'] = True
+
+
+def test_combination_is_chosen_per_call(start, connect):
+	client = connect(start({'endpoint_pool_size': 1}))
+
+	combined = client.get("/[a,b]bench_hello?combine_as=dict&forward_returns=false").get_json()
+	assert combined['hello'] == "world"
+
+	# The same multi Endpoint is used again, this time for a list.
+	combined = client.get("/[a,b]bench_hello?forward_returns=false").get_json()
+	assert combined == [{'hello': "world", 'cacheable': False}]
+
+
+def test_failed_elements_are_reported_separately(start, connect):
+	client = connect(start())
+
+	response = client.get("/[good,bad]picky?good_which=good&bad_which=bad")
+	assert response.status_code == 200
+
+	returns = response.get_json()[-1]
+	assert 'error' not in returns[0]
+	assert returns[1]['code'] == 500
+	assert returns[1]['endpoint'] == "picky"
@@ -0,0 +1,96 @@
+import time
+import apie
+
+
+# Counts how often what follows it is validated.
+class plan_first(apie.Endpoint):
+	validations = 0
+	calls = 0
+
+	def __init__(this, name="plan_first"):
+		super().__init__(name)
+
+		this.allowedNext = ['bench_hello']
+
+	def Call(this):
+		plan_first.calls += 1
+
+	def ValidateNext(this, next):
+		plan_first.validations += 1
+		return super().ValidateNext(next)
+
+
+def Validations(client, path):
+	before = plan_first.validations
+	response = client.get(f"/{path}")
+	return response.status_code, plan_first.validations - before
+
+
+def test_plans_are_cached(start, connect):
+	bench = start()
+	client = connect(bench)
+
+	# The first request compiles (and validates) the plan; the rest don't validate anything.
+	assert Validations(client, "plan_first/bench_hello") == (200, 1)
+	assert Validations(client, "plan_first/bench_hello") == (200, 0)
+	assert Validations(client, "plan_first/bench_hello") == (200, 0)
+	assert bench.plans.misses == 1
+	assert bench.plans.hits == 2
+
+	# Each method has its own plan.
+	client.post("/plan_first/bench_hello")
+	assert bench.plans.misses == 2
+
+
+def test_plans_are_evicted(start, connect):
+	bench = start({'plan_cache_size': 2})
+	client = connect(bench)
+
+	for path in ["bench_hello", "bench_payload", "plan_first/bench_hello"]:
+		assert client.get(f"/{path}").status_code == 200
+	assert len(bench.plans) == 2
+	assert bench.plans.evictions == 1
+	assert ('GET', "bench_hello") not in bench.plans
+
+	assert Validations(client, "plan_first/bench_hello") == (200, 0)
+	client.get("/bench_hello")
+	assert bench.plans.misses == 4
+
+
+def test_failed_plans_are_cached(start, connect):
+	bench = start()
+	client = connect(bench)
+
+	first = client.get("/plan_first/bench_payload")
+	assert first.status_code == 400
+	assert Validations(client, "plan_first/bench_payload") == (400, 0)
+
+	# The error is the one the Endpoint which would have failed would give.
+	second = client.get("/plan_first/bench_payload")
+	assert second.get_data() == first.get_data()
+	assert b"plan_first" in second.get_data()
+
+	plan = bench.plans.Get(('GET', "plan_first/bench_payload"))
+	assert not plan.validated
+	assert plan.failedEndpoint == "plan_first"
+
+
+def test_failed_plans_do_not_run_endpoints(start, connect):
+	bench = start()
+	client = connect(bench)
+
+	before = plan_first.calls
+	for i in range(2):
+		assert client.get("/plan_first/bench_payload").status_code == 400
+	assert plan_first.calls == before
+	assert bench.plans.hits == 1
+
+
+def test_failed_plans_expire(start, connect):
+	bench = start({'plan_failure_ttl': 0.05})
+	client = connect(bench)
+
+	assert Validations(client, "plan_first/bench_payload") == (400, 1)
+	assert Validations(client, "plan_first/bench_payload") == (400, 0)
+	time.sleep(0.1)
+	assert Validations(client, "plan_first/bench_payload") == (400, 1)
@@ -0,0 +1,103 @@
+import pytest
+import apie
+
+
+# Does enough work to show up in its own profile.
+class profiled_work(apie.Endpoint):
+	def __init__(this, name="profiled_work"):
+		super().__init__(name)
+
+		this.supportedMethods = ['GET']
+		this.allowedNext = []
+
+	def Work(this):
+		return sum(i * i for i in range(1000))
+
+	def Call(this):
+		this.response.content.data['work'] = this.Work()
+
+
+@pytest.fixture
+def profiles(tmp_path):
+	return tmp_path / "profiles"
+
+
+@pytest.fixture
+def profile(start, connect, profiles):
+	def Start(options=None):
+		config = {'dev': True, 'profile_directory': str(profiles)}
+		config.update(options or {})
+		bench = start(config)
+		return bench, connect(bench)
+	return Start
+
+
+def test_requests_are_only_profiled_in_dev_mode(start, connect, profiles):
+	bench = start({'profile_directory': str(profiles), 'profile_sample_rate': 1.0})
+	response = connect(bench).get("/profiled_work?profile")
+
+	assert bench.profiler is None
+	assert response.status_code == 200
+	assert apie.Profiler.header not in response.headers
+	assert not profiles.exists()
+
+
+@pytest.mark.parametrize('asking', [
+	{'query_string': "profile"},
+	{'headers': {apie.Profiler.header: "1"}},
+])
+def test_requests_can_ask_to_be_profiled(profile, profiles, asking):
+	bench, client = profile()
+	response = client.get("/profiled_work", **asking)
+
+	assert response.status_code == 200
+	assert response.get_json()['work'] == 332833500
+
+	name = response.headers[apie.Profiler.header]
+	assert (profiles / name).is_file()
+	summary = (profiles / name).with_suffix('.txt').read_text()
+	assert summary.startswith("Profile of GET profiled_work")
+	assert "Top functions in profiled_work:" in summary
+	assert "Work (line" in summary
+
+
+def test_other_requests_are_not_profiled(profile, profiles):
+	bench, client = profile()
+	response = client.get("/profiled_work")
+
+	assert response.status_code == 200
+	assert apie.Profiler.header not in response.headers
+	assert not profiles.exists()
+
+
+def test_requests_are_sampled(profile, profiles):
+	bench, client = profile({'profile_sample_rate': 1.0})
+	names = [client.get("/profiled_work").headers[apie.Profiler.header] for i in range(3)]
+
+	assert len(set(names)) == 3
+	assert sorted(path.name for path in profiles.glob('*.prof')) == sorted(names)
+
+
+def test_only_the_newest_profiles_are_kept(profile, profiles):
+	bench, client = profile({'profile_keep': 2})
+	names = [client.get("/profiled_work?profile").headers[apie.Profiler.header] for i in range(4)]
+
+	assert sorted(path.name for path in profiles.glob('*.prof')) == sorted(names[-2:])
+	assert len(list(profiles.glob('*.txt'))) == 2
+
+
+def test_unauthorized_requests_are_profiled_without_a_header(profile, profiles):
+	bench, client = profile()
+	response = client.get("/profiled_work?profile", headers={'Authorization': "Bearer wrong"})
+
+	assert response.status_code == 401
+	assert apie.Profiler.header not in response.headers
+	assert len(list(profiles.glob('*.prof'))) == 1
+
+
+def test_only_one_request_is_profiled_at_a_time(profile):
+	bench, client = profile({'profile_sample_rate': 1.0})
+
+	bench.profiler.active = True
+	response = client.get("/profiled_work?profile")
+	assert apie.Profiler.header not in response.headers
@@ -0,0 +1,77 @@
+import apie
+
+
+def Get(client, path="bench_hello", token="bench"):
+	return client.get(f"/{path}", headers={'Authorization': f"Bearer {token}"}).status_code
+
+
+def Limit(bench, rules):
+	bench.auth.rateLimiter = apie.RateLimiter(rules)
+	return bench.flask.test_client()
+
+
+def test_made_up_credentials_are_limited_by_address(start):
+	bench = start()
+	client = Limit(bench, [{'key': "credential", 'limit': 2, 'period': 60}])
+
+	assert Get(client, token="made up 1") == 401
+	assert Get(client, token="made up 2") == 401
+	assert Get(client, token="made up 3") == 429
+	assert len(bench.auth.rateLimiter.buckets) == 1
+
+
+def test_authenticated_credentials_are_limited_separately(start, authorization):
+	bench = start()
+	client = Limit(bench, [{'key': "credential", 'limit': 2, 'period': 60}])
+
+	# The first request is counted against the address, since the credentials haven't been checked yet.
+	assert Get(client) == 200
+	assert Get(client) == 200
+	assert Get(client) == 200
+	assert Get(client) == 429
+
+	# The address still has a request left.
+	assert Get(client, token="made up") == 401
+	assert Get(client, token="made up") == 429
+
+	# Revoked credentials are limited by their address again.
+	bench.auth.RevokeCredentials(authorization)
+	assert Get(client) == 429
+
+
+def test_rejected_requests_take_nothing(start):
+	bench = start()
+	client = Limit(bench, [
+		{'key': "ip", 'limit': 3, 'period': 60},
+		{'key': "path", 'limit': 1, 'period': 60, 'paths': ["bench_hello"]},
+	])
+
+	assert Get(client) == 200
+	for i in range(5):
+		assert Get(client) == 429
+
+	# Only the first request counted against the address.
+	assert Get(client, "bench_payload") == 200
+	assert Get(client, "bench_payload") == 200
+	assert Get(client, "bench_payload") == 429
+
+	limiter = bench.auth.rateLimiter
+	assert limiter.allowed == {'ip:3/60': 3, 'path:1/60:bench_hello': 1}
+	assert limiter.limited == {'ip:3/60': 1, 'path:1/60:bench_hello': 5}
+
+
+def test_most_limiting_rule_is_reported(start, authorization):
+	bench = start()
+	client = Limit(bench, [
+		{'key': "ip", 'limit': 10, 'period': 60},
+		{'key': "path", 'limit': 1, 'period': 60},
+	])
+
+	response = client.get("/bench_hello", headers=authorization)
+	assert response.headers['RateLimit-Limit'] == "1"
+	assert response.headers['RateLimit-Remaining'] == "0"
+
+	response = client.get("/bench_hello", headers=authorization)
+	assert response.status_code == 429
+	assert response.headers['RateLimit-Limit'] == "1"
+	assert int(response.headers['Retry-After']) >= 1
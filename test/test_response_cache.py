@@ -0,0 +1,58 @@
+import apie
+
+
+# Allows any request with an API key, which it doesn't check.
+class key_auth(apie.Authenticator):
+	def __init__(this, name="Key Authenticator"):
+		super().__init__(name)
+
+		this.credentialHeaders = ['X-Api-Key']
+
+	def Authenticate(this):
+		return 'X-Api-Key' in this.request.headers
+
+
+# Returns the API key it was called with and how many times it has been called.
+class cached_key(apie.Endpoint):
+	calls = 0
+
+	def __init__(this, name="cached_key"):
+		super().__init__(name)
+
+		this.supportedMethods = ['GET']
+		this.allowedNext = []
+		this.cacheable = True
+		this.mime = 'application/json'
+
+	def Call(this):
+		cached_key.calls += 1
+		this.response.content.data['key'] = this.request.headers.get('X-Api-Key')
+		this.response.content.data['calls'] = cached_key.calls
+
+
+def Get(client, key):
+	return client.get("/cached_key", headers={'X-Api-Key': key}).get_json()
+
+
+def test_responses_vary_on_credential_headers(start):
+	bench = start({'authenticator': "key_auth", 'response_cache_size': 16})
+	client = bench.flask.test_client()
+
+	first = Get(client, "first")
+	assert Get(client, "first") == first
+	assert Get(client, "second")['key'] == "second"
+	assert Get(client, "first") == first
+
+
+def test_invalidated_responses_are_remade(start):
+	bench = start({'authenticator': "key_auth", 'response_cache_size': 16})
+	client = bench.flask.test_client()
+
+	first = Get(client, "key")
+	assert Get(client, "key") == first
+
+	assert bench.InvalidateResponses("cached_key") == 1
+	assert Get(client, "key")['calls'] == first['calls'] + 1
+
+	bench.InvalidateResponses()
+	assert len(bench.responses) == 0
@@ -0,0 +1,65 @@
+import json
+import pytest
+import eons
+import apie
+
+
+# Something json can't serialize, but jsonpickle can.
+class Point:
+	def __init__(this, x, y):
+		this.x = x
+		this.y = y
+
+
+# Returns plain data or, with ?point, an object.
+class serialized(apie.Endpoint):
+	def __init__(this, name="serialized"):
+		super().__init__(name)
+
+		this.allowedNext = []
+
+	def Call(this):
+		this.response.content.data['plain'] = {'list': [1, 2.5, "three", None, True]}
+		if ('point' in this.request.args):
+			this.response.content.data['point'] = Point(1, 2)
+
+
+@pytest.mark.parametrize('serializer', ["json", "jsonpickle", "auto"])
+def test_plain_data_is_the_same_with_every_serializer(start, connect, serializer):
+	bench = start({'serializer': serializer})
+	response = connect(bench).get("/serialized")
+	assert response.status_code == 200
+	assert response.get_json() == {'plain': {'list': [1, 2.5, "three", None, True]}, 'cacheable': False}
+
+
+def test_json_is_used_when_it_can_be(start):
+	bench = start({'serializer': "auto"})
+	data = {'a': [1, 2]}
+	assert bench.Serialize(data) == json.dumps(data).encode('utf-8')
+
+
+def test_auto_falls_back_to_jsonpickle(start, connect):
+	bench = start({'serializer': "auto"})
+	response = connect(bench).get("/serialized?point")
+	assert response.status_code == 200
+
+	point = response.get_json()['point']
+	assert point['x'] == 1 and point['y'] == 2
+	assert point['py/object'].endswith("Point")
+
+
+def test_json_does_not_fall_back(start, connect):
+	bench = start({'serializer': "json"})
+	with pytest.raises(TypeError):
+		bench.Serialize({'point': Point(1, 2)})
+	assert connect(bench).get("/serialized?point").status_code == 400
+
+
+def test_dict_subclasses_are_serialized_as_dicts(start):
+	bench = start({'serializer': "jsonpickle"})
+	assert json.loads(bench.Serialize(eons.util.DotDict({'a': 1}))) == {'a': 1}
+
+
+def test_unknown_serializers_are_refused(start):
+	with pytest.raises(apie.APIError):
+		start({'serializer': "xml"})
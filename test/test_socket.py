@@ -0,0 +1,117 @@
+import pytest
+import apie
+
+
+# Returns what it was called with.
+class socket_echo(apie.Endpoint):
+	def __init__(this, name="socket_echo"):
+		super().__init__(name)
+
+		this.supportedMethods = ['GET', 'POST']
+		this.allowedNext = []
+
+	def Call(this):
+		this.response.content.data['method'] = this.request.method
+		this.response.content.data['args'] = this.request.args.to_dict()
+		this.response.content.data['json'] = this.request.get_json(silent=True)
+		this.response.content.data['headers'] = dict(this.request.headers)
+
+
+@pytest.fixture
+def socket(start, authorization):
+	bench = start()
+	def Connect(headers=authorization):
+		return bench.socket.test_client(bench.flask, headers=headers)
+	return Connect
+
+
+# Make the given call and RETURN its response.
+def Call(client, message):
+	client.get_received()
+	client.emit('call', message)
+	received = client.get_received()
+	assert [event['name'] for event in received] == ['response']
+	return received[0]['args'][0]
+
+
+def test_clients_are_told_they_are_connected(socket):
+	client = socket()
+	assert client.is_connected()
+	assert client.get_received() == [{'name': 'status', 'args': [{'message': "Connected to WebSocket"}], 'namespace': '/'}]
+
+
+def test_calls_are_processed_as_requests(socket):
+	response = Call(socket(), {
+		'id': 7,
+		'path': "/socket_echo/",
+		'method': "post",
+		'query': {'page': 2},
+		'data': {'name': "thing"},
+	})
+
+	assert response['id'] == 7
+	assert response['status'] == 200
+	assert response['headers']['Content-Type'] == 'application/json'
+
+	body = response['body']
+	assert body['method'] == 'POST'
+	assert body['args'] == {'page': "2"}
+	assert body['json'] == {'name': "thing"}
+
+
+def test_calls_may_be_paths(socket):
+	response = Call(socket(), "socket_echo")
+	assert response['id'] is None
+	assert response['status'] == 200
+	assert response['body']['method'] == 'GET'
+
+
+def test_calls_may_have_raw_bodies(socket):
+	response = Call(socket(), {'path': "bench_payload", 'method': "POST", 'data': "raw"})
+	assert response['status'] == 200
+
+
+@pytest.mark.parametrize('message', [{'id': 3}, {'id': 3, 'method': "GET"}, 3])
+def test_calls_without_paths_are_bad_requests(socket, message):
+	response = Call(socket(), message)
+
+	assert response['status'] == 400
+	assert response['body'].startswith("Bad request:")
+	if (isinstance(message, dict)):
+		assert response['id'] == 3
+
+
+def test_unsupported_methods_are_rejected(socket):
+	response = Call(socket(), {'id': 1, 'path': "socket_echo", 'method': "BREW"})
+	assert response['status'] == 405
+	assert response['id'] == 1
+
+
+def test_calls_inherit_the_sockets_headers(socket, authorization):
+	headers = dict(authorization)
+	headers.update({
+		'X-Client': "socket",
+		'X-Override': "socket",
+		'Accept-Encoding': "gzip",
+		'If-None-Match': '"etag"',
+		'Sec-WebSocket-Key': "key",
+		'Sec-WebSocket-Version': "13",
+	})
+	response = Call(socket(headers), {'path': "socket_echo", 'headers': {'X-Override': "call"}})
+
+	assert response['status'] == 200
+	received = {name.lower(): value for name, value in response['body']['headers'].items()}
+	assert received['authorization'] == authorization['Authorization']
+	assert received['x-client'] == "socket"
+	assert received['x-override'] == "call"
+	for excluded in ['accept-encoding', 'if-none-match', 'sec-websocket-key', 'sec-websocket-version', 'upgrade', 'connection']:
+		assert excluded not in received
+
+	# Accept-Encoding wasn't inherited, so the response isn't compressed either.
+	assert 'Content-Encoding' not in response['headers']
+
+
+def test_calls_are_authenticated(socket, authorization):
+	client = socket({})
+	assert Call(client, {'path': "socket_echo"})['status'] == 401
+	assert Call(client, {'path': "socket_echo", 'headers': authorization})['status'] == 200
@@ -0,0 +1,12 @@
+def test_streamed_endpoints_are_released_once_closed(start, connect, stream):
+	name, body = stream
+	bench = start()
+	client = connect(bench)
+
+	response = client.get(f"/{name}", buffered=False)
+	assert response.status_code == 200
+	assert not bench.pool.idle.get(name)
+
+	assert response.get_data(as_text=True) == body
+	response.close()
+	assert len(bench.pool.idle[name]) == 1
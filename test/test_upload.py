@@ -0,0 +1,72 @@
+import io
+import os
+import pytest
+import apie
+
+
+# Reports where its upload was put and what it contains.
+class upload_path(apie.Endpoint):
+	def __init__(this, name="upload_path"):
+		super().__init__(name)
+
+		this.supportedMethods = ['POST']
+		this.allowedNext = []
+
+	def Call(this):
+		upload = this.GetUpload('file')
+		path = this.GetUploadPath('file')
+		with open(path, 'rb') as file:
+			contents = file.read()
+
+		this.response.content.data['spooled'] = upload.stream.path
+		this.response.content.data['path'] = path
+		this.response.content.data['copied'] = path in this.context.temporaryFiles
+		this.response.content.data['size'] = len(contents)
+		this.response.content.data['same'] = contents == upload.stream.read()
+		this.response.content.data['again'] = this.GetUploadPath('file') == path
+
+
+def Upload(client, contents):
+	return client.post("/upload_path", data={'file': (io.BytesIO(contents), "upload.bin")}, content_type='multipart/form-data').get_json()
+
+
+@pytest.fixture
+def uploads(tmp_path):
+	return tmp_path / "uploads"
+
+
+def test_small_uploads_are_copied(start, connect, uploads):
+	client = connect(start({'upload_directory': str(uploads), 'upload_memory_threshold': 1024}))
+	data = Upload(client, b"small" * 10)
+
+	assert data['spooled'] is None
+	assert data['copied']
+	assert data['size'] == 50
+	assert data['same']
+	assert data['again']
+	assert os.path.dirname(data['path']) == str(uploads)
+	assert not os.path.exists(data['path'])
+
+
+def test_large_uploads_are_not_copied(start, connect, uploads):
+	client = connect(start({'upload_directory': str(uploads), 'upload_memory_threshold': 1024}))
+	data = Upload(client, b"large" * 1000)
+
+	assert data['path'] == data['spooled']
+	assert not data['copied']
+	assert data['size'] == 5000
+	assert data['same']
+	assert data['again']
+	assert os.path.dirname(data['path']) == str(uploads)
+	assert not os.path.exists(data['path'])
+	assert list(uploads.iterdir()) == []
+
+
+def test_uploads_may_always_be_written_to_disk(start, connect, uploads):
+	client = connect(start({'upload_directory': str(uploads), 'upload_memory_threshold': 0}))
+	data = Upload(client, b"tiny")
+
+	assert data['path'] == data['spooled']
+	assert not data['copied']
+	assert data['size'] == 4
+	assert not os.path.exists(data['path'])
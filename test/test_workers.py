@@ -0,0 +1,72 @@
+import os
+import time
+import signal
+import socket
+import pytest
+import eventlet
+import apie
+from pathlib import Path
+from benchmark import StartServer, StopServer
+
+
+# RETURN the pids of the given process's children.
+def GetChildren(pid):
+	children = Path(f"/proc/{pid}/task/{pid}/children")
+	if (not children.exists()):
+		pytest.skip("Can't list child processes on this platform")
+	return [int(child) for child in children.read_text().split()]
+
+
+# RETURN the given process's children, once there are the given number of them, none of which are in gone.
+def WaitForChildren(pid, count, gone=(), timeout=30):
+	deadline = time.time() + timeout
+	while (time.time() < deadline):
+		children = GetChildren(pid)
+		if (len(children) == count and not set(children) & set(gone)):
+			return children
+		time.sleep(0.1)
+	raise AssertionError(f"Expected {count} workers; got {GetChildren(pid)}")
+
+
+def test_one_worker_serves_in_process(start, monkeypatch):
+	bench = start({'workers': 1})
+	served = []
+	monkeypatch.setattr(eventlet.wsgi, 'server', lambda sock, app: served.append(app))
+	monkeypatch.setattr(bench, 'Prefork', lambda sock: pytest.fail("Forked for 1 worker"))
+
+	apie.APIE.Serve(bench, None)
+	assert served == [bench.flask]
+
+
+def test_more_workers_are_forked(start, monkeypatch):
+	bench = start({'workers': 3})
+	assert bench.workers == 3
+
+	forked = []
+	monkeypatch.setattr(eventlet.wsgi, 'server', lambda sock, app: pytest.fail("Served without forking"))
+	monkeypatch.setattr(bench, 'Prefork', lambda sock: forked.append(sock))
+
+	apie.APIE.Serve(bench, "socket")
+	assert forked == ["socket"]
+
+
+def test_workers_are_restarted_and_stopped(tmp_path, authorization):
+	server, port = StartServer(tmp_path, 2)
+	try:
+		workers = WaitForChildren(server.pid, 2)
+
+		# Every worker answers on the same socket.
+		for i in range(10):
+			with socket.create_connection(("127.0.0.1", port), timeout=5) as connection:
+				connection.sendall(f"GET /bench_hello HTTP/1.0\r\nAuthorization: {authorization['Authorization']}\r\n\r\n".encode())
+				assert connection.recv(64).startswith(b"HTTP/1.1 200")
+
+		os.kill(workers[0], signal.SIGKILL)
+		restarted = WaitForChildren(server.pid, 2, gone=[workers[0]])
+		assert workers[1] in restarted
+	finally:
+		StopServer(server)
+
+	assert server.returncode == 0
+	for worker in restarted:
+		assert not Path(f"/proc/{worker}").exists()